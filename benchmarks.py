@@ -0,0 +1,503 @@
+import sys
+import asyncio
+import time
+import tracemalloc
+import os
+import tempfile
+import threading
+import myLibrary
+import librarySnapshot
+import libraryJournal
+import libraryAsync
+import libraryShards
+import libraryColumns
+"""
+Benchmarks for the performance changes made on myLibrary
+run all the benchmarks: python benchmarks.py
+run only some of them: python benchmarks.py views
+"""
+
+def makeResources (size, module = myLibrary):
+    """
+    This function creates size resources, books disks and magazines in turn
+    """
+    resources = []
+    for i in range (size):
+        if i % 3 == 0:
+            resources.append (module.Book (i, f"Book {i}", f"Author {i % 1000}", 1900 + i % 120, "fiction"))
+        elif i % 3 == 1:
+            resources.append (module.Disk (i, f"Disk {i}", f"Singer {i % 1000}", 1950 + i % 70))
+        else:
+            resources.append (module.Magazine (i, f"Magazine {i % 100}", f"Publisher {i % 50}", i))
+    return resources
+
+def buildLibrary (size, module = myLibrary):
+    """
+    This function creates a library with size resources
+    """
+    library = module.Library ()
+    for resource in makeResources (size, module):
+        library.add (resource)
+    return library
+
+def measure (function, repeat = 10):
+    """
+    This function runs function repeat times
+    return the average time in seconds and the peak of memory allocated by one call in bytes
+    the time is measured without tracemalloc because it slows down the allocations
+    """
+    start = time.perf_counter ()
+    for i in range (repeat):
+        function ()
+    seconds = (time.perf_counter () - start) / repeat
+    tracemalloc.start ()
+    tracemalloc.reset_peak ()
+    before = tracemalloc.get_traced_memory () [0]
+    function ()
+    peak = tracemalloc.get_traced_memory () [1] - before
+    tracemalloc.stop ()
+    return seconds, peak
+
+def report (title, rows):
+    """
+    This function prints a table of results, every row is (name, seconds, bytes)
+    """
+    print (title)
+    for name, seconds, peak in rows:
+        print (f"\t{name:<40} {seconds * 1e6:>14.2f} us {peak:>14,} bytes")
+    print ()
+
+def benchmarkViews (sizes = (10 ** 5, 10 ** 6)):
+    """
+    Compare the read only views of Library.customers, Library.resources and Library.borrowing with the old copies
+    the old properties returned list (...) of the items, this is measured by copying the view
+    borrowing is still a new dict, tests.py wants lists in it, so only the lists of the library are not copied
+    """
+    for size in sizes:
+        library = buildLibrary (size)
+        for i in range (size // 10):
+            customer = myLibrary.Customer (i, f"Customer {i}", 500000000 + i)
+            library.add (customer)
+            library.borrowResource (customer, library.search (f"B{3 * i}"))
+        last = library.search (f"M{size - 1}")
+        rows = [
+            ("resources before (list copy)", *measure (lambda: len (list (library.resources)))),
+            ("resources after (view)", *measure (lambda: len (library.resources))),
+            ("customers before (list copy)", *measure (lambda: len (list (library.customers)))),
+            ("customers after (view)", *measure (lambda: len (library.customers))),
+            ("'in' before (list copy)", *measure (lambda: last in list (library.resources))),
+            ("'in' after (view)", *measure (lambda: last in library.resources)),
+            ("borrowing before (list copies)", *measure (lambda: len ({id: list (loans) for id, loans in library.borrowing.items ()}))),
+            ("borrowing after (dict copy)", *measure (lambda: len (library.borrowing))),
+        ]
+        report (f"views - {size:,} resources, {size // 10:,} customers", rows)
+
+def benchmarkLoad (sizes = (10 ** 5, 10 ** 6)):
+    """
+    Compare loading a catalogue with Library.add for every resource and with Library.addMany
+    """
+    for size in sizes:
+        resources = makeResources (size)
+        def addOneByOne ():
+            library = myLibrary.Library ()
+            for resource in resources:
+                library.add (resource)
+        def addMany ():
+            myLibrary.Library ().addMany (resources)
+        rows = [
+            ("add one by one", *measure (addOneByOne, 3)),
+            ("addMany", *measure (addMany, 3)),
+        ]
+        report (f"load - {size:,} resources", rows)
+
+def benchmarkMemory (size = 10 ** 6):
+    """
+    Measure the memory of one object of every class with tracemalloc, when size objects are alive
+    the strings are shared by all the objects so only the objects themselves are counted
+    """
+    factories = [
+        ("Book", lambda i: myLibrary.Book (i, "name", "author", 1997, "fiction")),
+        ("Disk", lambda i: myLibrary.Disk (i, "name", "singer", 2018)),
+        ("Magazine", lambda i: myLibrary.Magazine (i, "name", "publisher", 32)),
+        ("Customer", lambda i: myLibrary.Customer (i, "name", 547000000)),
+    ]
+    print (f"memory - {size:,} objects of every class")
+    for name, factory in factories:
+        objects = [None] * size #the list is allocated before the measure
+        tracemalloc.start ()
+        before = tracemalloc.get_traced_memory () [0]
+        for i in range (size):
+            objects [i] = factory (i)
+        used = tracemalloc.get_traced_memory () [0] - before
+        tracemalloc.stop ()
+        print (f"\t{name:<40} {used / size:>14.1f} bytes per object")
+        del objects
+    print ()
+
+def benchmarkSearchText (sizes = (10 ** 5, 10 ** 6)):
+    """
+    Measure the full text search, the first search builds the index and the next ones use it
+    """
+    for size in sizes:
+        library = buildLibrary (size)
+        start = time.perf_counter ()
+        library.searchText ("")
+        built = time.perf_counter () - start
+        rows = [
+            ("word", *measure (lambda: library.searchText ("author", limit = 10), 100)),
+            ("two words (AND)", *measure (lambda: library.searchText ("book 12", limit = 10), 100)),
+            ("OR", *measure (lambda: library.searchText ("singer OR publisher", limit = 10), 100)),
+            ("prefix", *measure (lambda: library.searchText ("magaz*", limit = 10), 100)),
+            ("rare word", *measure (lambda: library.searchText (f"disk {size - 2}"), 100)),
+        ]
+        report (f"text search - {size:,} resources, index built in {built:.1f} s", rows)
+
+def benchmarkSnapshot (sizes = (10 ** 5, 10 ** 6)):
+    """
+    Measure the time to save and load a library, and the size of the file
+    the catalogue is read in place from the file mapped in memory, without making the objects of a library
+    """
+    path = os.path.join (tempfile.mkdtemp (), "library.snapshot")
+    for size in sizes:
+        library = buildLibrary (size)
+        rows = [
+            ("save", *measure (lambda: librarySnapshot.save (library, path), 1)),
+            ("load", *measure (lambda: librarySnapshot.load (path), 1)),
+        ]
+        if libraryColumns.numpy is not None:
+            rows.append (("catalogue with mmap", *measure (lambda: libraryColumns.ColumnCatalogue.load (path, True).close (), 1)))
+        report (f"snapshot - {size:,} resources, file of {os.path.getsize (path):,} bytes", rows)
+    os.remove (path)
+
+def benchmarkJournal (size = 10 ** 4):
+    """
+    Measure borrow and return operations per second with a journal, for every sync policy
+    the policy always syncs every operation, so it runs less operations
+    """
+    folder = tempfile.mkdtemp ()
+    library = buildLibrary (size)
+    customer = myLibrary.Customer (1, "Israel Israeli", 547000000)
+    library.add (customer)
+    resources = list (library.resources)
+    print (f"journal - borrow and return of {size:,} resources")
+    for sync in (None,) + libraryJournal.SYNC_POLICIES:
+        count = size // 10 if sync == "always" else size
+        path = os.path.join (folder, f"{sync}.journal")
+        journal = None if sync is None else libraryJournal.Journal (path, sync = sync)
+        library.journal = journal
+        start = time.perf_counter ()
+        for resource in resources [:count]:
+            library.borrowResource (customer, resource)
+            library.returnResource (customer, resource)
+        if journal is not None:
+            journal.close ()
+            os.remove (path)
+        seconds = time.perf_counter () - start
+        print (f"\t{str (sync) if sync else 'no journal':<40} {2 * count / seconds:>14,.0f} ops/sec")
+    library.journal = None
+    print ()
+
+def benchmarkThreads (size = 10 ** 4, threadCounts = (1, 2, 4, 8)):
+    """
+    Measure borrow and return operations per second of a thread safe library, with more and more threads
+    every thread has its own customer and its own resources, so the threads wait only for the stripes they share
+    with the GIL only one thread runs python code at a time, so the total does not grow with the threads
+    """
+    print (f"threads - borrow and return of {size:,} resources")
+    plain = buildLibrary (size)
+    customer = myLibrary.Customer (0, "Israel Israeli", 547000000)
+    plain.add (customer)
+    start = time.perf_counter ()
+    for resource in plain.resources:
+        plain.borrowResource (customer, resource)
+        plain.returnResource (customer, resource)
+    print (f"\t{'not thread safe, 1 thread':<40} {2 * size / (time.perf_counter () - start):>14,.0f} ops/sec")
+    for count in threadCounts:
+        library = myLibrary.Library (threadSafe = True)
+        library.addMany (makeResources (size))
+        customers = [myLibrary.Customer (i, f"Customer {i}", 547000000 + i) for i in range (count)]
+        library.addMany (customers)
+        resources = list (library.resources)
+        def work (customer, resources):
+            for resource in resources:
+                library.borrowResource (customer, resource)
+                library.returnResource (customer, resource)
+        threads = [threading.Thread (target = work, args = (customers [i], resources [i::count])) for i in range (count)]
+        start = time.perf_counter ()
+        for thread in threads:
+            thread.start ()
+        for thread in threads:
+            thread.join ()
+        seconds = time.perf_counter () - start
+        print (f"\t{f'thread safe, {count} threads':<40} {2 * size / seconds:>14,.0f} ops/sec")
+    print ()
+
+def benchmarkAsync (patrons = 5000, size = 10 ** 4, rounds = 5):
+    """
+    Measure the latency of borrow and return calls made by many patrons at once from asyncio
+    compare a run_in_executor for every call with the AsyncLibrary batches, both with a journal in batch policy
+    the calls in the executor run in many threads, so their library is thread safe
+    """
+    folder = tempfile.mkdtemp ()
+    print (f"async - {patrons:,} patrons, {rounds} borrow and return each, {size:,} resources")
+    async def simulate (name, call, threadSafe):
+        library = myLibrary.Library (threadSafe = threadSafe)
+        library.addMany (makeResources (size))
+        customers = [myLibrary.Customer (i, f"Customer {i}", 547000000 + i) for i in range (patrons)]
+        library.addMany (customers)
+        path = os.path.join (folder, f"{name}.journal")
+        library.journal = libraryJournal.Journal (path, sync = "batch")
+        front = libraryAsync.AsyncLibrary (library)
+        resources = list (library.resources)
+        latencies = []
+        async def patron (customer):
+            for i in range (rounds):
+                resource = resources [(customer.id * rounds + i) % size]
+                for operation in ("borrowResource", "returnResource"):
+                    start = time.perf_counter ()
+                    try:
+                        await call (library, front, operation, customer, resource)
+                    except ValueError:
+                        pass #the resource was borrowed by another patron
+                    latencies.append (time.perf_counter () - start)
+        start = time.perf_counter ()
+        await asyncio.gather (*[patron (customer) for customer in customers])
+        seconds = time.perf_counter () - start
+        await front.close ()
+        library.journal.close ()
+        os.remove (path)
+        latencies.sort ()
+        p50 = latencies [len (latencies) // 2] * 1e3
+        p99 = latencies [len (latencies) * 99 // 100] * 1e3
+        print (f"\t{name:<40} p50 {p50:>8.2f} ms  p99 {p99:>8.2f} ms {len (latencies) / seconds:>12,.0f} ops/sec")
+    async def executor (library, front, operation, customer, resource):
+        return await asyncio.get_running_loop ().run_in_executor (None, getattr (library, operation), customer, resource)
+    async def batches (library, front, operation, customer, resource):
+        return await getattr (front, operation) (customer, resource)
+    asyncio.run (simulate ("run_in_executor for every call", executor, True))
+    asyncio.run (simulate ("AsyncLibrary", batches, False))
+    os.rmdir (folder)
+    print ()
+
+def benchmarkShards (size = 10 ** 5, shardCounts = (1, 2, 4)):
+    """
+    Measure borrow and return operations per second of a library split in shards, sent in batches of 10,000
+    compare with one library in this process, the shards can only be faster with a free core for every shard
+    """
+    resources = makeResources (size)
+    customers = [myLibrary.Customer (i, f"Customer {i}", 547000000 + i) for i in range (size // 10)]
+    operations = [(operation, customers [i % len (customers)], resource) for operation in ("borrow", "return") for i, resource in enumerate (resources)]
+    print (f"shards - borrow and return of {size:,} resources by {len (customers):,} customers, {os.cpu_count ()} cores")
+    library = myLibrary.Library ()
+    library.addMany (customers + resources)
+    start = time.perf_counter ()
+    for operation, customer, resource in operations:
+        if operation == "borrow":
+            library.borrowResource (customer, resource)
+        else:
+            library.returnResource (customer, resource)
+    print (f"\t{'one library':<40} {len (operations) / (time.perf_counter () - start):>14,.0f} ops/sec")
+    for count in shardCounts:
+        with libraryShards.ShardedLibrary (count) as sharded:
+            sharded.addMany (customers + resources)
+            start = time.perf_counter ()
+            for i in range (0, len (operations), 10 ** 4):
+                sharded.circulate (operations [i:i + 10 ** 4])
+            seconds = time.perf_counter () - start
+        print (f"\t{f'{count} shards':<40} {len (operations) / seconds:>14,.0f} ops/sec")
+    print ()
+
+def benchmarkDues (sizes = (10 ** 5, 10 ** 6)):
+    """
+    Compare the queries of overdue and next due loans on the heap with a scan of all the loans
+    """
+    for size in sizes:
+        library = buildLibrary (size)
+        customer = myLibrary.Customer (1, "Israel Israeli", 547000000)
+        library.add (customer)
+        for i, resource in enumerate (library.resources):
+            library.borrowResource (customer, resource, due = float ((i * 7919) % size))
+        def scan (when):
+            loans = (library.loan (resource.id) for loans in library.borrowing.values () for resource in loans)
+            return sorted ((loan for loan in loans if loan.due < when), key = lambda loan: loan.due)
+        rows = [
+            ("overdue 100 before (scan)", *measure (lambda: scan (100), 3)),
+            ("overdue 100 after (heap)", *measure (lambda: library.overdue (100), 100)),
+            ("next 10 due after (heap)", *measure (lambda: library.nextDue (10), 100)),
+        ]
+        report (f"dues - {size:,} loans", rows)
+
+def benchmarkHolds (holds = 10 ** 5, size = 1000):
+    """
+    Measure the churn of holds: every resource is held by many customers and goes from one to the next
+    the holds of a customer were found before by a scan of all the queues, now they are kept by customer
+    """
+    library = buildLibrary (size)
+    customers = [myLibrary.Customer (i, f"Customer {i}", 547000000 + i) for i in range (holds)]
+    library.addMany (customers)
+    resources = list (library.resources)
+    for resource, customer in zip (resources, customers):
+        library.borrowResource (customer, resource)
+    start = time.perf_counter ()
+    for i, customer in enumerate (customers [size:]):
+        library.placeHold (customer, resources [i % size])
+    placed = time.perf_counter () - start
+    queues = {resource.id: library.holdQueue (resource.id) for resource in resources}
+    last = customers [-1]
+    rows = [
+        ("holds of a customer before (scan)", *measure (lambda: [id for id, queue in queues.items () if last in queue], 3)),
+        ("holds of a customer after", *measure (lambda: library.holds (last.id), 1000)),
+    ]
+    report (f"holds - {holds - size:,} holds on {size:,} resources", rows)
+     #every return makes the resource ready for the next hold, who borrows it
+    holders = {resource.id: customer for resource, customer in zip (resources, customers)}
+    start = time.perf_counter ()
+    moves = 0
+    while moves < holds - size:
+        for resource in resources:
+            library.returnResource (holders [resource.id], resource)
+            nextCustomer = library.heldFor (resource.id)
+            if nextCustomer is not None:
+                library.borrowResource (nextCustomer, resource)
+                holders [resource.id] = nextCustomer
+                moves += 1
+    print (f"holds churn - {holds - size:,} holds")
+    print (f"\t{'placeHold':<40} {(holds - size) / placed:>14,.0f} ops/sec")
+    print (f"\t{'return and borrow by the next hold':<40} {moves / (time.perf_counter () - start):>14,.0f} moves/sec")
+    print ()
+
+def benchmarkRepairs (sizes = (10 ** 5, 10 ** 6), batch = 10 ** 4):
+    """
+    Compare sending resources to repair one by one and in batches, and the statistics of the repairs with a scan
+    """
+    for size in sizes:
+        library = buildLibrary (size)
+        resources = list (library.resources) [:batch]
+        def oneByOne ():
+            for resource in resources:
+                resource.repair ()
+            for resource in resources:
+                resource.returning ()
+        def batches ():
+            library.sendToRepair (resources)
+            library.completeRepair (resources)
+        library.sendToRepair (resources [::2])
+        rows = [
+            (f"{batch:,} repairs one by one", *measure (oneByOne, 3)),
+            (f"{batch:,} repairs in batches", *measure (batches, 3)),
+            ("under repair before (scan)", *measure (lambda: [resource for resource in library.resources if resource.status == "under repair"], 3)),
+            ("under repair after (index)", *measure (lambda: library.underRepair (), 3)),
+            ("statistics", *measure (library.repairStatistics, 1000)),
+        ]
+        report (f"repairs - {size:,} resources", rows)
+
+def benchmarkColumns (sizes = (10 ** 5, 10 ** 6)):
+    """
+    Compare filters and a histogram over the resource objects with the same queries over the columnar catalogue
+    """
+    if libraryColumns.numpy is None:
+        print ("columns - numpy is not installed")
+        return
+    for size in sizes:
+        library = buildLibrary (size)
+        catalogue = libraryColumns.ColumnCatalogue.fromLibrary (library)
+        def filterObjects ():
+            return [resource for resource in library.availables ("Book") if 1990 <= resource.year <= 2000]
+        def histogramObjects ():
+            counts = dict ()
+            for resource in library.resources:
+                if type (resource).__name__ == "Disk":
+                    counts [resource.year] = counts.get (resource.year, 0) + 1
+            return counts
+        rows = [
+            ("catalogue from the library", *measure (lambda: libraryColumns.ColumnCatalogue.fromLibrary (library), 3)),
+            ("available Books 1990-2000 (objects)", *measure (filterObjects, 10)),
+            ("available Books 1990-2000 (columns)", *measure (lambda: catalogue.select (type = "Book", status = myLibrary.Status.AVAILABLE, years = (1990, 2000)), 10)),
+            ("Disks by year (objects)", *measure (histogramObjects, 10)),
+            ("Disks by year (columns)", *measure (lambda: catalogue.histogram ("Disk"), 10)),
+        ]
+        report (f"columns - {size:,} resources", rows)
+
+def benchmarkQuery (sizes = (10 ** 5, 10 ** 6)):
+    """
+    Compare a filter over all the resources with a query by the secondary indexes
+    """
+    for size in sizes:
+        library = buildLibrary (size)
+        def scan ():
+            return [resource for resource in library.resources if resource.type == "Book" and resource.author == "Author 7" and 1990 <= resource.year <= 2000]
+        rows = [
+            ("indexes made", *measure (lambda: library.query (type = "Magazine"), 1)),
+            ("Books of an author in 1990-2000 (scan)", *measure (scan, 3)),
+            ("Books of an author in 1990-2000 (query)", *measure (lambda: library.query (type = "Book", author = "Author 7", yearRange = (1990, 2000)), 1000)),
+            ("resources in 1990-2000 (query)", *measure (lambda: library.query (yearRange = (1990, 2000)), 10)),
+        ]
+        report (f"query - {size:,} resources", rows)
+
+def benchmarkIssues (size = 10 ** 6, run = 100):
+    """
+    Compare the issues of a title found by a scan and by the sorted issues, and borrowing a run of issues one by one and at once
+    """
+    library = buildLibrary (size)
+    customer = myLibrary.Customer (1, "Israel Israeli", 547000000)
+    library.add (customer)
+    def scan ():
+        return sorted ((resource for resource in library.resources if resource.type == "Magazine" and resource.publisher == "Publisher 7" and resource.name == "Magazine 7" and 500000 <= resource.serialNumber <= 600000), key = lambda magazine: magazine.serialNumber)
+    def oneByOne ():
+        for magazine in library.availableIssues ("Publisher 7", "Magazine 7", 500000, 600000) [:run]:
+            library.borrowResource (customer, magazine)
+        library.returnMany (customer, list (library.borrowing [customer.id]))
+    def atOnce ():
+        last = library.issues ("Publisher 7", "Magazine 7", 500000, 600000) [run - 1].serialNumber
+        library.borrowIssues (customer, "Publisher 7", "Magazine 7", 500000, last)
+        library.returnMany (customer, list (library.borrowing [customer.id]))
+    rows = [
+        ("indexes made", *measure (lambda: library.latestIssue ("Publisher 7", "Magazine 7"), 1)),
+        ("issues in a range (scan)", *measure (scan, 3)),
+        ("issues in a range (sorted)", *measure (lambda: library.issues ("Publisher 7", "Magazine 7", 500000, 600000), 100)),
+        ("latest issue", *measure (lambda: library.latestIssue ("Publisher 7", "Magazine 7"), 1000)),
+        (f"borrow {run} issues one by one", *measure (oneByOne, 100)),
+        (f"borrow {run} issues at once", *measure (atOnce, 100)),
+    ]
+    report (f"issues - {size:,} resources", rows)
+
+def benchmarkPages (sizes = (10 ** 5, 10 ** 6), page = 20):
+    """
+    Compare a page of the catalogue cut from the full lists with a page from the iterators
+    """
+    for size in sizes:
+        library = buildLibrary (size)
+        middle = library.resources [size // 2].id
+        rows = [
+            ("first page of Books (availables)", *measure (lambda: library.availables ("Book") [:page], 10)),
+            ("first page of Books (iterator)", *measure (lambda: list (library.iterAvailables ("Book", limit = page)), 1000)),
+            ("first page of all types (availables)", *measure (lambda: next (iter (library.availables ().values ())) [:page], 10)),
+            ("first page of all types (iterator)", *measure (lambda: list (library.iterAvailables (limit = page)), 1000)),
+            ("page in the middle (list)", *measure (lambda: (lambda resources: resources [resources.index (library.search (middle)) + 1:][:page]) (list (library.resources)), 10)),
+            ("page in the middle (iterator)", *measure (lambda: list (library.iterResources (afterId = middle, limit = page)), 1000)),
+        ]
+        report (f"pages - {size:,} resources", rows)
+
+BENCHMARKS = {
+    "views": benchmarkViews,
+    "load": benchmarkLoad,
+    "memory": benchmarkMemory,
+    "searchText": benchmarkSearchText,
+    "snapshot": benchmarkSnapshot,
+    "journal": benchmarkJournal,
+    "threads": benchmarkThreads,
+    "async": benchmarkAsync,
+    "shards": benchmarkShards,
+    "dues": benchmarkDues,
+    "holds": benchmarkHolds,
+    "repairs": benchmarkRepairs,
+    "columns": benchmarkColumns,
+    "query": benchmarkQuery,
+    "issues": benchmarkIssues,
+    "pages": benchmarkPages,
+}
+
+if __name__ == "__main__":
+    names = sys.argv [1:] or list (BENCHMARKS)
+    for name in names:
+        BENCHMARKS [name] ()
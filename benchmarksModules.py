@@ -0,0 +1,241 @@
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+from array import array
+import tracemalloc
+import libraryBackends
+from benchmarks import makeResources
+"""
+The same workloads run against every implementation of the library, through the backends of libraryBackends
+the results are written as JSON, and compared with a baseline to find the regressions
+python benchmarksModules.py [--sizes 1000 10000] [--modules myLibrary gptLibrary] [--output results.json] [--baseline baseline.json]
+"""
+
+SIZES = (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6)
+OPERATIONS = 10 ** 4 #the most operations of a workload
+SECONDS = 1.0 #the most time of a workload, a slow module does less operations
+BUILD_SECONDS = 60.0 #the most time to add the resources, a slower module is stopped at this size
+CHUNK = 1000 #the resources added in one step of the add workload
+TOLERANCE = 0.3 #a result worse than the baseline by more than this ratio is a regression
+TYPES = libraryBackends.TYPES
+
+def addMany (library, items):
+    """
+    This function adds the items with addMany when the library has it, else one by one
+    """
+    if hasattr (library, "addMany"):
+        library.addMany (items)
+    else:
+        for item in items:
+            library.add (item)
+
+def summary (operations, seconds, latencies, peak):
+    """
+    This function returns the result of a workload: operations, ops per second, p99 latency in seconds and peak memory in bytes
+    """
+    latencies = sorted (latencies)
+    p99 = latencies [min (len (latencies) - 1, int (len (latencies) * 0.99))] if len (latencies) > 0 else None
+    return {
+        "operations": operations,
+        "opsPerSecond": operations / seconds if seconds > 0 else None,
+        "p99": p99,
+        "peakBytes": peak,
+    }
+
+def timed (operation, arguments, deadline, latencies):
+    """
+    This function runs operation on every arguments until the deadline
+    the latencies are written in an array made before, so measuring adds no memory to the peak of the workload
+    return the count of operations, the total time and the latency of every operation
+    """
+    done = 0
+    for argument in arguments:
+        start = time.perf_counter ()
+        operation (*argument)
+        latencies [done] = time.perf_counter () - start
+        done += 1
+        if start > deadline:
+            break
+    latencies = memoryview (latencies) [:done]
+    return done, sum (latencies), latencies
+
+def workloadAdd (state):
+    """
+    Add the resources CHUNK at a time, the latency is the time of one resource in its chunk
+    """
+    library, resources = state ["library"], state ["resources"]
+    deadline = time.perf_counter () + BUILD_SECONDS
+    added = 0
+    seconds = 0.0
+    latencies = state ["latencies"]
+    for start in range (0, len (resources), CHUNK):
+        chunk = resources [start:start + CHUNK]
+        begin = time.perf_counter ()
+        addMany (library, chunk)
+        spent = time.perf_counter () - begin
+        added += len (chunk)
+        seconds += spent
+        latencies [start // CHUNK] = spent / len (chunk)
+        if begin + spent > deadline and added < len (resources):
+            raise TimeoutError (f"stopped after {added:,} resources")
+    addMany (library, state ["customers"])
+    return added, seconds, memoryview (latencies) [:(added + CHUNK - 1) // CHUNK]
+
+def workloadBorrow (state):
+    """
+    Borrow a random resource to a random customer and return it
+    """
+    library, resources, customers, random = state ["library"], state ["resources"], state ["customers"], state ["random"]
+    def loan (customer, resource):
+        library.borrowResource (customer, resource)
+        library.returnResource (customer, resource)
+    pairs = ((random.choice (customers), random.choice (resources)) for i in range (OPERATIONS))
+    return timed (loan, pairs, time.perf_counter () + SECONDS, state ["latencies"])
+
+def workloadAvailables (state):
+    """
+    Get the available resources of every type in turn
+    """
+    types = ((TYPES [i % len (TYPES)],) for i in range (OPERATIONS))
+    return timed (state ["library"].availables, types, time.perf_counter () + SECONDS, state ["latencies"])
+
+def workloadSearch (state):
+    """
+    Search resources by random ids
+    """
+    library, resources, random = state ["library"], state ["resources"], state ["random"]
+    ids = ((random.choice (resources).id,) for i in range (OPERATIONS))
+    return timed (library.search, ids, time.perf_counter () + SECONDS, state ["latencies"])
+
+def workloadRemove (state):
+    """
+    Remove resources in a random order
+    """
+    library, resources, random = state ["library"], state ["resources"], state ["random"]
+    order = random.sample (resources, min (OPERATIONS, len (resources)))
+    return timed (library.removeResource, ((resource.id,) for resource in order), time.perf_counter () + SECONDS, state ["latencies"])
+
+WORKLOADS = {
+    "add": workloadAdd,
+    "borrowReturn": workloadBorrow,
+    "availables": workloadAvailables,
+    "search": workloadSearch,
+    "remove": workloadRemove,
+}
+
+def runScenario (backend, size, traceMemory):
+    """
+    This function runs all the workloads one after the other on a new library of size resources
+    return a dict of results by workload, the peak memory is measured only with traceMemory, because tracing slows the code
+    a workload that fails gives its error, and the workloads after a failed add are not run
+    """
+    state = {
+        "library": backend.Library (),
+        "resources": makeResources (size, backend),
+        "customers": [backend.Customer (i, f"Customer {i}", 547000000 + i) for i in range (100)],
+        "random": random.Random (size),
+        "latencies": array ("d", bytes (8 * max (OPERATIONS, size // CHUNK + 1))),
+    }
+    results = dict ()
+    for name, workload in WORKLOADS.items ():
+        if traceMemory:
+            tracemalloc.start ()
+        try:
+            operations, seconds, latencies = workload (state)
+            peak = tracemalloc.get_traced_memory () [1] if traceMemory else None
+            results [name] = summary (operations, seconds, latencies, peak)
+        except Exception as error:
+            results [name] = {"error": f"{type (error).__name__}: {error}"}
+        finally:
+            if traceMemory:
+                tracemalloc.stop ()
+        if name == "add" and "error" in results [name]:
+            break
+    return results
+
+def run (modules = None, sizes = SIZES):
+    """
+    This function runs every size on every backend of libraryBackends, or on the backends named in modules
+    the time is measured in a first run and the memory in a second run
+    a module that fails to add the resources at one size is not run at the larger sizes
+    return the results in a dict ready for JSON
+    """
+    results = dict ()
+    for module in libraryBackends.names () if modules is None else modules:
+        backend = libraryBackends.backend (module)
+        results [module] = dict ()
+        for size in sizes:
+            scenario = runScenario (backend, size, False)
+            memory = runScenario (backend, size, True)
+            for name, result in scenario.items ():
+                if "error" not in result and "error" not in memory.get (name, {"error": None}):
+                    result ["peakBytes"] = memory [name] ["peakBytes"]
+            results [module] [str (size)] = scenario
+            if "error" in scenario ["add"]:
+                break
+    return {
+        "python": platform.python_version (),
+        "machine": platform.machine (),
+        "platform": platform.platform (),
+        "results": results,
+    }
+
+def regressions (current, baseline, tolerance = TOLERANCE):
+    """
+    This function compares results with a baseline, the two in the format of run
+    return a list of strings, one for every result worse than the baseline by more than tolerance
+    less operations per second, a higher p99 or more peak memory, or an error where the baseline had none
+    """
+    found = []
+    for module, sizes in current ["results"].items ():
+        for size, workloads in sizes.items ():
+            for name, result in workloads.items ():
+                base = baseline ["results"].get (module, dict ()).get (size, dict ()).get (name)
+                if base is None or "error" in base:
+                    continue
+                where = f"{module} {name} at {int (size):,}"
+                if "error" in result:
+                    found.append (f"{where}: {result ['error']}")
+                    continue
+                if result ["opsPerSecond"] is not None and base ["opsPerSecond"] is not None and result ["opsPerSecond"] < base ["opsPerSecond"] * (1 - tolerance):
+                    found.append (f"{where}: {result ['opsPerSecond']:,.0f} ops/s, baseline {base ['opsPerSecond']:,.0f}")
+                if result ["p99"] is not None and base ["p99"] is not None and result ["p99"] > base ["p99"] * (1 + tolerance):
+                    found.append (f"{where}: p99 {result ['p99'] * 1e6:,.2f} us, baseline {base ['p99'] * 1e6:,.2f} us")
+                if result ["peakBytes"] is not None and base ["peakBytes"] is not None and result ["peakBytes"] > base ["peakBytes"] * (1 + tolerance):
+                    found.append (f"{where}: peak {result ['peakBytes']:,} bytes, baseline {base ['peakBytes']:,} bytes")
+    return found
+
+def printResults (results):
+    for module, sizes in results ["results"].items ():
+        for size, workloads in sizes.items ():
+            print (f"{module} - {int (size):,} resources")
+            for name, result in workloads.items ():
+                if "error" in result:
+                    print (f"\t{name:<14} {result ['error']}")
+                else:
+                    peak = "" if result ["peakBytes"] is None else f"{result ['peakBytes']:>14,} bytes"
+                    print (f"\t{name:<14} {result ['opsPerSecond']:>14,.0f} ops/s {result ['p99'] * 1e6:>12.2f} us p99 {peak}")
+            print ()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser (description = "Run the same workloads on every implementation of the library")
+    parser.add_argument ("--modules", nargs = "+", choices = libraryBackends.names (), default = libraryBackends.names ())
+    parser.add_argument ("--sizes", nargs = "+", type = int, default = list (SIZES))
+    parser.add_argument ("--output", help = "the JSON file of the results")
+    parser.add_argument ("--baseline", help = "a JSON file of results to compare with, the exit code is 1 if a regression is found")
+    parser.add_argument ("--tolerance", type = float, default = TOLERANCE)
+    arguments = parser.parse_args ()
+    results = run (arguments.modules, arguments.sizes)
+    printResults (results)
+    if arguments.output:
+        with open (arguments.output, "w") as file:
+            json.dump (results, file, indent = 1)
+    if arguments.baseline:
+        with open (arguments.baseline) as file:
+            found = regressions (results, json.load (file), arguments.tolerance)
+        for regression in found:
+            print ("regression:", regression)
+        sys.exit (1 if len (found) > 0 else 0)
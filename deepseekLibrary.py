@@ -1,4 +1,5 @@
 # this is the code generated by DeepSeek
+# Some changes were made after the generation: the availables are kept in an index by status and the loans in dicts
 # i can not share the chat
 class Customer:
     def __init__(self, id: int, name: str, telephone: int):
@@ -46,6 +47,7 @@ class Resource:
         self.__name = name
         self.__year = year
         self.__status = "available"
+        self.__libraries = ()
 
     @property
     def id(self):
@@ -81,21 +83,35 @@ class Resource:
     def status(self):
         return self.__status
 
+    def _attach(self, library):
+        # a resource added twice to the same library is told once about its changes
+        if not any(l is library for l in self.__libraries):
+            self.__libraries += (library,)
+
+    def _detach(self, library):
+        self.__libraries = tuple(l for l in self.__libraries if l is not library)
+
+    def __set_status(self, status: str):
+        old_status = self.__status
+        self.__status = status
+        for library in self.__libraries:
+            library._status_changed(self, old_status)
+
     def borrow(self):
         if self.__status == "available":
-            self.__status = "borrowed"
+            self.__set_status("borrowed")
             return True
         return False
 
     def returning(self):
         if self.__status in ["borrowed", "under repair"]:
-            self.__status = "available"
+            self.__set_status("available")
             return True
         return False
 
     def repair(self):
         if self.__status == "available":
-            self.__status = "under repair"
+            self.__set_status("under repair")
             return True
         return False
 
@@ -198,7 +214,12 @@ class Library:
     def __init__(self):
         self.__customers = []
         self.__resources = []
+        # customer id -> {resource: None} used as an ordered set, and resource -> the customer who borrowed it
         self.__borrowing = {}
+        self.__borrowers = {}
+        # (type, status) -> {resource: None} used as an ordered set, kept up to date by the resources
+        # keyed by the resource itself because the id of a resource can be changed
+        self.__index = {}
 
     @property
     def customers(self):
@@ -210,7 +231,7 @@ class Library:
 
     @property
     def borrowing(self):
-        return self.__borrowing
+        return {id: list(loans) for id, loans in self.__borrowing.items()}
 
     def add(self, item):
         if isinstance(item, Customer):
@@ -221,6 +242,8 @@ class Library:
             if any(resource.id == item.id for resource in self.__resources):
                 raise ValueError("Resource with this ID already exists.")
             self.__resources.append(item)
+            self.__index.setdefault((item.type, item.status), {})[item] = None
+            item._attach(self)
         else:
             raise ValueError("Invalid item type.")
 
@@ -240,6 +263,8 @@ class Library:
         if resource.status != "available":
             raise ValueError("Resource is not available and cannot be removed.")
         self.__resources.remove(resource)
+        del self.__index[(resource.type, resource.status)][resource]
+        resource._detach(self)
         return True
 
     def borrowResource(self, customer: Customer, resource: Resource):
@@ -251,8 +276,9 @@ class Library:
             raise ValueError("Resource is not available for borrowing.")
         if resource.borrow():
             if customer.id not in self.__borrowing:
-                self.__borrowing[customer.id] = []
-            self.__borrowing[customer.id].append(resource)
+                self.__borrowing[customer.id] = {}
+            self.__borrowing[customer.id][resource] = None
+            self.__borrowers[resource] = customer
             return True
         return False
 
@@ -264,20 +290,27 @@ class Library:
         if customer.id not in self.__borrowing or resource not in self.__borrowing[customer.id]:
             raise ValueError("Customer did not borrow this resource.")
         if resource.returning():
-            self.__borrowing[customer.id].remove(resource)
+            del self.__borrowing[customer.id][resource]
+            del self.__borrowers[resource]
             return True
         return False
 
+    def borrower(self, resource: Resource):
+        return self.__borrowers.get(resource)
+
     def availables(self, resource_type: str = None):
         if resource_type:
-            return [resource for resource in self.__resources if resource.status == "available" and resource.type == resource_type]
+            return list(self.__index.get((resource_type, "available"), {}))
         else:
             return {
-                "Book": [resource for resource in self.__resources if resource.status == "available" and resource.type == "Book"],
-                "Disk": [resource for resource in self.__resources if resource.status == "available" and resource.type == "Disk"],
-                "Magazine": [resource for resource in self.__resources if resource.status == "available" and resource.type == "Magazine"]
+                resource_type: list(self.__index.get((resource_type, "available"), {}))
+                for resource_type in ("Book", "Disk", "Magazine")
             }
 
+    def _status_changed(self, resource: Resource, old_status: str):
+        del self.__index[(resource.type, old_status)][resource]
+        self.__index.setdefault((resource.type, resource.status), {})[resource] = None
+
 
 if __name__ == "__main__":
     library = Library()
@@ -1,6 +1,32 @@
 # This code is generated by Gemini
 # Some correction was made to allow the code to run without errors, but most of it is originally from there
+# Later changes: read only views instead of copies, and the availables kept in an index by status
 # https://g.co/gemini/share/595d3c9116c0
+from collections.abc import Sequence
+
+
+class ReadOnlyList(Sequence):
+    """
+    Read-only view over a list, returned instead of a copy
+    """
+    def __init__(self, items):
+        self.__items = items
+
+    def __len__(self):
+        return len(self.__items)
+
+    def __getitem__(self, index):
+        return self.__items[index]
+
+    def __iter__(self):
+        return iter(self.__items)
+
+    def __contains__(self, item):
+        return item in self.__items
+
+    def __repr__(self):
+        return repr(self.__items)
+
 class Customer:
     def __init__(self, id, name, telephone):
         self.__id = id
@@ -47,6 +73,7 @@ class Resource:
         self.__id = id
         self.__name = name
         self.__status = status
+        self.__libraries = ()  # ספריות שצריך לעדכן כשהמצב משתנה
     
     @property
     def name(self):
@@ -56,22 +83,36 @@ class Resource:
     def status(self):
         return self.__status
 
+    def _attach(self, library):
+        # a resource added twice to the same library is told once about its changes
+        if not any(l is library for l in self.__libraries):
+            self.__libraries += (library,)
+
+    def _detach(self, library):
+        self.__libraries = tuple(l for l in self.__libraries if l is not library)
+
+    def __set_status(self, status):
+        old_status = self.__status
+        self.__status = status
+        for library in self.__libraries:
+            library._status_changed(self, old_status)
+
     # Common methods for all resources
     def borrow(self):
         if self.__status == "available":
-            self.__status = "borrowed"
+            self.__set_status("borrowed")
             return True
         return False
 
     def returning(self):
         if self.__status in ["borrowed", "under repair"]:
-            self.__status = "available"
+            self.__set_status("available")
             return True
         return False
 
     def repair(self):
         if self.__status == "available":
-            self.__status = "under repair"
+            self.__set_status("under repair")
             return True
         return False
 
@@ -265,17 +306,20 @@ class Library:
         self.__customers = []
         self.__resources = []
         self.__borrowing = {}
+        # (מחלקה, מצב) -> {משאב: None}, מתעדכן על ידי המשאבים עצמם
+        self.__index = {}
 
     @property
     def resources(self):
-        return self.__resources.copy()  # מחזיר עותק של הרשימה כדי למנוע שינויים חיצוניים
+        return ReadOnlyList(self.__resources)  # מחזיר תצוגה לקריאה בלבד במקום עותק של הרשימה
 
     @property
     def customers(self):
-        return self.__customers.copy()
+        return ReadOnlyList(self.__customers)
 
     @property
     def borrowing(self):
+        # same rule as myLibrary: a new dict, as tests.py expects, with the lists of the library in it
         return self.__borrowing.copy()
 
     # ... methods for adding, removing, borrowing, and returning resources
@@ -285,6 +329,8 @@ class Library:
             self.__customers.append(item)
         elif isinstance(item, Resource):
             self.__resources.append(item)
+            self.__index.setdefault((type(item), item.status), {})[item] = None
+            item._attach(self)
         else:
             raise TypeError("Invalid item type")
 
@@ -303,6 +349,8 @@ class Library:
         for i, resource in enumerate(self.__resources):
             if resource.id == resource_id:
                 del self.__resources[i]
+                del self.__index[(type(resource), resource.status)][resource]
+                resource._detach(self)
                 # הסרת המשאב מכל ההשאלות
                 for customer_id, borrowed_resources in self.__borrowing.items():
                     if resource in borrowed_resources:
@@ -340,12 +388,16 @@ class Library:
 
     def availables(self, resource_type=None):
         available_resources = []
-        for resource in self.__resources:
-            if resource.status == "available":
-                if resource_type is None or isinstance(resource, resource_type):
-                    available_resources.append(resource)
+        for (cls, status), resources in self.__index.items():
+            if status == "available":
+                if resource_type is None or issubclass(cls, resource_type):
+                    available_resources.extend(resources)
         return available_resources
 
+    def _status_changed(self, resource, old_status):
+        del self.__index[(type(resource), old_status)][resource]
+        self.__index.setdefault((type(resource), resource.status), {})[resource] = None
+
     def get_customer_borrowings(self, customer_id):
         if customer_id in self.__borrowing:
             return self.__borrowing[customer_id]
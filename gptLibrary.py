@@ -1,5 +1,6 @@
 # Module: library_management.py
 # This is the code generated by ChatGPT
+# Some changes were made after the generation: the availables are kept in an index by status and the loans in dicts
 # https://chatgpt.com/share/6746f2a2-834c-8005-ac0e-222ca23b4f1b
 
 class Customer:
@@ -51,6 +52,7 @@ class Resource:
         self.__id = id
         self.__name = name
         self.__status = status
+        self.__libraries = ()
 
     @property
     def id(self):
@@ -64,21 +66,35 @@ class Resource:
     def status(self):
         return self.__status
 
+    def _attach(self, library):
+        # a resource added twice to the same library is told once about its changes
+        if not any(l is library for l in self.__libraries):
+            self.__libraries += (library,)
+
+    def _detach(self, library):
+        self.__libraries = tuple(l for l in self.__libraries if l is not library)
+
+    def __set_status(self, status):
+        old_status = self.__status
+        self.__status = status
+        for library in self.__libraries:
+            library._status_changed(self, old_status)
+
     def borrow(self):
         if self.status == "available":
-            self.__status = "borrowed"
+            self.__set_status("borrowed")
             return True
         return False
 
     def returning(self):
         if self.status in {"borrowed", "under repair"}:
-            self.__status = "available"
+            self.__set_status("available")
             return True
         return False
 
     def repair(self):
         if self.status == "available":
-            self.__status = "under repair"
+            self.__set_status("under repair")
             return True
         return False
 
@@ -158,7 +174,11 @@ class Library:
     def __init__(self):
         self.__customers = []
         self.__resources = []
+        # customer id -> {resource id: resource}, and resource id -> the customer who borrowed it
         self.__borrowing = {}
+        self.__borrowers = {}
+        # (type, status) -> {resource id: resource}, kept up to date by the resources
+        self.__index = {}
 
     @property
     def customers(self):
@@ -170,18 +190,20 @@ class Library:
 
     @property
     def borrowing(self):
-        return self.__borrowing
+        return {id: list(loans.values()) for id, loans in self.__borrowing.items()}
 
     def add(self, obj):
         if isinstance(obj, Customer):
             if any(c.id == obj.id for c in self.__customers):
                 raise ValueError("Customer with this ID already exists.")
             self.__customers.append(obj)
-            self.__borrowing[obj.id] = []
+            self.__borrowing[obj.id] = {}
         elif isinstance(obj, Resource):
             if any(r.id == obj.id for r in self.__resources):
                 raise ValueError("Resource with this ID already exists.")
             self.__resources.append(obj)
+            self.__index.setdefault((obj.type, obj.status), {})[obj.id] = obj
+            obj._attach(self)
         else:
             raise TypeError("Object must be a Customer or Resource.")
 
@@ -202,6 +224,8 @@ class Library:
         if resource.status != "available":
             raise ValueError("Cannot remove resource that is not available.")
         self.__resources.remove(resource)
+        del self.__index[(resource.type, resource.status)][resource.id]
+        resource._detach(self)
         return True
 
     def borrowResource(self, customer, resource):
@@ -211,29 +235,36 @@ class Library:
             raise ValueError("Customer or resource not registered.")
         if not resource.borrow():
             raise ValueError("Resource is not available.")
-        self.__borrowing[customer.id].append(resource)
+        self.__borrowing[customer.id][resource.id] = resource
+        self.__borrowers[resource.id] = customer
         return True
 
     def returnResource(self, customer, resource):
         if not isinstance(customer, Customer) or not isinstance(resource, Resource):
             raise TypeError("Invalid object types.")
-        if resource not in self.__borrowing.get(customer.id, []):
+        if self.__borrowing.get(customer.id, {}).get(resource.id) is not resource:
             raise ValueError("Customer did not borrow this resource.")
         if not resource.returning():
             raise ValueError("Cannot return resource.")
-        self.__borrowing[customer.id].remove(resource)
+        del self.__borrowing[customer.id][resource.id]
+        del self.__borrowers[resource.id]
         return True
 
+    def borrower(self, resource_id):
+        return self.__borrowers.get(resource_id)
+
     def availables(self, resource_type=None):
-        available_resources = [r for r in self.__resources if r.status == "available"]
         if resource_type:
-            return [r for r in available_resources if r.type == resource_type]
+            return list(self.__index.get((resource_type, "available"), {}).values())
         return {
-            "Book": [r for r in available_resources if isinstance(r, Book)],
-            "Disk": [r for r in available_resources if isinstance(r, Disk)],
-            "Magazine": [r for r in available_resources if isinstance(r, Magazine)],
+            t: list(self.__index.get((t, "available"), {}).values())
+            for t in ("Book", "Disk", "Magazine")
         }
 
+    def _status_changed(self, resource, old_status):
+        del self.__index[(resource.type, old_status)][resource.id]
+        self.__index.setdefault((resource.type, resource.status), {})[resource.id] = resource
+
 
 if __name__ == "__main__":
     library = Library()
@@ -0,0 +1,117 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import myLibrary
+"""
+An asyncio front end for a myLibrary.Library
+the calls made at the same time are run together, in one critical section in a worker thread
+so the event loop never waits for the library or for the journal on the disk
+"""
+
+class AsyncLibrary:
+    """
+    This class gives awaitable methods for a library
+    all the calls to the library should go through it, or the library should be thread safe
+    """
+    def __init__ (self, library = None, batchSize = 1000):
+        self.__library = myLibrary.Library () if library is None else library
+        self.__batchSize = batchSize
+        self.__waiting = [] #(method, arguments, future) of the calls not run yet
+        self.__running = None #the task that runs the waiting calls
+        self.__closed = False
+        #one worker thread, so the batches run one after the other and in the order of the calls
+        self.__executor = ThreadPoolExecutor (max_workers = 1)
+
+    @property
+    def library (self):
+        return self.__library
+
+    async def add (self, item):
+        return await self.__call (self.__library.add, item)
+
+    async def borrowResource (self, customer, resource):
+        return await self.__call (self.__library.borrowResource, customer, resource)
+
+    async def returnResource (self, customer, resource):
+        return await self.__call (self.__library.returnResource, customer, resource)
+
+    async def availables (self, resourceType = None):
+        return await self.__call (self.__library.availables, resourceType)
+
+    async def search (self, id):
+        return await self.__call (self.__library.search, id)
+
+    async def __call (self, method, *arguments):
+        """
+        This method adds a call to the waiting calls and returns its result when the batch with it was run
+        """
+        if self.__closed:
+            raise RuntimeError ("the async library is closed")
+        future = asyncio.get_running_loop ().create_future ()
+        self.__waiting.append ((method, arguments, future))
+        if self.__running is None:
+            self.__running = asyncio.ensure_future (self.__drain ())
+        return await future
+
+    async def __drain (self):
+        """
+        This method runs the waiting calls in batches, until no call is waiting
+        """
+        loop = asyncio.get_running_loop ()
+        try:
+            while len (self.__waiting) > 0:
+                batch = self.__waiting [:self.__batchSize]
+                del self.__waiting [:self.__batchSize]
+                try:
+                    results = await loop.run_in_executor (self.__executor, self.__runBatch, batch)
+                except BaseException as error:
+                     #the batch did not run, its calls and the calls still waiting get the error
+                    pending = batch + self.__waiting
+                    self.__waiting = []
+                    for method, arguments, future in pending:
+                        if not future.done ():
+                            future.set_exception (error if isinstance (error, Exception) else RuntimeError ("the batch was stopped"))
+                    if not isinstance (error, Exception):
+                        raise
+                    return
+                for (method, arguments, future), (done, value) in zip (batch, results):
+                    if future.cancelled ():
+                        continue
+                    if done:
+                        future.set_result (value)
+                    else:
+                        future.set_exception (value)
+        finally:
+            self.__running = None
+
+    def __runBatch (self, batch):
+        """
+        This method runs the calls of a batch in the worker thread
+        return a list of (True, result) or (False, error) for every call
+        with a journal in batch policy, the records of the batch are written and synced once before the results are given
+        """
+        results = []
+        with self.__library.exclusive ():
+            for method, arguments, future in batch:
+                try:
+                    results.append ((True, method (*arguments)))
+                except Exception as error:
+                    results.append ((False, error))
+        journal = self.__library.journal
+        if journal is not None and getattr (journal, "sync", None) == "batch":
+            journal.flush ()
+        return results
+
+    async def close (self):
+        """
+        This method waits for the waiting calls and stops the worker thread, the calls after it raise an error
+        """
+        self.__closed = True
+        if self.__running is not None:
+            await self.__running
+        self.__executor.shutdown ()
+
+    async def __aenter__ (self):
+        return self
+
+    async def __aexit__ (self, *exception):
+        await self.close ()
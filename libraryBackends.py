@@ -0,0 +1,239 @@
+import os
+import importlib
+from typing import Protocol, runtime_checkable
+"""
+The implementations of the library behind one protocol, chosen by name at runtime
+myLibrary follows the protocol as it is, the modules made by the LLMs are wrapped to give the same results
+backend () returns the backend named in the environment variable LIBRARY_BACKEND, or myLibrary
+a backend registered with conforms = False is known to fail some checks of conformance, like geminiLibrary
+"""
+
+DEFAULT = "myLibrary"
+TYPES = ("Book", "Disk", "Magazine")
+
+@runtime_checkable
+class LibraryBackend (Protocol):
+    """
+    The methods of a library that a backend must give, with the results of myLibrary.Library
+    customers and resources are sequences, borrowing is a dict of customer id -> list of the resources borrowed
+    availables () is a dict of type -> list of the available resources, only for the types with available resources
+    availables (type) is a list, and search (id) returns the resource or None
+    borrowResource and returnResource return True, and raise an error when they cannot be done
+    """
+    @property
+    def customers (self): ...
+
+    @property
+    def resources (self): ...
+
+    @property
+    def borrowing (self): ...
+
+    def add (self, item): ...
+
+    def removeCustomer (self, id): ...
+
+    def removeResource (self, id): ...
+
+    def borrowResource (self, customer, resource): ...
+
+    def returnResource (self, customer, resource): ...
+
+    def availables (self, resourceType = None): ...
+
+    def search (self, id): ...
+
+
+class ModuleLibrary:
+    """
+    This class gives the protocol of LibraryBackend over the Library of a module that has other results
+    """
+    def __init__ (self, module):
+        self.__module = module
+        self.__library = module.Library ()
+
+    @property
+    def module (self):
+        return self.__module
+
+    @property
+    def library (self):
+        return self.__library
+
+    @property
+    def customers (self):
+        return self.__library.customers
+
+    @property
+    def resources (self):
+        return self.__library.resources
+
+    @property
+    def borrowing (self):
+        loans = {getattr (customer, "id", customer): list (resources) for customer, resources in self.__library.borrowing.items ()}
+        return {customer.id: loans.get (customer.id, []) for customer in self.__library.customers}
+
+    def add (self, item):
+        self.__library.add (item)
+
+    def removeCustomer (self, id):
+        return self.__library.removeCustomer (id)
+
+    def removeResource (self, id):
+        return self.__library.removeResource (id)
+
+    def borrowResource (self, customer, resource):
+        if self.__library.borrowResource (customer, resource) is False:
+            raise ValueError (f"cannot borrow this {resource.type}")
+        return True
+
+    def returnResource (self, customer, resource):
+        if self.__library.returnResource (customer, resource) is False:
+            raise ValueError (f"cannot return this {resource.type}")
+        return True
+
+    def _availables (self, resourceType):
+        return list (self.__library.availables (resourceType))
+
+    def availables (self, resourceType = None):
+        if resourceType:
+            return self._availables (resourceType)
+        resources = dict ()
+        for resourceType in TYPES:
+            typeResources = self._availables (resourceType)
+            if len (typeResources) > 0:
+                resources [resourceType] = typeResources
+        return resources
+
+    def search (self, id):
+        return next ((resource for resource in self.__library.resources if resource.id == id), None)
+
+
+class ClassFilterLibrary (ModuleLibrary):
+    """
+    A library whose availables takes the class of the resources and not the name of the type, like geminiLibrary
+    """
+    def _availables (self, resourceType):
+        return list (self.library.availables (getattr (self.module, resourceType)))
+
+
+class Backend:
+    """
+    This class is an implementation of the library: its module, with the classes of the items, and a function that makes a library
+    """
+    def __init__ (self, name, moduleName, makeLibrary, conforms = True):
+        self.__name = name
+        self.__moduleName = moduleName
+        self.__makeLibrary = makeLibrary
+        self.__conforms = conforms
+        self.__module = None #imported at the first use
+
+    @property
+    def name (self):
+        return self.__name
+
+    @property
+    def conforms (self):
+        """
+        False for a backend that does not give all the results of the protocol, its results are not those of the other backends
+        """
+        return self.__conforms
+
+    @property
+    def module (self):
+        if self.__module is None:
+            self.__module = importlib.import_module (self.__moduleName)
+        return self.__module
+
+    def Library (self):
+        return self.__makeLibrary (self.module)
+
+    def Customer (self, *arguments):
+        return self.module.Customer (*arguments)
+
+    def Book (self, *arguments):
+        return self.module.Book (*arguments)
+
+    def Disk (self, *arguments):
+        return self.module.Disk (*arguments)
+
+    def Magazine (self, *arguments):
+        return self.module.Magazine (*arguments)
+
+
+BACKENDS = dict ()
+
+def register (name, moduleName, makeLibrary = lambda module: module.Library (), conforms = True):
+    """
+    This function adds a backend to the registry, or replaces the backend with this name
+    makeLibrary takes the module and returns an object of the protocol LibraryBackend
+    conforms is False for a backend known to fail some checks of conformance
+    """
+    BACKENDS [name] = Backend (name, moduleName, makeLibrary, conforms)
+    return BACKENDS [name]
+
+def backend (name = None):
+    """
+    This function returns the backend with this name, or the backend of LIBRARY_BACKEND if no name is given
+    raise an error if no backend has this name
+    """
+    if name is None:
+        name = os.environ.get ("LIBRARY_BACKEND", DEFAULT)
+    if name not in BACKENDS:
+        raise ValueError (f"unknown library backend {name}, the backends are {', '.join (BACKENDS)}")
+    return BACKENDS [name]
+
+def names (conforming = False):
+    """
+    This function returns the names of the backends, only those that conform to the protocol with conforming
+    """
+    return [name for name, backend in BACKENDS.items () if backend.conforms or not conforming]
+
+register ("myLibrary", "myLibrary")
+register ("gptLibrary", "gptLibrary", ModuleLibrary)
+register ("deepseekLibrary", "deepseekLibrary", ModuleLibrary)
+register ("geminiLibrary", "geminiLibrary", ClassFilterLibrary, False) #its resources have no id, and a return looks for the customer object
+
+def raises (function):
+    try:
+        function ()
+    except Exception:
+        return True
+    return False
+
+def conformance (name):
+    """
+    This function checks that a backend gives the results of the protocol, on a small library
+    return the list of the checks that failed, with their error, empty if the backend conforms
+    a backend registered with conforms = False is checked too, to see what fails
+    """
+    chosen = backend (name)
+    failed = []
+    def check (title, function):
+        try:
+            if function () is False:
+                failed.append (title)
+        except Exception as error:
+            failed.append (f"{title}: {type (error).__name__}: {error}")
+    library = chosen.Library ()
+    customer = chosen.Customer (123456789, "Israel Israeli", 547000000)
+    book = chosen.Book (3, "Harry Potter and the Philosopher Stone", "J.K. Rowling", 1997, "fiction")
+    disk = chosen.Disk (1, "Shetah Afor", "Ishay Ribo", 2018)
+    magazine = chosen.Magazine (452, "Maariv Lanoar", "Maariv", 32)
+    check ("protocol", lambda: isinstance (library, LibraryBackend))
+    def add ():
+        for item in (customer, book, disk, magazine):
+            library.add (item)
+        return len (library.customers) == 1 and len (library.resources) == 3
+    check ("add", add)
+    check ("search", lambda: library.search (book.id) is book and library.search ("B999") is None)
+    check ("availables", lambda: library.availables ("Book") == [book] and library.availables () == {"Book": [book], "Disk": [disk], "Magazine": [magazine]})
+    check ("borrowing", lambda: library.borrowing == {customer.id: []})
+    check ("borrow", lambda: library.borrowResource (customer, book) is True and library.borrowing [customer.id] == [book] and library.availables ("Book") == [])
+    check ("borrow twice", lambda: raises (lambda: library.borrowResource (customer, book)))
+    check ("remove borrowed", lambda: raises (lambda: library.removeResource (book.id)) and raises (lambda: library.removeCustomer (customer.id)))
+    check ("return", lambda: library.returnResource (customer, book) is True and library.borrowing [customer.id] == [] and library.availables ("Book") == [book])
+    check ("return twice", lambda: raises (lambda: library.returnResource (customer, book)))
+    check ("remove", lambda: library.removeResource (disk.id) is True and library.removeResource (disk.id) is False and library.search (disk.id) is None)
+    check ("remove customer", lambda: library.removeCustomer (customer.id) is True and library.removeCustomer (customer.id) is False)
+    return failed
@@ -0,0 +1,212 @@
+import mmap
+import myLibrary
+import librarySnapshot
+try:
+    import numpy
+except ImportError: #numpy is needed only for this module
+    numpy = None
+"""
+A catalogue of resources kept in columns of NumPy arrays, for analytics and filtering
+every attribute is one array, with one cell for every resource, like the columns of librarySnapshot
+the queries run on whole arrays, and the Book, Disk and Magazine objects are made only when asked for
+"""
+
+#the first letter of the id of every type, in the order of librarySnapshot.TYPES
+PREFIXES = "BDM"
+TYPE_CODES = {cls.__name__: code for cls, code in librarySnapshot.TYPE_CODES.items ()}
+MAGAZINE = TYPE_CODES ["Magazine"]
+
+#the dtype of every column used by the catalogue
+DTYPES = {
+    "stringOffsets": "u8",
+    "stringData": "u1",
+    "resourceTypes": "u1",
+    "resourceIds": "i8",
+    "resourceNames": "u4",
+    "resourceStatus": "u1",
+    "resourceTexts": "u4",
+    "resourceNumbers": "i8",
+    "resourceDepartments": "u4",
+}
+
+class ColumnCatalogue:
+    """
+    This class keeps the resources in columns: type, status, id, year or serialNumber, and numbers of strings
+    the strings are kept once in a table, like in the snapshot
+    the catalogue is a copy: it does not follow the library it was made from, use setStatus to change it
+    """
+    def __init__ (self, columns, mapped = None):
+        """
+        columns is a dict of buffers by name, like librarySnapshot.makeColumns or readColumns returns
+        mapped is the mmap of the file when the columns are read in place from it, it is closed by close
+        """
+        if numpy is None:
+            raise ImportError ("the columnar catalogue needs numpy")
+        self.types = numpy.frombuffer (columns ["resourceTypes"], DTYPES ["resourceTypes"])
+        self.statuses = numpy.array (numpy.frombuffer (columns ["resourceStatus"], DTYPES ["resourceStatus"])) #a copy, it can change
+        self.ids = numpy.frombuffer (columns ["resourceIds"], DTYPES ["resourceIds"])
+        self.numbers = numpy.frombuffer (columns ["resourceNumbers"], DTYPES ["resourceNumbers"]) #year, or serialNumber of a magazine
+        self.names = numpy.frombuffer (columns ["resourceNames"], DTYPES ["resourceNames"])
+        self.texts = numpy.frombuffer (columns ["resourceTexts"], DTYPES ["resourceTexts"]) #author, singer or publisher
+        self.departments = numpy.frombuffer (columns ["resourceDepartments"], DTYPES ["resourceDepartments"])
+        self.__offsets = numpy.frombuffer (columns ["stringOffsets"], DTYPES ["stringOffsets"])
+        self.__text = str (columns ["stringData"], "utf-8", "surrogatepass")
+        self.__numbers = None #string -> number in the table, made at the first query by string
+        self.__keys = None #sorted keys of the ids with their positions, made at the first search by id
+        self.__materialized = dict () #position -> resource
+        self.__mapped = mapped
+        self.__columns = columns if mapped is not None else None #the views on the file, released by close
+
+    @classmethod
+    def fromLibrary (cls, library):
+        return cls (librarySnapshot.makeColumns (library))
+
+    @classmethod
+    def load (cls, path, useMmap = False):
+        """
+        This method makes a catalogue from a snapshot file, with useMmap the columns are read in place from the file
+        close the catalogue, or use it in a with statement, to close the file mapped in memory
+        """
+        with open (path, "rb") as file:
+            if not useMmap:
+                return cls (librarySnapshot.readColumns (memoryview (file.read ())))
+            mapped = mmap.mmap (file.fileno (), 0, access = mmap.ACCESS_READ)
+        return cls (librarySnapshot.readColumns (memoryview (mapped)), mapped)
+
+    def close (self):
+        """
+        This method closes the file of a catalogue loaded with useMmap, the catalogue cannot be used after
+        a catalogue that is not read from a file in place has nothing to close
+        """
+        if self.__mapped is None:
+            return
+         #the arrays on the file must be dropped before closing it
+        self.types = self.ids = self.numbers = self.names = self.texts = self.departments = self.__offsets = self.__keys = None
+        for column in self.__columns.values ():
+            if isinstance (column, memoryview):
+                column.release ()
+        self.__columns = None
+        self.__mapped.close ()
+        self.__mapped = None
+
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, *exception):
+        self.close ()
+
+    def __len__ (self):
+        return len (self.types)
+
+    def string (self, number):
+        """
+        This method returns the string with this number in the table
+        """
+        return self.__text [self.__offsets [number]:self.__offsets [number + 1]]
+
+    def __stringNumber (self, value):
+        if self.__numbers is None:
+            self.__numbers = {self.string (number): number for number in range (len (self.__offsets) - 1)}
+        return self.__numbers.get (value) #None if no resource has this string
+
+    def select (self, type = None, status = None, years = None, serialNumbers = None, text = None, department = None):
+        """
+        This method returns the positions of the resources that match all the criteria given
+        type is "Book", "Disk" or "Magazine", status is a myLibrary.Status
+        years and serialNumbers are ranges (first, last) with both ends included, a year is not checked on magazines
+        text is the author, the singer or the publisher
+        a text or a department that no resource has selects nothing
+        """
+        mask = numpy.ones (len (self), dtype = bool)
+        if type is not None:
+            mask &= self.types == TYPE_CODES [type]
+        if status is not None:
+            mask &= self.statuses == status
+        if years is not None:
+            mask &= (self.types != MAGAZINE) & (self.numbers >= years [0]) & (self.numbers <= years [1])
+        if serialNumbers is not None:
+            mask &= (self.types == MAGAZINE) & (self.numbers >= serialNumbers [0]) & (self.numbers <= serialNumbers [1])
+        if text is not None:
+            number = self.__stringNumber (text)
+            mask &= False if number is None else self.texts == number
+        if department is not None:
+            number = self.__stringNumber (department)
+            mask &= False if number is None else self.departments == number
+        return numpy.flatnonzero (mask)
+
+    def count (self, **criteria):
+        return len (self.select (**criteria))
+
+    def histogram (self, type = None, status = None):
+        """
+        This method returns a dict of year -> count, or serialNumber -> count for magazines
+        """
+        positions = self.select (type = type, status = status)
+        values, counts = numpy.unique (self.numbers [positions], return_counts = True)
+        return dict (zip (values.tolist (), counts.tolist ()))
+
+    def position (self, id):
+        """
+        This method returns the position of the resource with this id, like "B3", or None
+        the ids are sorted once, then every search is a binary search
+        """
+        code = PREFIXES.find (id [:1])
+        if code < 0 or not id [1:].isdigit ():
+            return None
+        if self.__keys is None:
+            keys = self.ids * len (PREFIXES) + self.types
+            order = numpy.argsort (keys, kind = "stable")
+            self.__keys = (keys [order], order)
+        keys, order = self.__keys
+        key = int (id [1:]) * len (PREFIXES) + code
+        index = numpy.searchsorted (keys, key)
+        if index < len (keys) and keys [index] == key:
+            return int (order [index])
+        return None
+
+    def resource (self, position):
+        """
+        This method returns the resource at the position, made at the first call and then kept
+        """
+        position = int (position)
+        resource = self.__materialized.get (position)
+        if resource is None:
+            code = self.types [position]
+            id = int (self.ids [position])
+            name = self.string (self.names [position])
+            text = self.string (self.texts [position])
+            number = int (self.numbers [position])
+            if code == 0:
+                resource = myLibrary.Book (id, name, text, number, self.string (self.departments [position]))
+            elif code == 1:
+                resource = myLibrary.Disk (id, name, text, number)
+            else:
+                resource = myLibrary.Magazine (id, name, text, number)
+            status = self.statuses [position]
+            if status == myLibrary.Status.BORROWED:
+                resource.borrow ()
+            elif status == myLibrary.Status.UNDER_REPAIR:
+                resource.repair ()
+            self.__materialized [position] = resource
+        return resource
+
+    def resources (self, positions):
+        return [self.resource (position) for position in positions]
+
+    def find (self, **criteria):
+        """
+        This method returns the resources that match the criteria of select
+        """
+        return self.resources (self.select (**criteria))
+
+    def setStatus (self, id, status):
+        """
+        This method changes the status of a resource in the catalogue
+        return True if the resource exists, False if not
+        """
+        position = self.position (id)
+        if position is None:
+            return False
+        self.statuses [position] = status
+        self.__materialized.pop (position, None) #made again with the new status
+        return True
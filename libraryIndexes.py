@@ -0,0 +1,236 @@
+from bisect import bisect_left, bisect_right, insort
+"""
+Secondary indexes over the attributes of the resources of a library
+a hash index finds the resources with a value, a sorted index finds also the resources with a value in a range
+"""
+
+EMPTY = dict () #the postings of a value that is not in an index
+
+class HashIndex:
+    """
+    This is an index of the resources by the value of one attribute, like author
+    the resources without this attribute are not in the index
+    the index does not follow the resources by itself, the library calls add, remove and update
+    """
+    def __init__ (self, field):
+        self.__field = field
+        self.__postings = dict () #value -> {resource id: resource}
+        self.__values = dict () #resource id -> value, to remove the old value after a change
+
+    @property
+    def field (self):
+        return self.__field
+
+    def __len__ (self):
+        return len (self.__values)
+
+    def add (self, resource):
+        value = getattr (resource, self.__field, None)
+        if value is None:
+            return
+        postings = self.__postings.get (value)
+        if postings is None:
+            postings = self.__postings [value] = dict ()
+            self._newValue (value)
+        postings [resource.id] = resource
+        self.__values [resource.id] = value
+
+    def addMany (self, resources):
+        """
+        This method adds many resources, like when the index is made over the resources of a library
+        """
+        for resource in resources:
+            self.add (resource)
+
+    def remove (self, resource):
+        """
+        This method removes a resource from the index
+        return True if the resource was in the index, False if not
+        """
+        id = resource.id
+        if id not in self.__values:
+            return False
+        value = self.__values.pop (id)
+        postings = self.__postings [value]
+        postings.pop (id)
+        if len (postings) == 0:
+            del self.__postings [value]
+            self._oldValue (value)
+        return True
+
+    def update (self, resource):
+        """
+        This method moves a resource to its new value, after a change
+        """
+        if self.__values.get (resource.id) != getattr (resource, self.__field, None):
+            self.remove (resource)
+            self.add (resource)
+
+    def _newValue (self, value):
+        pass
+
+    def _oldValue (self, value):
+        pass
+
+    def value (self, resource):
+        """
+        This method returns the value of the resource in the index, None if the resource is not there
+        """
+        return self.__values.get (resource.id)
+
+    def postings (self, value):
+        """
+        This method returns the resources with this value, in a dict by id that must not be changed
+        """
+        return self.__postings.get (value, EMPTY)
+
+
+class SortedIndex (HashIndex):
+    """
+    This is a hash index that keeps also its values sorted, for the queries by range
+    """
+    def __init__ (self, field):
+        super ().__init__ (field)
+        self.__sorted = [] #all the values of the index, sorted
+        self.__new = None #the new values of addMany, sorted once at its end
+
+    def addMany (self, resources):
+        """
+        This method adds many resources, their new values are sorted once at the end and not inserted one by one
+        """
+        self.__new = []
+        try:
+            super ().addMany (resources)
+        finally:
+            self.__sorted.extend (self.__new)
+            self.__sorted.sort ()
+            self.__new = None
+
+    def _newValue (self, value):
+        if self.__new is not None:
+            self.__new.append (value)
+        else:
+            insort (self.__sorted, value)
+
+    def _oldValue (self, value):
+        self.__sorted.pop (bisect_left (self.__sorted, value))
+
+    def range (self, first, last):
+        """
+        This method returns the postings of every value between first and last, both included, in the order of the values
+        without first or last, the range is open on that side
+        """
+        start = 0 if first is None else bisect_left (self.__sorted, first)
+        end = len (self.__sorted) if last is None else bisect_right (self.__sorted, last)
+        return [self.postings (value) for value in self.__sorted [start:end]]
+
+    def highest (self):
+        """
+        This method returns the postings of the highest value, or an empty dict
+        """
+        return self.postings (self.__sorted [-1]) if len (self.__sorted) > 0 else EMPTY
+
+    def inRange (self, resource, first, last):
+        """
+        This method checks if the value of the resource is between first and last, like range
+        """
+        value = self.value (resource)
+        return value is not None and (first is None or first <= value) and (last is None or value <= last)
+
+
+class IssueIndex:
+    """
+    This is an index of the magazines by title, the publisher and the name, with the issues of every title sorted by serialNumber
+    it is kept with the other indexes of a library, under the field "issues", and a query by issues takes a (publisher, name)
+    """
+    field = "issues"
+
+    def __init__ (self):
+        self.__titles = dict () #(publisher, name) -> SortedIndex of the serialNumbers
+        self.__keys = dict () #magazine id -> (publisher, name)
+
+    def __len__ (self):
+        return len (self.__keys)
+
+    @staticmethod
+    def __title (resource):
+        publisher = getattr (resource, "publisher", None)
+        return None if publisher is None else (publisher, resource.name)
+
+    def add (self, resource):
+        title = self.__title (resource)
+        if title is None:
+            return
+        issues = self.__titles.get (title)
+        if issues is None:
+            issues = self.__titles [title] = SortedIndex ("serialNumber")
+        issues.add (resource)
+        self.__keys [resource.id] = title
+
+    def addMany (self, resources):
+        """
+        This method adds many magazines, the issues of every title are added at once
+        """
+        titles = dict ()
+        for resource in resources:
+            title = self.__title (resource)
+            if title is not None:
+                titles.setdefault (title, []).append (resource)
+        for title, magazines in titles.items ():
+            issues = self.__titles.get (title)
+            if issues is None:
+                issues = self.__titles [title] = SortedIndex ("serialNumber")
+            issues.addMany (magazines)
+            for magazine in magazines:
+                self.__keys [magazine.id] = title
+
+    def remove (self, resource):
+        title = self.__keys.pop (resource.id, None)
+        if title is None:
+            return False
+        issues = self.__titles [title]
+        issues.remove (resource)
+        if len (issues) == 0:
+            del self.__titles [title]
+        return True
+
+    def update (self, resource):
+        title = self.__keys.get (resource.id)
+        if title != self.__title (resource):
+            self.remove (resource)
+            self.add (resource)
+        elif title is not None:
+            self.__titles [title].update (resource)
+
+    def postings (self, title):
+        """
+        This method returns all the issues of a title, in a dict by id
+        """
+        return {id: resource for resources in self.range (title) for id, resource in resources.items ()}
+
+    def range (self, title, first = None, last = None):
+        """
+        This method returns the postings of every serialNumber of the title between first and last, both included, in order
+        without first or last, the range is open on that side
+        """
+        issues = self.__titles.get (title)
+        if issues is None:
+            return []
+        return issues.range (first, last)
+
+    def latest (self, title):
+        """
+        This method returns the postings of the highest serialNumber of the title, or an empty dict
+        """
+        issues = self.__titles.get (title)
+        if issues is None:
+            return EMPTY
+        return issues.highest ()
+
+
+def defaultIndexes ():
+    """
+    This function returns the indexes a library makes at its first query
+    """
+    return [HashIndex ("type"), HashIndex ("author"), HashIndex ("singer"), HashIndex ("publisher"), HashIndex ("department"),
+            SortedIndex ("year"), SortedIndex ("serialNumber"), IssueIndex ()]
@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import threading
+import myLibrary
+import librarySnapshot
+"""
+An append only journal of the changes of a myLibrary.Library
+every change is one line of JSON: [sequence, operation, arguments...]
+after a crash the library is recovered from the last snapshot and the records of the journal that came after it
+"""
+
+#always: every record is written and synced to the disk before the operation returns
+#batch: records are written and synced together, when batchSize records are waiting or after interval seconds
+#never: like batch, but the operating system decides when the data reaches the disk
+SYNC_POLICIES = ("always", "batch", "never")
+
+def encode (item):
+    """
+    This function returns a list with everything needed to make the customer or the resource again
+    """
+    if isinstance (item, myLibrary.Customer):
+        return ["Customer", item.id, item.name, item.telephone]
+    id = myLibrary.Resource.id.fget (item) #the integer without the prefix
+    if isinstance (item, myLibrary.Book):
+        return ["Book", id, item.name, item.author, item.year, item.department, item.statusCode]
+    if isinstance (item, myLibrary.Disk):
+        return ["Disk", id, item.name, item.singer, item.year, item.statusCode]
+    return ["Magazine", id, item.name, item.publisher, item.serialNumber, item.statusCode]
+
+def decode (fields):
+    """
+    This function makes a customer or a resource from a list made by encode
+    """
+    kind, *fields = fields
+    if kind == "Customer":
+        return myLibrary.Customer (*fields)
+    *fields, status = fields
+    item = getattr (myLibrary, kind) (*fields)
+    setStatus (item, status)
+    return item
+
+def setStatus (resource, status):
+    """
+    This function brings a resource to the status, through available when it has another one
+    """
+    if resource.statusCode != status:
+        if resource.statusCode != myLibrary.Status.AVAILABLE:
+            resource.returning ()
+        if status == myLibrary.Status.BORROWED:
+            resource.borrow ()
+        elif status == myLibrary.Status.UNDER_REPAIR:
+            resource.repair ()
+
+def encodeArgument (argument):
+    if isinstance (argument, (myLibrary.Customer, myLibrary.Resource)):
+        return encode (argument)
+    if isinstance (argument, list):
+        return [encodeArgument (value) for value in argument]
+    return argument
+
+def completeLength (path):
+    """
+    This function returns the length of the complete records at the beginning of the file, and the last sequence
+    a record that was written only in part, because of a crash, is not complete
+    """
+    length = 0
+    sequence = 0
+    with open (path, "rb") as file:
+        for line in file:
+            if not line.endswith (b"\n"):
+                break
+            try:
+                sequence = json.loads (line) [0]
+            except ValueError:
+                break
+            length += len (line)
+    return length, sequence
+
+
+class Journal:
+    """
+    This class writes the records of the changes of a library in a file
+    attach it with library.journal = Journal (path)
+    """
+    def __init__ (self, path, sync = "batch", batchSize = 100, interval = 0.05):
+        if sync not in SYNC_POLICIES:
+            raise ValueError (f"sync should be one of {SYNC_POLICIES}")
+        self.__path = path
+        self.__sync = sync
+        self.__batchSize = batchSize
+        self.__interval = interval
+        self.__buffer = []
+        self.__lock = threading.Lock ()
+        self.__timer = None #writes the waiting records after interval seconds, when no other record comes
+        self.__sequence = 0
+        if os.path.exists (path):
+            length, self.__sequence = completeLength (path)
+            os.truncate (path, length) #remove a record written in part
+        self.__file = open (path, "ab")
+        self.__lastWrite = time.monotonic ()
+
+    @property
+    def sequence (self):
+        """
+        The sequence of the last record
+        """
+        return self.__sequence
+
+    @property
+    def sync (self):
+        return self.__sync
+
+    def record (self, operation, *arguments):
+        """
+        This method adds a record to the journal, the library calls it after every change
+        """
+        with self.__lock:
+            self.__sequence += 1
+            line = [self.__sequence, operation] + [encodeArgument (argument) for argument in arguments]
+            self.__buffer.append (json.dumps (line, ensure_ascii = False, separators = (",", ":")).encode () + b"\n")
+            if self.__sync == "always" or len (self.__buffer) >= self.__batchSize or time.monotonic () - self.__lastWrite >= self.__interval:
+                self.__write ()
+            elif self.__timer is None:
+                self.__timer = threading.Timer (self.__interval, self.__timerWrite)
+                self.__timer.daemon = True
+                self.__timer.start ()
+
+    def __timerWrite (self):
+        """
+        This method runs in the thread of the timer, the records may have been written meanwhile
+        """
+        with self.__lock:
+            if self.__timer is threading.current_thread () and not self.__file.closed:
+                self.__write ()
+
+    def __write (self):
+        """
+        This method writes the waiting records together, the lock must be held
+        """
+        if self.__timer is not None:
+            self.__timer.cancel ()
+            self.__timer = None
+        if len (self.__buffer) > 0:
+            self.__file.write (b"".join (self.__buffer))
+            self.__buffer.clear ()
+            self.__file.flush ()
+            if self.__sync != "never":
+                os.fsync (self.__file.fileno ())
+        self.__lastWrite = time.monotonic ()
+
+    def flush (self):
+        """
+        This method writes and syncs the waiting records now
+        """
+        with self.__lock:
+            self.__write ()
+            os.fsync (self.__file.fileno ())
+
+    def checkpoint (self, library, snapshotPath):
+        """
+        This method saves a snapshot of the library and empties the journal
+        the changes of a thread safe library wait until the checkpoint ends
+        """
+        with library.exclusive (), self.__lock:
+            self.__write ()
+            librarySnapshot.save (library, snapshotPath, self.__sequence)
+            self.__file.truncate (0)
+             #the next records continue the sequence of the snapshot
+            self.__file.write (json.dumps ([self.__sequence, "checkpoint"]).encode () + b"\n")
+            self.__file.flush ()
+            os.fsync (self.__file.fileno ())
+
+    def close (self):
+        with self.__lock:
+            self.__write ()
+            self.__file.close ()
+
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, *exception):
+        self.close ()
+
+
+def apply (library, operation, arguments):
+    """
+    This function applies one record of the journal to the library
+    """
+    if operation == "add":
+        library.add (decode (arguments [0]))
+    elif operation == "addMany":
+        library.addMany ([decode (fields) for fields in arguments [0]])
+    elif operation == "removeCustomer":
+        library.removeCustomer (arguments [0])
+    elif operation == "removeResource":
+        library.removeResource (arguments [0])
+    elif operation == "borrowResource":
+        library.borrowResource (library.searchCustomer (arguments [0]), library.search (arguments [1]), *arguments [2:])
+    elif operation == "returnResource":
+        library.returnResource (library.searchCustomer (arguments [0]), library.search (arguments [1]))
+    elif operation == "borrowMany":
+        library.borrowMany (library.searchCustomer (arguments [0]), [library.search (id) for id in arguments [1]], *arguments [2:])
+    elif operation == "returnMany":
+        library.returnMany (library.searchCustomer (arguments [0]), [library.search (id) for id in arguments [1]])
+    elif operation == "placeHold":
+        library.placeHold (library.searchCustomer (arguments [0]), library.search (arguments [1]))
+    elif operation == "cancelHold":
+        library.cancelHold (library.searchCustomer (arguments [0]), library.search (arguments [1]))
+    elif operation == "status":
+        setStatus (library.search (arguments [0]), arguments [1])
+    elif operation == "repair": #the journals written before the status records
+        library.search (arguments [0]).repair ()
+    elif operation == "returning":
+        library.search (arguments [0]).returning ()
+    elif operation == "change":
+        changed = decode (arguments [0])
+        resource = library.search (changed.id)
+        for field in ("name", "author", "year", "department", "singer", "publisher", "serialNumber"):
+            if hasattr (changed, field) and getattr (resource, field) != getattr (changed, field):
+                setattr (resource, field, getattr (changed, field))
+    elif operation != "checkpoint":
+        raise ValueError (f"unknown operation {operation}")
+
+def replay (library, path, after = 0):
+    """
+    This function applies to the library the records of the journal with a sequence after the given one
+    return the sequence of the last record
+    """
+    sequence = after
+    with open (path, "rb") as file:
+        for line in file:
+            if not line.endswith (b"\n"):
+                break #the last record was written in part
+            try:
+                record = json.loads (line)
+            except ValueError:
+                break
+            if record [0] > after:
+                apply (library, record [1], record [2:])
+            sequence = max (sequence, record [0])
+    return sequence
+
+def recover (snapshotPath, journalPath):
+    """
+    This function returns the library saved in the snapshot, with the changes of the journal that came after it
+    """
+    if os.path.exists (snapshotPath):
+        library = librarySnapshot.load (snapshotPath)
+        after = librarySnapshot.sequence (snapshotPath)
+    else:
+        library = myLibrary.Library ()
+        after = 0
+    if os.path.exists (journalPath):
+        replay (library, journalPath, after)
+    return library
@@ -0,0 +1,302 @@
+import re
+import heapq
+import unicodedata
+from math import isqrt
+from bisect import bisect_left, insort
+"""
+Full text search over the resources of a library
+the index is an inverted index: every word points to the resources that contain it
+"""
+
+#the attributes of the resources that are indexed, with the weight of a word found in them
+FIELDS = (("name", 2), ("author", 1), ("singer", 1), ("publisher", 1), ("department", 1))
+
+#a word is a run of hebrew letters or a run of other letters and digits
+#so a hebrew prefix attached to a latin word, like "הHobbit", gives two words
+WORD = re.compile (r"[\u05d0-\u05ea\u05f0-\u05f2]+|[^\W\u0590-\u05ff]+")
+
+NEW_WORDS = 1024 #the new words kept aside before they are sorted with the others, at least
+
+def tokenize (text):
+    """
+    This function returns the list of the words of the text, in lower case and without hebrew points
+    """
+    text = text.casefold ()
+    if not text.isascii (): #an ascii text has no points to remove
+        text = unicodedata.normalize ("NFKD", text)
+        text = "".join (char for char in text if unicodedata.category (char) != "Mn")
+    return WORD.findall (text)
+
+
+class TextIndex:
+    """
+    This is an inverted index over the words of the resources
+    the index does not follow the resources by itself, the library calls add, remove and update
+    the ids of a word are grouped by weight and kept in the order of addition, so the best results of a word come first
+    """
+    def __init__ (self):
+        self.__postings = dict () #word -> {weight: {resource id: None}}, the ids of every weight in the order of addition
+        self.__unsorted = set () #the (word, weight) whose ids lost the order of addition after an update
+        self.__words = [] #the words sorted, for the prefix queries, with the removed words of __stale
+        self.__newWords = [] #the words added since the last sort of __words, sorted too
+        self.__stale = set () #the removed words that are still in __words
+        self.__indexed = dict () #resource id -> {word: weight}, to remove the old words after a change
+        self.__resources = dict () #resource id -> resource
+        self.__order = dict () #resource id -> order of addition, to sort results with the same score
+        self.__counter = 0
+
+    def __len__ (self):
+        return len (self.__resources)
+
+    @staticmethod
+    def __wordsOf (resource):
+        words = dict ()
+        for field, weight in FIELDS:
+            value = getattr (resource, field, None)
+            if isinstance (value, str):
+                for word in tokenize (value):
+                    words [word] = words.get (word, 0) + weight
+        return words
+
+    def add (self, resource):
+        """
+        This method adds the words of a resource to the index
+        """
+        id = resource.id
+        self.__order [id] = self.__counter
+        self.__counter += 1
+        words = self.__wordsOf (resource)
+        for word, weight in words.items ():
+            self.__addWord (word, weight, id, True)
+        self.__indexed [id] = words
+        self.__resources [id] = resource
+
+    def addMany (self, resources):
+        """
+        This method adds many resources, the new words are sorted once at the end and not inserted one by one
+        """
+        words, self.__newWords = self.__newWords, None
+        try:
+            for resource in resources:
+                self.add (resource)
+        finally:
+            self.__newWords = words
+            self.__sortWords ()
+
+    def __addWord (self, word, weight, id, newest):
+        """
+        This method adds the id to the ids of the word with this weight, newest if the id is the last added to the index
+        """
+        groups = self.__postings.get (word)
+        if groups is None:
+            groups = self.__postings [word] = dict ()
+            if word in self.__stale:
+                self.__stale.discard (word) #still in __words
+            elif self.__newWords is None:
+                self.__words.append (word) #addMany sorts them at its end
+            else:
+                insort (self.__newWords, word)
+                if len (self.__newWords) > max (NEW_WORDS, isqrt (len (self.__words))):
+                    self.__sortWords ()
+        ids = groups.get (weight)
+        if ids is None:
+            ids = groups [weight] = dict ()
+        elif not newest and self.__order [next (reversed (ids))] > self.__order [id]:
+            self.__unsorted.add ((word, weight))
+        ids [id] = None
+
+    def __sortWords (self):
+        self.__words.extend (self.__newWords)
+        self.__words.sort ()
+        self.__newWords = []
+
+    def remove (self, resource):
+        """
+        This method removes a resource from the index
+        return True if the resource was in the index, False if not
+        """
+        id = resource.id
+        words = self.__indexed.pop (id, None)
+        if words is None:
+            return False
+        for word, weight in words.items ():
+            self.__removeWord (word, weight, id)
+        del self.__resources [id]
+        del self.__order [id]
+        return True
+
+    def __removeWord (self, word, weight, id):
+        groups = self.__postings [word]
+        ids = groups [weight]
+        del ids [id]
+        if len (ids) > 0:
+            return
+        del groups [weight]
+        self.__unsorted.discard ((word, weight))
+        if len (groups) > 0:
+            return
+        del self.__postings [word]
+        position = bisect_left (self.__newWords, word)
+        if position < len (self.__newWords) and self.__newWords [position] == word:
+            self.__newWords.pop (position)
+            return
+         #the word stays in the sorted words until many words are removed, then they are all removed at once
+        self.__stale.add (word)
+        if len (self.__stale) > max (NEW_WORDS, len (self.__words) // 2):
+            self.__words = [word for word in self.__words if word not in self.__stale]
+            self.__stale.clear ()
+
+    def update (self, resource):
+        """
+        This method indexes again a resource after one of its attributes changed
+        the resource keeps its place between the results with the same score, only the words that changed are moved
+        """
+        id = resource.id
+        old = self.__indexed.get (id)
+        if old is None:
+            return
+        words = self.__wordsOf (resource)
+        for word, weight in old.items ():
+            if words.get (word) != weight:
+                self.__removeWord (word, weight, id)
+        for word, weight in words.items ():
+            if old.get (word) != weight:
+                self.__addWord (word, weight, id, False)
+        self.__indexed [id] = words
+
+    def __matching (self, prefix):
+        """
+        This method yields the words of the index that start with prefix
+        """
+        for words in (self.__words, self.__newWords):
+            position = bisect_left (words, prefix)
+            while position < len (words) and words [position].startswith (prefix):
+                if words [position] not in self.__stale:
+                    yield words [position]
+                position += 1
+
+    def __termWords (self, term):
+        """
+        This method returns the words of one term of a query, a term that ends with * matches all the words that start with it
+        """
+        if term.endswith ("*"):
+            return list (self.__matching (term [:-1]))
+        return [term] if term in self.__postings else []
+
+    def __ids (self, word, weight):
+        """
+        This method returns the ids of a word with this weight in the order of addition
+        """
+        ids = self.__postings [word][weight]
+        if (word, weight) in self.__unsorted:
+            ids = self.__postings [word][weight] = dict.fromkeys (sorted (ids, key = self.__order.__getitem__))
+            self.__unsorted.discard ((word, weight))
+        return ids
+
+    def __ranked (self, word):
+        """
+        This generator yields (-weight, order, id) of the resources of a word, the best first
+        """
+        order = self.__order
+        for weight in sorted (self.__postings [word], reverse = True):
+            for id in self.__ids (word, weight):
+                yield (-weight, order [id], id)
+
+    def __terms (self, words):
+        """
+        This method splits the words of a query in terms like the text of the resources
+        """
+        terms = []
+        for word in words:
+            tokens = tokenize (word)
+            if word.endswith ("*") and len (tokens) > 0:
+                tokens [-1] += "*"
+            terms.extend (tokens)
+        return terms
+
+    def __scores (self, termWords):
+        """
+        This method returns {resource id: score} of the resources with all the terms, every term given by its words
+        the resources of the term with the fewest resources are checked against the other terms
+        """
+        sizes = [sum (len (ids) for word in words for ids in self.__postings [word].values ()) for words in termWords]
+        termWords = [words for size, words in sorted (zip (sizes, termWords), key = lambda pair: pair [0])]
+        scores = dict ()
+        for word in termWords [0]:
+            for weight, ids in self.__postings [word].items ():
+                for id in ids:
+                    if weight > scores.get (id, 0):
+                        scores [id] = weight #the best word of a prefix
+        for words in termWords [1:]:
+            found = dict ()
+            for id, score in scores.items ():
+                indexed = self.__indexed [id]
+                if len (words) == 1:
+                    weight = indexed.get (words [0])
+                else:
+                    weight = max ((indexed [word] for word in words if word in indexed), default = None)
+                if weight is not None:
+                    found [id] = score + weight
+            scores = found
+        return scores
+
+    def search (self, query, limit = None):
+        """
+        This method returns the resources that match the query, the best first
+        words of the query must all be found (AND), OR between words gives the results of both sides
+        a word that ends with * is a prefix, for example "harr* OR tolkien"
+        the score of a resource is the weight of the words found, a word in the name counts twice
+        with a limit the results of a word are read from the best and only until the limit, and not scored all
+        """
+        if limit is not None and limit <= 0:
+            return []
+        groups = [] #the words of every term, for every group of terms joined by AND
+        group = []
+        for word in query.split () + ["OR"]:
+            if word != "OR":
+                group.append (word)
+                continue
+            terms = self.__terms (group)
+            group = []
+            if len (terms) > 0:
+                termWords = [self.__termWords (term) for term in terms]
+                if all (len (words) > 0 for words in termWords):
+                    groups.append (termWords)
+        if limit is None:
+            return self.__all (groups)
+         #the results of every group are sorted as (-score, order, id), so the first time a resource comes is with its best score
+        order = self.__order
+        ranked = []
+        for termWords in groups:
+            if len (termWords) == 1:
+                ranked.extend (self.__ranked (word) for word in termWords [0])
+            else:
+                ranked.append (heapq.nsmallest (limit, ((-score, order [id], id) for id, score in self.__scores (termWords).items ())))
+        found = []
+        seen = set ()
+        for score, position, id in heapq.merge (*ranked):
+            if id not in seen:
+                seen.add (id)
+                found.append (self.__resources [id])
+                if len (found) == limit:
+                    break
+        return found
+
+    def __all (self, groups):
+        """
+        This method returns all the results of the groups of a query, the best first
+        """
+        if len (groups) == 1 and len (groups [0]) == 1 and len (groups [0][0]) == 1:
+            word = groups [0][0][0] #one word, its ids are already in order
+            return [self.__resources [id] for weight in sorted (self.__postings [word], reverse = True) for id in self.__ids (word, weight)]
+        scores = dict ()
+        for termWords in groups:
+            for id, score in self.__scores (termWords).items ():
+                if score > scores.get (id, 0):
+                    scores [id] = score
+         #the scores are small numbers, so the results are grouped by score and every group is sorted
+        byScore = dict ()
+        for id, score in scores.items ():
+            byScore.setdefault (score, []).append (id)
+        order = self.__order.__getitem__
+        return [self.__resources [id] for score in sorted (byScore, reverse = True) for id in sorted (byScore [score], key = order)]
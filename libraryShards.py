@@ -0,0 +1,366 @@
+import os
+import zlib
+import itertools
+import multiprocessing
+import myLibrary
+from libraryJournal import encode, decode
+"""
+A library split in shards, every shard is a myLibrary.Library in its own process
+the customers and the resources are given to the shards by their id, and the router sends every call to the right shard
+a loan of a customer and a resource of different shards is made with a two phase commit:
+first both shards prepare it and vote, then both commit it, or both abort it if one of them cannot
+"""
+
+class Shard:
+    """
+    This class is the state of one shard, inside its process
+    the loans between two shards are kept beside the library: the resource shard knows who borrowed it,
+    the customer shard knows what the customer borrowed
+    """
+    def __init__ (self):
+        self.library = myLibrary.Library ()
+        self.remoteLoans = dict () #customer id -> {resource id} borrowed from other shards
+        self.lent = dict () #resource id -> customer id of another shard
+        self.prepared = dict () #transaction -> (kind, id, id), waiting for commit or abort
+
+    def run (self, name, arguments):
+        """
+        This method runs one command, an error is returned and not raised so the other commands of the batch still run
+        """
+        try:
+            return getattr (self, name) (*arguments)
+        except Exception as error:
+            return error
+
+    def __customer (self, id):
+        customer = self.library.searchCustomer (id)
+        if customer is None:
+            raise ValueError (f"customer {id} is not a registered to this library!")
+        return customer
+
+    def __resource (self, id):
+        resource = self.library.search (id)
+        if resource is None:
+            raise ValueError (f"{id} is not a resource in this library!")
+        return resource
+
+    def add (self, fields):
+        item = decode (fields)
+        self.library.add (item)
+        if isinstance (item, myLibrary.Customer):
+            self.remoteLoans [item.id] = set ()
+        return True
+
+    def addMany (self, fieldsList):
+        """
+        return the positions of the items that were not added
+        """
+        items = [decode (fields) for fields in fieldsList]
+        rejected = {id (item) for item in self.library.addMany (items)}
+        for item in items:
+            if isinstance (item, myLibrary.Customer) and id (item) not in rejected:
+                self.remoteLoans [item.id] = set ()
+        return [position for position, item in enumerate (items) if id (item) in rejected]
+
+    def removeCustomer (self, id):
+        if len (self.remoteLoans.get (id, ())) > 0 or any (entry [1] == id for entry in self.prepared.values () if entry [0] == "loan"):
+            raise Exception ("cannot remove customer with borrowed resources")
+        self.remoteLoans.pop (id, None)
+        return self.library.removeCustomer (id)
+
+    def removeResource (self, id):
+        return self.library.removeResource (id)
+
+    def borrowResource (self, customerId, resourceId):
+        return self.library.borrowResource (self.__customer (customerId), self.__resource (resourceId))
+
+    def returnResource (self, customerId, resourceId):
+        return self.library.returnResource (self.__customer (customerId), self.__resource (resourceId))
+
+    def prepareBorrowResource (self, transaction, customerId, resourceId):
+        """
+        The resource is borrowed at once, so nobody else can take it before the commit
+        """
+        resource = self.__resource (resourceId)
+        if resource.statusCode is not myLibrary.Status.AVAILABLE:
+            raise ValueError (f"cannot borrow this {resource.type}")
+        resource.borrow ()
+        self.prepared [transaction] = ("lend", resourceId, customerId)
+        return True
+
+    def prepareBorrowCustomer (self, transaction, customerId, resourceId):
+        self.__customer (customerId)
+        self.prepared [transaction] = ("loan", customerId, resourceId)
+        return True
+
+    def prepareReturnResource (self, transaction, customerId, resourceId):
+        if self.lent.get (resourceId) != customerId:
+            raise ValueError (f"customer {customerId} did not borrowed {resourceId}")
+        self.prepared [transaction] = ("give", resourceId, customerId)
+        return True
+
+    def prepareReturnCustomer (self, transaction, customerId, resourceId):
+        if resourceId not in self.remoteLoans.get (customerId, ()):
+            raise ValueError (f"customer {customerId} did not borrowed {resourceId}")
+        self.prepared [transaction] = ("unloan", customerId, resourceId)
+        return True
+
+    def commit (self, transaction):
+        kind, first, second = self.prepared.pop (transaction)
+        if kind == "lend":
+            self.lent [first] = second
+        elif kind == "loan":
+            self.remoteLoans [first].add (second)
+        elif kind == "give":
+            del self.lent [first]
+            self.library.search (first).returning ()
+        else:
+            self.remoteLoans [first].discard (second)
+        return True
+
+    def abort (self, transaction):
+        entry = self.prepared.pop (transaction, None)
+        if entry is not None and entry [0] == "lend":
+            self.library.search (entry [1]).returning ()
+        return True
+
+    def search (self, id):
+        resource = self.library.search (id)
+        return None if resource is None else encode (resource)
+
+    def searchCustomer (self, id):
+        customer = self.library.searchCustomer (id)
+        return None if customer is None else encode (customer)
+
+    def borrower (self, resourceId):
+        customer = self.library.borrower (resourceId)
+        return self.lent.get (resourceId) if customer is None else customer.id
+
+    def availables (self, resourceType):
+        resources = self.library.availables (resourceType)
+        if not resourceType:
+            resources = [resource for typeResources in resources.values () for resource in typeResources]
+        return [encode (resource) for resource in resources]
+
+    def borrowing (self):
+        borrowing = {id: [resource.id for resource in loans] for id, loans in self.library.borrowing.items ()}
+        for id, loans in self.remoteLoans.items ():
+            borrowing [id].extend (sorted (loans))
+        return borrowing
+
+def serve (connection):
+    """
+    This function is the main loop of a shard process: it receives a list of commands and sends back their results
+    """
+    shard = Shard ()
+    while True:
+        commands = connection.recv ()
+        if commands is None:
+            break
+        connection.send ([shard.run (name, arguments) for name, arguments in commands])
+    connection.close ()
+
+
+class ShardedLibrary:
+    """
+    This class is the router of a library split in shards, one process for every shard
+    the methods take the customers and the resources like myLibrary.Library, but the objects live in the shards:
+    search, borrower and availables return copies, and borrowing gives the ids of the resources
+    the router should be used by one thread
+    """
+    def __init__ (self, shards = None):
+        self.__connections = []
+        self.__processes = []
+        for i in range (shards or os.cpu_count ()):
+            mine, theirs = multiprocessing.Pipe ()
+            process = multiprocessing.Process (target = serve, args = (theirs,), daemon = True)
+            process.start ()
+            theirs.close ()
+            self.__connections.append (mine)
+            self.__processes.append (process)
+        self.__transactions = itertools.count ()
+
+    @property
+    def shards (self):
+        return len (self.__connections)
+
+    def shardOf (self, id):
+        """
+        This method returns the shard of a customer id or a resource id, the same in every process
+        """
+        return zlib.crc32 (str (id).encode ()) % len (self.__connections)
+
+    def __send (self, commands):
+        """
+        This method sends the commands of every shard together, and then waits for all the results
+        commands is a dict of shard -> list of (name, arguments)
+        """
+        for shard, batch in commands.items ():
+            self.__connections [shard].send (batch)
+        return {shard: self.__connections [shard].recv () for shard in commands}
+
+    def __call (self, shard, name, *arguments):
+        result = self.__send ({shard: [(name, arguments)]}) [shard][0]
+        if isinstance (result, Exception):
+            raise result
+        return result
+
+    def add (self, item):
+        if not isinstance (item, (myLibrary.Customer, myLibrary.Resource)):
+            raise TypeError ("the object should be a customer or a resource")
+        return self.__call (self.shardOf (item.id), "add", encode (item))
+
+    def addMany (self, items):
+        """
+        This method adds many customers and resources, every shard adds its part at once
+        return a list of the items that were not added because their id already exists
+        """
+        items = list (items)
+        parts = dict ()
+        for item in items:
+            if not isinstance (item, (myLibrary.Customer, myLibrary.Resource)):
+                raise TypeError ("the object should be a customer or a resource")
+            parts.setdefault (self.shardOf (item.id), []).append (item)
+        results = self.__send ({shard: [("addMany", ([encode (item) for item in part],))] for shard, part in parts.items ()})
+        rejected = {id (parts [shard][position]) for shard, [positions] in results.items () for position in positions}
+        return [item for item in items if id (item) in rejected]
+
+    def removeCustomer (self, id):
+        return self.__call (self.shardOf (id), "removeCustomer", id)
+
+    def removeResource (self, id):
+        return self.__call (self.shardOf (id), "removeResource", id)
+
+    def borrowResource (self, customer, resource):
+        return self.__single ("borrow", customer, resource)
+
+    def returnResource (self, customer, resource):
+        return self.__single ("return", customer, resource)
+
+    def __single (self, operation, customer, resource):
+        if not isinstance (customer, myLibrary.Customer) or not isinstance (resource, myLibrary.Resource):
+            raise TypeError ("customer or resource incorrect")
+        result = self.circulate ([(operation, customer, resource)]) [0]
+        if isinstance (result, Exception):
+            raise result
+        return result
+
+    def circulate (self, operations):
+        """
+        This method runs many loans and returns, every operation is ("borrow" or "return", customer, resource)
+        return a list with True for every operation done, or the error that stopped it
+        the operations are sent in waves, all the shards work together on a wave
+        an operation on a resource already in the wave starts a new wave, so the operations of a resource keep their order
+        """
+        results = [None] * len (operations)
+        wave = []
+        resources = set ()
+        for position, (operation, customer, resource) in enumerate (operations):
+            if operation not in ("borrow", "return"):
+                raise ValueError (f"unknown operation {operation}")
+            if resource.id in resources:
+                self.__runWave (wave, results)
+                wave = []
+                resources = set ()
+            wave.append ((position, operation, customer.id, resource.id))
+            resources.add (resource.id)
+        self.__runWave (wave, results)
+        return results
+
+    def __runWave (self, wave, results):
+        """
+        This method runs operations on different resources, the operations inside one shard directly
+        and the operations between two shards with a two phase commit
+        """
+        commands = dict ()
+        replies = dict () #shard -> list of (position, transaction) of every command, to read the results
+        def add (shard, position, transaction, name, arguments):
+            commands.setdefault (shard, []).append ((name, arguments))
+            replies.setdefault (shard, []).append ((position, transaction))
+        transactions = dict () #transaction -> (position, customer shard, resource shard)
+        for position, operation, customerId, resourceId in wave:
+            customerShard = self.shardOf (customerId)
+            resourceShard = self.shardOf (resourceId)
+            if customerShard == resourceShard:
+                add (customerShard, position, None, f"{operation}Resource", (customerId, resourceId))
+            else:
+                transaction = next (self.__transactions)
+                transactions [transaction] = (position, customerShard, resourceShard)
+                suffix = "Borrow" if operation == "borrow" else "Return"
+                add (customerShard, position, transaction, f"prepare{suffix}Customer", (transaction, customerId, resourceId))
+                add (resourceShard, position, transaction, f"prepare{suffix}Resource", (transaction, customerId, resourceId))
+        if len (commands) == 0:
+            return
+         #phase one: the operations of one shard are done, the others are prepared and every shard votes
+        votes = dict ()
+        for shard, shardResults in self.__send (commands).items ():
+            for (position, transaction), result in zip (replies [shard], shardResults):
+                if transaction is None:
+                    results [position] = result
+                elif result is not True and transaction not in votes:
+                    votes [transaction] = result
+         #phase two: commit if both shards voted yes, else abort on both
+        decisions = dict ()
+        for transaction, (position, customerShard, resourceShard) in transactions.items ():
+            error = votes.get (transaction)
+            results [position] = True if error is None else error
+            name = "commit" if error is None else "abort"
+            for shard in (customerShard, resourceShard):
+                decisions.setdefault (shard, []).append ((name, (transaction,)))
+        if len (decisions) > 0:
+            self.__send (decisions)
+
+    def search (self, id):
+        fields = self.__call (self.shardOf (id), "search", id)
+        return None if fields is None else decode (fields)
+
+    def searchCustomer (self, id):
+        fields = self.__call (self.shardOf (id), "searchCustomer", id)
+        return None if fields is None else decode (fields)
+
+    def borrower (self, id):
+        """
+        This method returns a copy of the customer who borrowed the resource with this id
+        return None if the resource is not borrowed
+        """
+        customerId = self.__call (self.shardOf (id), "borrower", id)
+        return None if customerId is None else self.searchCustomer (customerId)
+
+    def availables (self, resourceType = None):
+        """
+        This method returns copies of the available resources, like myLibrary.Library.availables
+        the resources are in the order of the shards
+        """
+        results = self.__send ({shard: [("availables", (resourceType,))] for shard in range (self.shards)})
+        resources = [decode (fields) for shard in range (self.shards) for fields in results [shard][0]]
+        if resourceType:
+            return resources
+        availables = dict ()
+        for resource in resources:
+            availables.setdefault (resource.type, []).append (resource)
+        return availables
+
+    @property
+    def borrowing (self):
+        """
+        A dict with the ids of the resources borrowed by every customer id
+        """
+        borrowing = dict ()
+        for [shardBorrowing] in self.__send ({shard: [("borrowing", ())] for shard in range (self.shards)}).values ():
+            borrowing.update (shardBorrowing)
+        return borrowing
+
+    def close (self):
+        for connection in self.__connections:
+            connection.send (None)
+            connection.close ()
+        for process in self.__processes:
+            process.join ()
+        self.__connections = []
+        self.__processes = []
+
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, *exception):
+        self.close ()
@@ -0,0 +1,214 @@
+import os
+import sys
+from array import array
+import myLibrary
+"""
+Save and load the whole state of a myLibrary.Library in a binary file
+the file is made of columns: every attribute of the customers and the resources is one array
+all the strings are kept once in a table and the columns keep their number in the table
+"""
+
+MAGIC = b"MYLIBSNP"
+VERSION = 4
+NONE = 0xFFFFFFFF #the number of a missing string in a string column
+
+#the code of every resource type in the file
+TYPES = (myLibrary.Book, myLibrary.Disk, myLibrary.Magazine)
+TYPE_CODES = {cls: code for code, cls in enumerate (TYPES)}
+
+#every column of the file, in order, with its array type code
+COLUMNS = (
+    ("stringOffsets", "Q"),
+    ("stringData", "B"),
+    ("customerIds", "q"),
+    ("customerNames", "I"),
+    ("customerTelephones", "q"),
+    ("resourceTypes", "B"),
+    ("resourceIds", "q"),
+    ("resourceNames", "I"),
+    ("resourceStatus", "B"),
+    ("resourceTexts", "I"), #author, singer or publisher
+    ("resourceNumbers", "q"), #year or serialNumber
+    ("resourceDepartments", "I"),
+    ("loanCustomers", "I"), #position of the customer in the customers
+    ("loanResources", "I"), #position of the resource in the resources
+    ("loanBorrowed", "d"), #time of the loan, in seconds since the epoch
+    ("loanDue", "d"),
+    ("holdCustomers", "I"), #the holds of every resource in the order of its queue
+    ("holdResources", "I"),
+)
+
+class StringTable:
+    """
+    This class gives a number to every different string
+    """
+    def __init__ (self):
+        self.strings = []
+        self.numbers = dict ()
+
+    def __call__ (self, value):
+        number = self.numbers.get (value)
+        if number is None:
+            number = self.numbers [value] = len (self.strings)
+            self.strings.append (value)
+        return number
+
+def makeColumns (library):
+    """
+    This function returns a dict with an array for every column of the library, see COLUMNS
+    the library is held with all its locks while the columns are made, so the columns are of one state of the library
+    """
+    with library.exclusive ():
+        strings = StringTable ()
+        columns = {name: array (code) for name, code in COLUMNS}
+        customerPositions = dict ()
+        for position, customer in enumerate (library.customers):
+            customerPositions [customer.id] = position
+            columns ["customerIds"].append (customer.id)
+            columns ["customerNames"].append (strings (customer.name))
+            columns ["customerTelephones"].append (customer.telephone)
+        resourcePositions = dict ()
+        for position, resource in enumerate (library.resources):
+            resourcePositions [resource.id] = position
+            code = TYPE_CODES [type (resource)]
+            columns ["resourceTypes"].append (code)
+            columns ["resourceIds"].append (myLibrary.Resource.id.fget (resource)) #the integer without the prefix
+            columns ["resourceNames"].append (strings (resource.name))
+            columns ["resourceStatus"].append (resource.statusCode)
+            if code == 0:
+                columns ["resourceTexts"].append (strings (resource.author))
+                columns ["resourceNumbers"].append (resource.year)
+                columns ["resourceDepartments"].append (strings (resource.department))
+            elif code == 1:
+                columns ["resourceTexts"].append (strings (resource.singer))
+                columns ["resourceNumbers"].append (resource.year)
+                columns ["resourceDepartments"].append (NONE)
+            else:
+                columns ["resourceTexts"].append (strings (resource.publisher))
+                columns ["resourceNumbers"].append (resource.serialNumber)
+                columns ["resourceDepartments"].append (NONE)
+        for customerId, loans in library.borrowing.items ():
+            for resource in loans:
+                loan = library.loan (resource.id)
+                columns ["loanCustomers"].append (customerPositions [customerId])
+                columns ["loanResources"].append (resourcePositions [resource.id])
+                columns ["loanBorrowed"].append (loan.borrowed)
+                columns ["loanDue"].append (loan.due)
+        for resource in library.resources:
+            for customer in library.holdQueue (resource.id):
+                columns ["holdCustomers"].append (customerPositions [customer.id])
+                columns ["holdResources"].append (resourcePositions [resource.id])
+         #the strings are decoded at once when loading, so the offsets count characters and not bytes
+        offset = 0
+        columns ["stringOffsets"].append (0)
+        for value in strings.strings:
+            offset += len (value)
+            columns ["stringOffsets"].append (offset)
+        columns ["stringData"] = array ("B", "".join (strings.strings).encode ("utf-8", "surrogatepass"))
+        return columns
+
+def save (library, path, sequence = 0):
+    """
+    This function saves the customers, the resources with their status and the borrowing of the library in the file
+    sequence is the number of the last journal record included in the snapshot, see libraryJournal.py
+    the file is written aside and then replaces the old file, so a crash never leaves half a snapshot
+    """
+    columns = makeColumns (library)
+    with open (path + ".tmp", "wb") as file:
+        file.write (MAGIC)
+        file.write (array ("I", [VERSION, len (COLUMNS)]).tobytes ())
+        file.write (array ("Q", [sequence]).tobytes ())
+        for name, code in COLUMNS:
+            column = columns [name]
+            if sys.byteorder == "big":
+                column.byteswap ()
+            data = column.tobytes ()
+            file.write (array ("Q", [len (data)]).tobytes ())
+            file.write (data)
+            file.write (bytes (-len (data) % 8)) #every column starts at a multiple of 8, to read it in place
+        file.flush ()
+        os.fsync (file.fileno ())
+    os.replace (path + ".tmp", path)
+
+def readHeader (view):
+    """
+    This function checks the beginning of a file and returns the journal sequence saved in it
+    """
+    if bytes (view [:len (MAGIC)]) != MAGIC:
+        raise ValueError ("this is not a library snapshot")
+    position = len (MAGIC)
+    version, count = view [position:position + 8].cast ("I")
+    if version != VERSION or count != len (COLUMNS):
+        raise ValueError (f"unknown snapshot version {version}")
+    return view [position + 8:position + 16].cast ("Q") [0]
+
+def readColumns (view):
+    """
+    This function returns a dict of the columns of a file, as memoryviews on the data of the file
+    """
+    readHeader (view)
+    position = len (MAGIC) + 16
+    columns = dict ()
+    for name, code in COLUMNS:
+        size = view [position:position + 8].cast ("Q") [0]
+        position += 8
+        column = view [position:position + size].cast (code)
+        if sys.byteorder == "big":
+            column = array (code, column)
+            column.byteswap ()
+        columns [name] = column
+        position += size + (-size % 8)
+    return columns
+
+def build (columns):
+    """
+    This function makes a new library from the columns of a file
+    """
+    text = str (columns ["stringData"], "utf-8", "surrogatepass")
+    offsets = columns ["stringOffsets"]
+    strings = [text [offsets [i]:offsets [i + 1]] for i in range (len (offsets) - 1)]
+    customers = [
+        myLibrary.Customer (id, strings [name], telephone)
+        for id, name, telephone in zip (columns ["customerIds"], columns ["customerNames"], columns ["customerTelephones"])
+    ]
+    resources = []
+    rows = zip (columns ["resourceTypes"], columns ["resourceIds"], columns ["resourceNames"], columns ["resourceTexts"], columns ["resourceNumbers"], columns ["resourceDepartments"])
+    for code, id, name, text, number, department in rows:
+        if code == 0:
+            resources.append (myLibrary.Book (id, strings [name], strings [text], number, strings [department]))
+        elif code == 1:
+            resources.append (myLibrary.Disk (id, strings [name], strings [text], number))
+        else:
+            resources.append (myLibrary.Magazine (id, strings [name], strings [text], number))
+    library = myLibrary.Library ()
+    library.addMany (customers + resources)
+     #the loans are borrowed again in their order, with their times
+    loans = zip (columns ["loanCustomers"], columns ["loanResources"], columns ["loanBorrowed"], columns ["loanDue"])
+    for customer, resource, borrowed, due in loans:
+        library.borrowResource (customers [customer], resources [resource], due, borrowed)
+     #resources borrowed outside the library, and resources under repair
+    for resource, status in zip (resources, columns ["resourceStatus"]):
+        if status == myLibrary.Status.UNDER_REPAIR:
+            resource.repair ()
+        elif status == myLibrary.Status.BORROWED and resource.statusCode is myLibrary.Status.AVAILABLE:
+            resource.borrow ()
+     #the holds are placed again in the order of their queues, an available resource is ready again for the first
+    for customer, resource in zip (columns ["holdCustomers"], columns ["holdResources"]):
+        library.placeHold (customers [customer], resources [resource])
+    return library
+
+def sequence (path):
+    """
+    This function returns the journal sequence saved in the file, without loading it
+    """
+    with open (path, "rb") as file:
+        return readHeader (memoryview (file.read (len (MAGIC) + 16)))
+
+def load (path):
+    """
+    This function returns a new library with the state saved in the file
+    every customer and resource is made again, so all the file is read - mapping it in memory saves nothing
+    to read the columns in place, without making the objects, use libraryColumns.ColumnCatalogue.load (path, True)
+    """
+    with open (path, "rb") as file:
+        return build (readColumns (memoryview (file.read ())))
@@ -1,26 +1,417 @@
+import sys
+import time
+import heapq
+import threading
+import weakref
 from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Sequence
+from contextlib import nullcontext
+from enum import IntEnum
+from itertools import islice, count
+from librarySearch import TextIndex
+from libraryIndexes import SortedIndex, defaultIndexes
 """
 This is my solution for the assessment
 Note: abstract methods are used with the abc library
 """
+class Status (IntEnum):
+    """
+    The status of a resource is kept as a small integer, so checking it is an integer compare
+    the property Resource.status still returns the text of the status
+    """
+    AVAILABLE = 0
+    BORROWED = 1
+    UNDER_REPAIR = 2
+
+    @property
+    def text (self):
+        return STATUS_TEXTS [self]
+
+STATUS_TEXTS = ("available", "borrowed", "under repair")
+
+
+class LibraryView (Sequence):
+    """
+    This is a read only view of the customers or the resources of the library
+    the items are not copied - the view always shows the current state of the library
+    use list (view) to get a copy that does not change with the library
+    """
+    def __init__ (self, items):
+        self.__items = items #the dict of the library, by id
+
+    def __len__ (self):
+        return len (self.__items)
+
+    def __iter__ (self):
+        return iter (self.__items.values ())
+
+    def __reversed__ (self):
+        return reversed (self.__items.values ())
+
+    def __contains__ (self, item):
+        """
+        An item is in the view only if this object itself is registered, like in a list
+        """
+        try:
+            return self.__items.get (item.id) is item
+        except (AttributeError, TypeError):
+            return False
+
+    def __getitem__ (self, index):
+        """
+        Access by position walks the view until the position, prefer iteration or search by id
+        """
+        if isinstance (index, slice):
+            return list (self) [index]
+        if index < 0:
+            index += len (self.__items)
+        if index < 0 or index >= len (self.__items):
+            raise IndexError ("view index out of range")
+        return next (islice (self.__items.values (), index, None))
+
+    def __eq__ (self, other):
+        if isinstance (other, (LibraryView, list, tuple)):
+            return len (self) == len (other) and all (a is b or a == b for a, b in zip (self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__ (self):
+        return repr (list (self))
+
+
+NO_LOCK = nullcontext ()
+LOAN_PERIOD = 14 * 24 * 60 * 60 #the default time of a loan, in seconds
+READ_ATTEMPTS = 100 #the tries of a reader without locks before it takes the locks
+PAGE_SIZE = 100 #the resources an iterator of the library takes at once
+
+class LockStripes:
+    """
+    This class protects many ids with a fixed number of locks, an id always uses the same lock
+    the locks of many ids are always taken in the same order, so two threads never wait for each other forever
+    """
+    __slots__ = ("__locks",)
+
+    def __init__ (self, count):
+        self.__locks = tuple (threading.RLock () for i in range (count))
+
+    def hold (self, *ids):
+        """
+        This method returns a context manager that holds the locks of the ids
+        """
+        return HeldLocks ([self.__locks [i] for i in sorted ({hash (id) % len (self.__locks) for id in ids})])
+
+    def holdAll (self, *first):
+        """
+        This method returns a context manager that holds all the locks, after the locks given
+        """
+        return HeldLocks (first + self.__locks)
+
+
+class NoLocks:
+    """
+    The locks of a library that is used by one thread only, they do nothing
+    """
+    __slots__ = ()
+
+    def hold (self, *ids):
+        return NO_LOCK
+
+    def holdAll (self, *first):
+        return NO_LOCK
+
+
+class WriteCounter:
+    """
+    This class counts the changes of a library that started and that ended
+    a reader without locks knows that its copy is consistent if no change started while it copied
+    """
+    __slots__ = ("__lock", "started", "ended")
+
+    def __init__ (self):
+        self.__lock = threading.Lock ()
+        self.started = 0
+        self.ended = 0
+
+    def __enter__ (self):
+        with self.__lock:
+            self.started += 1
+
+    def __exit__ (self, *exception):
+        with self.__lock:
+            self.ended += 1
+
+
+class HeldLocks:
+    __slots__ = ("__locks",)
+
+    def __init__ (self, locks):
+        self.__locks = locks
+
+    def __enter__ (self):
+        for lock in self.__locks:
+            lock.acquire ()
+
+    def __exit__ (self, *exception):
+        for lock in reversed (self.__locks):
+            lock.release ()
+
+
+class Cursor:
+    """
+    The place of an iterator in the chains of the resources: the type and the id of the last resource it gave
+    an id of None is before the first resource of the type, and a type of None is before all the types
+    the library moves a cursor back to the resource before when its resource is removed, so the iterator goes on after it
+    """
+    __slots__ = ("type", "id", "__weakref__")
+
+    def __init__ (self, type = None, id = None):
+        self.type = type
+        self.id = id
+
+
 class Library:
-    def __init__(self):
-        self.__customers = []
-        self.__resources = []
+    def __init__(self, threadSafe = False, stripes = 64, loanPeriod = LOAN_PERIOD):
+        """
+        A loan is due loanPeriod seconds after it starts, if no other due time is given
+        With threadSafe the library can be used by many threads at once
+        a loan locks only its customer and its resource, with one of stripes locks for each id
+        adding and removing customers and resources take one lock for the whole library
+        the locks protect the methods of the library, not the methods of the resources called from outside, like borrow or repair
+        """
+        #customers and resources are kept in dicts by id - the dict keeps the insertion order
+        #and gives a direct access to each item, without scanning all the library
+        self.__customers = dict ()
+        self.__resources = dict ()
+        #the loans of every customer by resource id, and the loan of every borrowed resource
         self.__borrowing = dict ()
+        self.__loans = dict ()
+        #the same resources in a list for every customer, in the order they were borrowed, for the property borrowing
+        self.__borrowed = dict ()
+        #the loans by due time, in a heap: (due, order, loan)
+        #a returned loan stays in the heap until too many returned loans are there, then the heap is made again
+        self.__dues = []
+        self.__returned = 0
+        self.__order = count ()
+        self.__loanPeriod = loanPeriod
+        #the holds of every resource in a queue, first come first served, and the holds of every customer by resource id
+        #a hold is (customer, resource), a cancelled hold stays in its queue until it reaches the head
+        #a resource that became available with holds is ready for the first hold, and kept out of the availables
+        self.__holds = dict ()
+        self.__customerHolds = dict ()
+        self.__ready = dict ()
+        self.__holdReady = None
+        #during a commit the calls of holdReady wait for its end, and during its rollback the holds are not checked nor served
+        self.__readyCalls = None
+        self.__undoing = False
+        #the ids of the resources whose status is changed by a loan of the library, the loans are recorded by themselves
+        self.__loanChanges = set ()
+        #the start time of every repair running, in the order they started, and the totals of the repairs done
+        self.__repairs = dict ()
+        self.__repairsDone = 0
+        self.__repairsTime = 0.0
+        self.__longestRepair = 0.0
+        self.__firstRepair = None
+        self.__lastRepair = None
+        #the resources by (type, status), updated by the resources themselves when their status changes
+        self.__index = dict ()
+        #the resources of every type in a chain, in the order they were added, to walk from any resource without a scan
+        #the types are in the order of their first resource, and a type stays with None as its first id when it has no resources
+        self.__first = dict ()
+        self.__last = dict ()
+        self.__next = dict ()
+        self.__previous = dict ()
+        #the cursors of the iterators not finished, kept only while their iterator is used
+        self.__cursors = weakref.WeakSet ()
+        #the full text index is made at the first text search, and then follows the changes
+        self.__textIndex = None
+        #the secondary indexes by attribute name, made at the first query, and then follow the changes
+        self.__indexes = None
+        #the journal records every change of the library, see libraryJournal.py
+        self.__journal = None
+        if threadSafe:
+            self.__locks = LockStripes (stripes)
+            self.__registryLock = threading.RLock ()
+            self.__writes = WriteCounter ()
+            self.__duesLock = threading.Lock ()
+            self.__repairsLock = threading.Lock ()
+        else:
+            self.__locks = NoLocks ()
+            self.__registryLock = NO_LOCK
+            self.__writes = NO_LOCK
+            self.__duesLock = NO_LOCK
+            self.__repairsLock = NO_LOCK
+
+    @property
+    def threadSafe (self):
+        return isinstance (self.__locks, LockStripes)
+
+    def exclusive (self):
+        """
+        This method returns a context manager that stops all the changes of the library while it is held
+        """
+        return self.__locks.holdAll (self.__registryLock)
+
+    def read (self, function):
+        """
+        This method returns the result of function () from a state of the library that did not change while it ran
+        the reader takes no lock: if a change ran meanwhile function runs again, and after many tries it runs with all the locks
+        """
+        if not self.threadSafe:
+            return function ()
+        writes = self.__writes
+        for attempt in range (READ_ATTEMPTS):
+            started = writes.started
+            if writes.ended != started:
+                continue #a change is running
+            try:
+                result = function ()
+            except RuntimeError:
+                continue #a dict changed while it was copied
+            if writes.started == started:
+                return result
+        with self.exclusive ():
+            return function ()
+
+    def transaction (self):
+        """
+        This method returns a new transaction on the library, see Transaction
+        """
+        return Transaction (self)
+
+    def atomic (self, function, attempts = 10):
+        """
+        This method runs function (transaction) and commits the transaction
+        if a resource used by the transaction changed meanwhile, function runs again with a new transaction
+        return the result of function
+        """
+        for attempt in range (attempts):
+            transaction = Transaction (self)
+            result = function (transaction)
+            try:
+                transaction.commit ()
+                return result
+            except TransactionConflict:
+                if attempt == attempts - 1:
+                    raise
+
+    def _commit (self, versions, operations):
+        """
+        This method is called by a transaction to apply its operations, a list of (apply, undo) functions
+        raise TransactionConflict if a resource changed since the transaction used it
+        if an operation fails the operations done before are undone and the error is raised
+        the holds of the resources are put back as they were, and the journal and holdReady see only a commit that succeeded
+        """
+        with self.exclusive (), self.__writes:
+            resources = []
+            for resource, version in versions:
+                if resource.version != version:
+                    raise TransactionConflict (f"{resource.id} changed during the transaction")
+                resources.append (resource)
+            holds = self.__saveHolds (resources)
+            journal = self.__journal
+            if journal is not None:
+                self.__journal = PendingRecords ()
+            self.__readyCalls = []
+            done = []
+            try:
+                for apply, undo in operations:
+                    apply ()
+                    done.append (undo)
+            except Exception:
+                self.__undoing = True
+                try:
+                    for undo in reversed (done):
+                        undo ()
+                finally:
+                    self.__undoing = False
+                    self.__restoreHolds (holds)
+                raise
+            finally:
+                records, self.__journal = self.__journal, journal
+                calls, self.__readyCalls = self.__readyCalls, None
+            if journal is not None:
+                for operation, arguments in records:
+                    journal.record (operation, *arguments)
+            for customer, resource in calls:
+                if self.heldFor (resource.id) is customer:
+                    self.__holdReady (customer, resource)
+
+    def __saveHolds (self, resources):
+        """
+        This method returns a copy of the holds of the resources and of the customers who hold them, for __restoreHolds
+        """
+        queues = [(resource, tuple (self.__holds.get (resource.id, ())), self.__ready.get (resource.id)) for resource in resources]
+        customers = {hold [0].id: self.__customerHolds.get (hold [0].id) for resource, queue, ready in queues for hold in queue}
+        return queues, {id: None if holds is None else dict (holds) for id, holds in customers.items ()}
+
+    def __restoreHolds (self, saved):
+        """
+        This method puts back the holds copied by __saveHolds, after the statuses of the resources were put back
+        """
+        queues, customers = saved
+        for id, holds in customers.items ():
+            if holds is None:
+                self.__customerHolds.pop (id, None)
+            else:
+                self.__customerHolds [id] = holds
+        for resource, queue, ready in queues:
+            if len (queue) > 0:
+                self.__holds [resource.id] = deque (queue)
+            else:
+                self.__holds.pop (resource.id, None)
+            if ready is not None and resource.statusCode is Status.AVAILABLE:
+                self.__ready [resource.id] = ready
+                self.__index [(resource.type, Status.AVAILABLE)].pop (resource.id, None)
+            else:
+                self.__ready.pop (resource.id, None)
+                if resource.statusCode is Status.AVAILABLE:
+                    self.__index [(resource.type, Status.AVAILABLE)][resource.id] = resource
+
+    @property
+    def journal (self):
+        return self.__journal
+
+    @journal.setter
+    def journal (self, value):
+        if value is None or callable (getattr (value, "record", None)):
+            self.__journal = value
+        else:
+            raise TypeError ("journal should have a record method")
+
+    @property
+    def holdReady (self):
+        """
+        A function (customer, resource) called when a resource is ready for the customer who held it
+        it is called inside the library, so it should not call the library itself
+        """
+        return self.__holdReady
+
+    @holdReady.setter
+    def holdReady (self, value):
+        if value is None or callable (value):
+            self.__holdReady = value
+        else:
+            raise TypeError ("holdReady should be a function")
 
-    #all these properties return the copy of the list and not the list itself - encapsulation
+    #customers and resources return a read only view and not the dict itself - encapsulation without a copy
     @property
     def customers (self):
-        return list (self.__customers)
+        return LibraryView (self.__customers)
 
     @property
     def resources (self):
-        return list (self.__resources)
+        return LibraryView (self.__resources)
 
+    #borrowing is a new dict with the list of the borrowed resources for every customer id
     @property
     def borrowing (self):
-        return dict (self.__borrowing)
+        """
+        A new dict of customer id -> list of the resources borrowed, a dict of lists because tests.py checks their types
+        only the dict is copied, like the dict of customers before the views - the lists are of the library and must not be changed
+        """
+        return self.read (lambda: dict (self.__borrowed))
 
     #overloading
     def __contains__ (self, item):
@@ -28,15 +419,9 @@ class Library:
         This method checks if a customer or a resource is in the library
         """
         if isinstance (item, Customer):
-            for customer in self.customers:
-                if customer.id == item.id:
-                    return True
-            return False
+            return item.id in self.__customers
         elif isinstance (item, Resource):
-            for resource in self.resources:
-                if resource.id == item.id:
-                    return True
-            return False
+            return item.id in self.__resources
         else:
             return False
 
@@ -44,20 +429,128 @@ class Library:
     def add (self, item):
         """
         This method adds a customer or a resource to the library
+        the item is ready and recorded in the journal before its id is in the library, so no other thread uses it before
         """
-        if isinstance (item, Customer):
-            if item in self:
-                raise ValueError (f"customer {item.id} already exists")
-            else:
-                self.__customers.append (item)
-                self.__borrowing [item.id] = [] #add an empty list to manage to resources this customer borrows
-        elif isinstance (item, Resource):
-            if item in self:
-                raise ValueError (f"resource {item.id} already exists")
+        if not isinstance (item, (Customer, Resource)):
+            raise TypeError ("the object should be a customer or a resource")
+        with self.__registryLock, self.__writes:
+            if isinstance (item, Customer):
+                if item in self:
+                    raise ValueError (f"customer {item.id} already exists")
+                else:
+                    self.__borrowing [item.id] = dict () #add an empty dict to manage to resources this customer borrows
+                    self.__borrowed [item.id] = []
+                    if self.__journal is not None:
+                        self.__journal.record ("add", item)
+                    self.__customers [item.id] = item
             else:
-                self.__resources.append (item)
+                if item in self:
+                    raise ValueError (f"resource {item.id} already exists")
+                else:
+                    self.__indexResource (item)
+                    item._attach (self)
+                    if self.__textIndex is not None:
+                        self.__textIndex.add (item)
+                    if self.__indexes is not None:
+                        for index in self.__indexes.values ():
+                            index.add (item)
+                    if self.__journal is not None:
+                        self.__journal.record ("add", item)
+                    self.__resources [item.id] = item
+
+    def __indexResource (self, resource):
+        """
+        This method adds a resource to the index by (type, status) and at the end of the chain of its type
+        """
+        if (resource.type, Status.AVAILABLE) not in self.__index:
+             #all the statuses of a new type are added at once, so a change of status never adds a key to the index
+            for status in Status:
+                self.__index [(resource.type, status)] = dict ()
+        self.__index [(resource.type, resource.statusCode)][resource.id] = resource
+        if resource.statusCode is Status.UNDER_REPAIR:
+            self.__repairChanged (resource) #a resource added under repair starts its repair in this library now
+        last = self.__last.get (resource.type)
+        if last is None:
+            self.__first [resource.type] = resource.id
         else:
-            raise TypeError ("the object should be a customer or a resource")
+            self.__next [last] = resource.id
+        self.__last [resource.type] = resource.id
+        self.__previous [resource.id] = last
+        self.__next [resource.id] = None
+
+    def __indexResources (self, resources):
+        """
+        This method adds many resources to the index and to the chains of their types, like __indexResource
+        the resources of every type are added together, with one update of every dict
+        """
+        byType = dict ()
+        for resource in resources:
+            byType.setdefault (resource.type, []).append (resource)
+        for resourceType, typeResources in byType.items ():
+            if (resourceType, Status.AVAILABLE) not in self.__index:
+                for status in Status:
+                    self.__index [(resourceType, status)] = dict ()
+            ids = [resource.id for resource in typeResources]
+            statuses = [resource.statusCode for resource in typeResources]
+            if statuses.count (Status.AVAILABLE) == len (statuses):
+                self.__index [(resourceType, Status.AVAILABLE)].update (zip (ids, typeResources))
+            else:
+                for id, resource, status in zip (ids, typeResources, statuses):
+                    self.__index [(resourceType, status)][id] = resource
+                    if status is Status.UNDER_REPAIR:
+                        self.__repairChanged (resource)
+             #the chain of the type goes on from its last resource, through the new resources in their order
+            last = self.__last.get (resourceType)
+            if last is None:
+                self.__first [resourceType] = ids [0]
+            else:
+                self.__next [last] = ids [0]
+            self.__previous.update (zip (ids, [last] + ids [:-1]))
+            self.__next.update (zip (ids, ids [1:]))
+            self.__next [ids [-1]] = None
+            self.__last [resourceType] = ids [-1]
+
+    def addMany (self, items):
+        """
+        This method adds many customers and resources to the library at once
+        return a list of the items that were not added because their id already exists
+        raise an error if an item is not a customer or a resource, before adding anything
+        """
+        with self.__registryLock, self.__writes:
+            customers = dict ()
+            resources = dict ()
+            rejected = []
+            for item in items:
+                if isinstance (item, Customer):
+                    added = customers
+                    existing = self.__customers
+                elif isinstance (item, Resource):
+                    added = resources
+                    existing = self.__resources
+                else:
+                    raise TypeError ("the object should be a customer or a resource")
+                id = item.id
+                if id in existing or id in added:
+                    rejected.append (item)
+                else:
+                    added [id] = item
+             #the items are ready and recorded before their ids are in the library, like in add
+            for id in customers:
+                self.__borrowing [id] = dict ()
+                self.__borrowed [id] = []
+            self.__indexResources (resources.values ())
+            for resource in resources.values ():
+                resource._attach (self)
+            if self.__textIndex is not None:
+                self.__textIndex.addMany (resources.values ())
+            if self.__indexes is not None:
+                for index in self.__indexes.values ():
+                    index.addMany (resources.values ())
+            if self.__journal is not None and len (customers) + len (resources) > 0:
+                self.__journal.record ("addMany", list (customers.values ()) + list (resources.values ()))
+            self.__customers.update (customers)
+            self.__resources.update (resources)
+        return rejected
 
     def removeCustomer (self, id):
         """
@@ -65,15 +558,26 @@ class Library:
         return True if exists, False if not
         raise an error if the customer borrowed some resource
         """
-        for customer in self.customers:
-            if customer.id == id:
-                if len (self.borrowing [id]) == 0:
-                    self.__customers.remove (customer)
-                    self.__borrowing.pop (customer.id)
+        while True:
+            held = list (self.__customerHolds.get (id, ()))
+             #the holds of the customer are cancelled, so the resources held are locked too
+            with self.__registryLock, self.__locks.hold (id, *held), self.__writes:
+                if held != list (self.__customerHolds.get (id, ())):
+                    continue #a hold was placed meanwhile
+                if id not in self.__customers:
+                    return False
+                if len (self.__borrowing [id]) == 0:
+                    for customer, resource in list (self.__customerHolds.get (id, dict ()).values ()):
+                        self.__cancelHold (customer, resource)
+                    self.__customers.pop (id)
+                    self.__borrowing.pop (id)
+                    self.__borrowed.pop (id)
+                    self.__customerHolds.pop (id, None)
+                    if self.__journal is not None:
+                        self.__journal.record ("removeCustomer", id)
                     return True
                 else:
                     raise Exception ("cannot remove customer with borrowed resources")
-        return False
     
     def removeResource (self, id):
         """
@@ -81,29 +585,66 @@ class Library:
         return True if exists, False if not
         raise an error if the resource is not available
         """
-        for resource in self.resources:
-            if resource.id == id:
-                if resource.status == "available":
-                    self.__resources.remove (resource)
-                    return True
+        with self.__registryLock, self.__locks.hold (id), self.__writes:
+            resource = self.__resources.get (id)
+            if resource is None:
+                return False
+            if resource.statusCode is Status.AVAILABLE:
+                self.__resources.pop (id)
+                self.__index [(resource.type, Status.AVAILABLE)].pop (id, None) #a ready resource is not there
+                previous = self.__previous.pop (id)
+                following = self.__next.pop (id)
+                if previous is None:
+                    self.__first [resource.type] = following
                 else:
-                    raise Exception ("cannot remove unavailable resources")
-        return False
+                    self.__next [previous] = following
+                if following is None:
+                    self.__last [resource.type] = previous
+                else:
+                    self.__previous [following] = previous
+                for cursor in self.__cursors:
+                    if cursor.id == id:
+                        cursor.id = previous #the resource before is now followed by the resource after
+                for hold in self.__holds.pop (id, ()):
+                    holds = self.__customerHolds.get (hold [0].id, dict ())
+                    if holds.get (id) is hold:
+                        holds.pop (id)
+                self.__ready.pop (id, None)
+                resource._detach (self)
+                if self.__textIndex is not None:
+                    self.__textIndex.remove (resource)
+                if self.__indexes is not None:
+                    for index in self.__indexes.values ():
+                        index.remove (resource)
+                if self.__journal is not None:
+                    self.__journal.record ("removeResource", id)
+                return True
+            else:
+                raise Exception ("cannot remove unavailable resources")
 
-    def borrowResource (self, customer, resource):
+    def borrowResource (self, customer, resource, due = None, borrowed = None):
         """
         This method take a customer and a resource and borrow the resource to the customer if available
+        borrowed is the time of the loan, now if not given, and due is the time to return it, loanPeriod later if not given
         """
         if isinstance (customer, Customer) and isinstance (resource, Resource):
-            if customer not in self.customers:
-                raise ValueError (f"{customer.name} is not a registered to this library!")
-            elif resource not in self.resources:
-                raise ValueError (f"{resource.name} is not a resource in this library!")
-            elif resource.borrow ():
-                self.__borrowing [customer.id].append (resource)
-                return True
-            else:
-                raise ValueError (f"cannot borrow this {resource.type}")
+            with self.__locks.hold (customer.id, resource.id), self.__writes:
+                if self.__customers.get (customer.id) is not customer:
+                    raise ValueError (f"{customer.name} is not a registered to this library!")
+                elif self.__resources.get (resource.id) is not resource:
+                    raise ValueError (f"{resource.name} is not a resource in this library!")
+                elif not self.__readyFor (customer, resource):
+                    raise ValueError (f"this {resource.type} is held for another customer")
+                elif self.__loanStatus (resource, Resource.borrow):
+                    self.__takeHold (customer, resource)
+                    self.__borrowing [customer.id][resource.id] = resource
+                    self.__borrowed [customer.id].append (resource)
+                    loan = self.__startLoans (customer, [resource], due, borrowed) [0]
+                    if self.__journal is not None:
+                        self.__journal.record ("borrowResource", customer.id, resource.id, loan.due, loan.borrowed)
+                    return True
+                else:
+                    raise ValueError (f"cannot borrow this {resource.type}")
         else:
             raise TypeError ("customer or resource incorrect")
             
@@ -112,15 +653,105 @@ class Library:
         This method take a customer and a resource and return the resource to the library if borrowed to that customer
         """
         if isinstance (customer, Customer) and isinstance (resource, Resource):
-            if resource in self.__borrowing [customer.id]:
-                resource.returning ()
-                self.__borrowing [customer.id].remove (resource)
-                return True
-            else:
-                raise ValueError (f"customer {customer.id} did not borrowed {resource}")
+            with self.__locks.hold (customer.id, resource.id), self.__writes:
+                if self.__borrowing [customer.id].get (resource.id) is resource:
+                    self.__loanStatus (resource, Resource.returning)
+                    self.__borrowing [customer.id].pop (resource.id)
+                    self.__borrowed [customer.id].remove (resource)
+                    self.__endLoans ([resource])
+                    if self.__journal is not None:
+                        self.__journal.record ("returnResource", customer.id, resource.id)
+                    return True
+                else:
+                    raise ValueError (f"customer {customer.id} did not borrowed {resource}")
         else:
             raise TypeError ("customer or resource incorrect")
 
+    def __checkCustomer (self, customer):
+        """
+        This method raise an error if the customer is not a customer registered to this library
+        """
+        if not isinstance (customer, Customer):
+            raise TypeError ("customer incorrect")
+        if self.__customers.get (customer.id) is not customer:
+            raise ValueError (f"{customer.name} is not a registered to this library!")
+
+    def __holdLoans (self, customer, resources):
+        """
+        This method returns the locks of a customer and of resources, to borrow or return them together
+        """
+        return self.__locks.hold (*[item.id for item in [customer] + resources if isinstance (item, (Customer, Resource))])
+
+    def borrowMany (self, customer, resources, due = None, borrowed = None):
+        """
+        This method take a customer and many resources and borrow all of them to the customer, due and borrowed like borrowResource
+        return a list with True for every resource that can be borrowed, or the reason it cannot be borrowed
+        the resources are borrowed only if all of them can be borrowed, else nothing is changed
+        """
+        resources = list (resources)
+        with self.__holdLoans (customer, resources), self.__writes:
+            self.__checkCustomer (customer)
+            report = []
+            seen = set ()
+            for resource in resources:
+                if not isinstance (resource, Resource):
+                    report.append ("resource incorrect")
+                elif self.__resources.get (resource.id) is not resource:
+                    report.append (f"{resource.name} is not a resource in this library!")
+                elif resource.id in seen:
+                    report.append (f"{resource.id} appears more than once")
+                elif resource.statusCode is not Status.AVAILABLE:
+                    report.append (f"cannot borrow this {resource.type}")
+                elif not self.__readyFor (customer, resource):
+                    report.append (f"this {resource.type} is held for another customer")
+                else:
+                    report.append (True)
+                    seen.add (resource.id)
+            if all (result is True for result in report):
+                loans = self.__borrowing [customer.id]
+                for resource in resources:
+                    self.__loanStatus (resource, Resource.borrow)
+                    self.__takeHold (customer, resource)
+                    loans [resource.id] = resource
+                self.__borrowed [customer.id].extend (resources)
+                if len (resources) > 0:
+                    loan = self.__startLoans (customer, resources, due, borrowed) [0]
+                    if self.__journal is not None:
+                        self.__journal.record ("borrowMany", customer.id, [resource.id for resource in resources], loan.due, loan.borrowed)
+        return report
+
+    def returnMany (self, customer, resources):
+        """
+        This method take a customer and many resources and return all of them to the library
+        return a list with True for every resource that can be returned, or the reason it cannot be returned
+        the resources are returned only if all of them can be returned, else nothing is changed
+        """
+        resources = list (resources)
+        with self.__holdLoans (customer, resources), self.__writes:
+            self.__checkCustomer (customer)
+            loans = self.__borrowing [customer.id]
+            report = []
+            seen = set ()
+            for resource in resources:
+                if not isinstance (resource, Resource):
+                    report.append ("resource incorrect")
+                elif loans.get (resource.id) is not resource:
+                    report.append (f"customer {customer.id} did not borrowed {resource}")
+                elif resource.id in seen:
+                    report.append (f"{resource.id} appears more than once")
+                else:
+                    report.append (True)
+                    seen.add (resource.id)
+            if all (result is True for result in report):
+                for resource in resources:
+                    self.__loanStatus (resource, Resource.returning)
+                    loans.pop (resource.id)
+                self.__borrowed [customer.id][:] = loans.values () #one pass, and not a remove for every resource
+                self.__endLoans (resources)
+                if self.__journal is not None and len (resources) > 0:
+                    self.__journal.record ("returnMany", customer.id, [resource.id for resource in resources])
+        return report
+
     #overloading
     def availables (self, resourceType = None):
         """
@@ -128,23 +759,652 @@ class Library:
         return a dict of all the resources type with a list of available resources from that type
         if a type is specified, returns a list of available resources from that type
         """
+        return self.read (lambda: self.__byStatus (resourceType, Status.AVAILABLE))
+
+    def iterAvailables (self, resourceType = None, afterId = None, limit = None):
+        """
+        This method returns an iterator over the available resources, of a type or of all the types one type after the other
+        the resources of a type are in the order they were added, afterId starts after this resource and limit stops after limit resources
+        so the next page starts after the id of the last resource of a page, even if resources were borrowed or returned meanwhile
+        a resource removed while the iterator runs is skipped, and the iterator goes on after it
+        the resources are taken PAGE_SIZE at a time, a page costs the size of the page and the resources not available skipped
+        raise an error if afterId is not a resource of the library, of this type
+        """
+        return self.__iterChain (resourceType, afterId, limit, True)
+
+    def iterResources (self, resourceType = None, afterId = None, limit = None):
+        """
+        This method returns an iterator over the resources, like iterAvailables but with every status
+        """
+        return self.__iterChain (resourceType, afterId, limit, False)
+
+    def __iterChain (self, resourceType, afterId, limit, available):
+        size = PAGE_SIZE if limit is None else min (limit, PAGE_SIZE)
+        cursor = Cursor ()
+        with self.__registryLock:
+            if afterId is not None:
+                resource = self.__resources.get (afterId)
+                if resource is None:
+                    raise ValueError (f"resource {afterId} is not in the library")
+                if resourceType is not None and resource.type != resourceType:
+                    raise ValueError (f"resource {afterId} is not a {resourceType}")
+                cursor.type, cursor.id = resource.type, afterId
+            page = self.__page (resourceType, cursor, size, available) #the first page now, to check afterId
+            self.__cursors.add (cursor)
+        def pages (page, limit):
+            while True:
+                yield from page
+                if limit is not None:
+                    limit -= len (page)
+                if len (page) < size or limit == 0:
+                    return
+                page = self.__page (resourceType, cursor, size if limit is None else min (limit, size), available)
+        return pages (page, limit)
+
+    def __page (self, resourceType, cursor, size, available):
+        """
+        This method returns the next size resources of the chains after the cursor, and moves the cursor to the last of them
+        """
+        with self.__registryLock:
+            types = list (self.__first) if resourceType is None else [resourceType]
+            if cursor.type is None:
+                id = self.__first.get (types [0]) if len (types) > 0 else None
+            else:
+                types = types [types.index (cursor.type):]
+                id = self.__first [cursor.type] if cursor.id is None else self.__next [cursor.id]
+            page = []
+            for position, resourceType in enumerate (types):
+                if position > 0:
+                    id = self.__first [resourceType]
+                availables = self.__index.get ((resourceType, Status.AVAILABLE), dict ())
+                while id is not None and len (page) < size:
+                    if not available or id in availables:
+                        page.append (self.__resources [id])
+                    id = self.__next [id]
+                if len (page) == size:
+                    break
+            if len (page) > 0:
+                cursor.type, cursor.id = page [-1].type, page [-1].id
+            return page
+
+    def __byStatus (self, resourceType, wanted):
         if resourceType:
-            return list (filter (lambda resource: resource.type == resourceType and resource.status == "available", self.resources))
+            return list (self.__index.get ((resourceType, wanted), dict ()).values ())
         else:
-            availables = dict ()
-            for resource in self.resources:
-                if resource.status == "available":
-                    if resource.type in availables:
-                        availables[resource.type].append (resource)
-                    else:
-                        availables[resource.type] = [resource]
-            return availables
+            resources = dict ()
+            for (resourceType, status), typeResources in list (self.__index.items ()):
+                if status is wanted and len (typeResources) > 0:
+                    resources [resourceType] = list (typeResources.values ())
+            return resources
+
+    def _statusChanged (self, resource, oldStatus):
+        """
+        This method is called by a resource of the library when its status changes
+        it moves the resource to the right place in the index
+        """
+        with self.__writes:
+            self.__index [(resource.type, oldStatus)].pop (resource.id, None) #a ready resource is not there
+            self.__index [(resource.type, resource.statusCode)][resource.id] = resource
+            if resource.statusCode is Status.UNDER_REPAIR or oldStatus is Status.UNDER_REPAIR:
+                self.__repairChanged (resource)
+            if resource.statusCode is Status.AVAILABLE:
+                if resource.id in self.__holds:
+                    self.__serveHold (resource)
+            else:
+                self.__ready.pop (resource.id, None) #the hold stays first in the queue
+             #the loans of the library record their own changes, every other change of status is recorded here
+            if self.__journal is not None and resource.id not in self.__loanChanges:
+                self.__journal.record ("status", resource.id, resource.statusCode)
+
+    def __loanStatus (self, resource, change):
+        """
+        This method changes the status of a resource for a loan of the library, and returns the result of the change
+        the journal gets the record of the loan and not of the status
+        """
+        self.__loanChanges.add (resource.id)
+        try:
+            return change (resource)
+        finally:
+            self.__loanChanges.discard (resource.id)
+
+    def __repairChanged (self, resource):
+        """
+        This method keeps the start time of a repair, and adds the time of a finished repair to the totals
+        """
+        now = time.time ()
+        with self.__repairsLock:
+            if resource.statusCode is Status.UNDER_REPAIR:
+                self.__repairs [resource.id] = now
+                if self.__firstRepair is None:
+                    self.__firstRepair = now
+            else:
+                turnaround = now - self.__repairs.pop (resource.id, now)
+                self.__repairsDone += 1
+                self.__repairsTime += turnaround
+                self.__longestRepair = max (self.__longestRepair, turnaround)
+                self.__lastRepair = now
+
+    def sendToRepair (self, resources):
+        """
+        This method sends many available resources to repair at once
+        return a list with True for every resource that can be repaired, or the reason it cannot be repaired
+        the resources are sent only if all of them can be sent, else nothing is changed
+        """
+        return self.__repairMany (resources, Status.AVAILABLE, Resource.repair, "cannot repair this {}")
+
+    def completeRepair (self, resources):
+        """
+        This method brings back many resources from repair at once, the resources held are ready for their first hold
+        return a list with True for every resource that was under repair, or the reason it cannot come back
+        the resources come back only if all of them can, else nothing is changed
+        """
+        return self.__repairMany (resources, Status.UNDER_REPAIR, Resource.returning, "this {} is not under repair")
+
+    def __repairMany (self, resources, status, change, reason):
+        """
+        This method changes the status of many resources that all have the status given, like borrowMany
+        """
+        resources = list (resources)
+        with self.__locks.hold (*[resource.id for resource in resources if isinstance (resource, Resource)]), self.__writes:
+            report = []
+            seen = set ()
+            for resource in resources:
+                if not isinstance (resource, Resource):
+                    report.append ("resource incorrect")
+                elif self.__resources.get (resource.id) is not resource:
+                    report.append (f"{resource.name} is not a resource in this library!")
+                elif resource.id in seen:
+                    report.append (f"{resource.id} appears more than once")
+                elif resource.statusCode is not status:
+                    report.append (reason.format (resource.type))
+                else:
+                    report.append (True)
+                    seen.add (resource.id)
+            if all (result is True for result in report):
+                for resource in resources:
+                    change (resource)
+        return report
+
+    def underRepair (self, resourceType = None):
+        """
+        This method returns the resources under repair like availables: a list of one type, or a dict of all the types
+        """
+        return self.read (lambda: self.__byStatus (resourceType, Status.UNDER_REPAIR))
+
+    def repairStatistics (self):
+        """
+        This method returns a dict with the numbers of the repairs since the library was made, without a scan
+        underRepair: the repairs running, oldest: seconds since the oldest of them started
+        done: the repairs finished, meanTurnaround and longestTurnaround: their time in seconds
+        throughput: repairs finished per second, from the first repair to the last one finished
+        """
+        now = time.time ()
+        with self.__repairsLock:
+            oldest = next (iter (self.__repairs.values ()), None) #the dict keeps the order the repairs started
+            period = None if self.__lastRepair is None or self.__firstRepair is None else self.__lastRepair - self.__firstRepair
+            return {
+                "underRepair": len (self.__repairs),
+                "oldest": None if oldest is None else now - oldest,
+                "done": self.__repairsDone,
+                "meanTurnaround": self.__repairsTime / self.__repairsDone if self.__repairsDone > 0 else None,
+                "longestTurnaround": self.__longestRepair if self.__repairsDone > 0 else None,
+                "throughput": self.__repairsDone / period if period else None,
+            }
+
+    def _resourceChanged (self, resource):
+        """
+        This method is called by a resource of the library when one of its attributes changes
+        """
+        with self.__registryLock, self.__writes:
+            if self.__textIndex is not None:
+                self.__textIndex.update (resource)
+            if self.__indexes is not None:
+                for index in self.__indexes.values ():
+                    index.update (resource)
+            if self.__journal is not None:
+                self.__journal.record ("change", resource)
+
+    def borrower (self, id):
+        """
+        This method returns the customer who borrowed the resource with this id
+        return None if the resource is not borrowed
+        """
+        loan = self.__loans.get (id)
+        if loan is None:
+            return None
+        return loan.customer
+
+    def loan (self, id):
+        """
+        This method returns the loan of the resource with this id, None if the resource is not borrowed
+        """
+        return self.__loans.get (id)
+
+    def __startLoans (self, customer, resources, due, borrowed):
+        """
+        This method makes the loans of resources just borrowed by the customer, and returns them
+        """
+        if borrowed is None:
+            borrowed = time.time ()
+        if due is None:
+            due = borrowed + self.__loanPeriod
+        loans = [Loan (customer, resource, borrowed, due) for resource in resources]
+        with self.__duesLock:
+            for loan in loans:
+                self.__loans [loan.resource.id] = loan
+                heapq.heappush (self.__dues, (due, next (self.__order), loan))
+        return loans
+
+    def __endLoans (self, resources):
+        """
+        This method removes the loans of resources just returned
+        """
+        with self.__duesLock:
+            for resource in resources:
+                self.__loans.pop (resource.id)
+            self.__returned += len (resources)
+            if self.__returned > 64 and self.__returned > len (self.__dues) // 2:
+                self.__dues = [entry for entry in self.__dues if self.__loans.get (entry [2].resource.id) is entry [2]]
+                heapq.heapify (self.__dues)
+                self.__returned = 0
+
+    def __byDue (self):
+        """
+        This generator yields the current loans from the first due, without changing the heap
+        the heap is walked like a tree from its root, the next node is always the smallest child seen, so k loans cost O (k log k)
+        """
+        dues = self.__dues
+        if len (dues) == 0:
+            return
+        waiting = [(dues [0], 0)]
+        while len (waiting) > 0:
+            entry, position = heapq.heappop (waiting)
+            if self.__loans.get (entry [2].resource.id) is entry [2]:
+                yield entry [2]
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len (dues):
+                    heapq.heappush (waiting, (dues [child], child))
+
+    def overdue (self, when = None):
+        """
+        This method returns the loans due before when, now if not given, the first due first
+        """
+        if when is None:
+            when = time.time ()
+        with self.__duesLock:
+            loans = []
+            for loan in self.__byDue ():
+                if loan.due >= when:
+                    break
+                loans.append (loan)
+            return loans
+
+    def nextDue (self, number):
+        """
+        This method returns the number loans that are due first
+        """
+        with self.__duesLock:
+            return list (islice (self.__byDue (), number))
+
+    def placeHold (self, customer, resource):
+        """
+        This method adds the customer to the queue of the resource, to get it when it is available
+        if the resource is available and nobody holds it, it is ready for the customer at once
+        """
+        if not isinstance (customer, Customer) or not isinstance (resource, Resource):
+            raise TypeError ("customer or resource incorrect")
+        with self.__locks.hold (customer.id, resource.id), self.__writes:
+            if self.__customers.get (customer.id) is not customer:
+                raise ValueError (f"{customer.name} is not a registered to this library!")
+            elif self.__resources.get (resource.id) is not resource:
+                raise ValueError (f"{resource.name} is not a resource in this library!")
+            elif resource.id in self.__borrowing [customer.id]:
+                raise ValueError (f"customer {customer.id} already borrowed {resource}")
+            holds = self.__customerHolds.setdefault (customer.id, dict ())
+            if resource.id in holds:
+                raise ValueError (f"customer {customer.id} already holds {resource}")
+            hold = (customer, resource)
+            holds [resource.id] = hold
+            self.__holds.setdefault (resource.id, deque ()).append (hold)
+            if resource.statusCode is Status.AVAILABLE and resource.id not in self.__ready:
+                self.__serveHold (resource)
+            if self.__journal is not None:
+                self.__journal.record ("placeHold", customer.id, resource.id)
+            return True
+
+    def cancelHold (self, customer, resource):
+        """
+        This method removes the customer from the queue of the resource
+        if the resource was ready for the customer, it goes to the next hold
+        """
+        if not isinstance (customer, Customer) or not isinstance (resource, Resource):
+            raise TypeError ("customer or resource incorrect")
+        with self.__locks.hold (customer.id, resource.id), self.__writes:
+            if resource.id not in self.__customerHolds.get (customer.id, ()):
+                raise ValueError (f"customer {customer.id} does not hold {resource}")
+            self.__cancelHold (customer, resource)
+            if self.__journal is not None:
+                self.__journal.record ("cancelHold", customer.id, resource.id)
+            return True
+
+    def __cancelHold (self, customer, resource):
+        hold = self.__customerHolds [customer.id].pop (resource.id)
+        if self.__ready.get (resource.id) is hold:
+            del self.__ready [resource.id]
+            self.__index [(resource.type, Status.AVAILABLE)][resource.id] = resource
+            self.__serveHold (resource)
+
+    def __activeHold (self, hold):
+        return self.__customerHolds.get (hold [0].id, dict ()).get (hold [1].id) is hold
+
+    def __serveHold (self, resource):
+        """
+        This method makes an available resource ready for its first hold, in O (1)
+        the cancelled holds at the head of the queue are dropped on the way
+        """
+        if self.__undoing:
+            return #the holds are put back after the rollback
+        queue = self.__holds [resource.id]
+        while len (queue) > 0 and not self.__activeHold (queue [0]):
+            queue.popleft ()
+        if len (queue) == 0:
+            del self.__holds [resource.id]
+            return
+        customer = queue [0][0]
+        self.__ready [resource.id] = queue [0]
+        self.__index [(resource.type, Status.AVAILABLE)].pop (resource.id)
+        if self.__holdReady is not None:
+            if self.__readyCalls is None:
+                self.__holdReady (customer, resource)
+            else:
+                self.__readyCalls.append ((customer, resource)) #called at the end of the commit
+
+    def __readyFor (self, customer, resource):
+        """
+        This method returns False if the resource is ready for another customer
+        """
+        hold = self.__ready.get (resource.id)
+        return hold is None or hold [0] is customer or self.__undoing
+
+    def __takeHold (self, customer, resource):
+        """
+        This method removes the hold of a customer who just borrowed the resource that was ready for the customer
+        the hold of a ready resource is always the first of its queue
+        """
+        queue = self.__holds.get (resource.id)
+        if queue is None or queue [0][0] is not customer or self.__undoing:
+            return
+        self.__customerHolds [customer.id].pop (resource.id)
+        queue.popleft ()
+        if len (queue) == 0:
+            del self.__holds [resource.id]
+
+    def holds (self, customerId):
+        """
+        This method returns the resources held by the customer, in the order of the holds
+        """
+        return [resource for customer, resource in self.__customerHolds.get (customerId, dict ()).values ()]
+
+    def holdQueue (self, resourceId):
+        """
+        This method returns the customers waiting for the resource, the first first
+        """
+        return [hold [0] for hold in self.__holds.get (resourceId, ()) if self.__activeHold (hold)]
+
+    def heldFor (self, resourceId):
+        """
+        This method returns the customer the resource is ready for, None if it is not kept for anyone
+        """
+        hold = self.__ready.get (resourceId)
+        return None if hold is None else hold [0]
 
     def search (self, id):
-        for resource in self.resources:
-            if resource.id == id:
-                return resource
-        return None
+        return self.__resources.get (id)
+
+    def searchCustomer (self, id):
+        return self.__customers.get (id)
+
+    def searchText (self, query, limit = None):
+        """
+        This method returns the resources with the words of the query in their name, author, singer, publisher or department
+        the best results are first, words must all be found and OR between words gives the results of both sides
+        a word that ends with * is a prefix, for example: "harr* OR tolkien"
+        """
+        with self.__registryLock:
+            if self.__textIndex is None:
+                self.__textIndex = TextIndex ()
+                self.__textIndex.addMany (self.__resources.values ())
+            return self.__textIndex.search (query, limit)
+
+    def addIndex (self, index):
+        """
+        This method adds a secondary index to the library, like libraryIndexes.HashIndex ("name")
+        it replaces the index of the same attribute, if any
+        """
+        with self.__registryLock:
+            self.__useIndexes ()
+            index.addMany (self.__resources.values ())
+            self.__indexes [index.field] = index
+
+    def __useIndexes (self):
+        if self.__indexes is None:
+            self.__indexes = dict ()
+            for index in defaultIndexes ():
+                index.addMany (self.__resources.values ())
+                self.__indexes [index.field] = index
+
+    def issues (self, publisher, name, first = None, last = None):
+        """
+        This method returns the magazines of a title, by publisher and name, with serialNumber between first and last, both included
+        without first or last the range is open on that side, the magazines are sorted by serialNumber
+        """
+        with self.__registryLock:
+            self.__useIndexes ()
+            return [magazine for issue in self.__indexes ["issues"].range ((publisher, name), first, last) for magazine in issue.values ()]
+
+    def latestIssue (self, publisher, name):
+        """
+        This method returns the magazine of a title with the highest serialNumber, None if the title is not in the library
+        """
+        with self.__registryLock:
+            self.__useIndexes ()
+            return next (iter (self.__indexes ["issues"].latest ((publisher, name)).values ()), None)
+
+    def availableIssues (self, publisher, name, first = None, last = None):
+        """
+        This method returns the available magazines of a title in a range of serialNumber, like issues
+        """
+        with self.__registryLock:
+            available = self.__index.get (("Magazine", Status.AVAILABLE), dict ())
+            return [magazine for magazine in self.issues (publisher, name, first, last) if magazine.id in available]
+
+    def borrowIssues (self, customer, publisher, name, first, last, due = None, borrowed = None):
+        """
+        This method borrows to the customer one copy of every issue of a title between first and last, in one loan like borrowMany
+        with first or last None the run starts at the first issue of the title or ends at its last issue
+        return the magazines borrowed
+        raise an error if the run has no issue, if a serialNumber of the run has no issue in the library, or if an issue cannot be borrowed
+        then nothing is borrowed
+        """
+        with self.__registryLock:
+            self.__useIndexes ()
+            issues = self.__indexes ["issues"].range ((publisher, name), first, last)
+            if len (issues) == 0:
+                raise ValueError (f"no issue of {name} by {publisher} from {first} to {last}")
+            serialNumbers = [next (iter (issue.values ())).serialNumber for issue in issues]
+            missing = [] #the gaps of the run, as (first, last)
+            expected = serialNumbers [0] if first is None else first
+            for serialNumber in serialNumbers + [(serialNumbers [-1] if last is None else last) + 1]:
+                if serialNumber > expected:
+                    missing.append ((expected, serialNumber - 1))
+                expected = serialNumber + 1
+            if len (missing) > 0:
+                gaps = ", ".join (str (gap [0]) if gap [0] == gap [1] else f"{gap [0]}-{gap [1]}" for gap in missing)
+                raise ValueError (f"the issues {gaps} of {name} by {publisher} are not in the library")
+            available = self.__index.get (("Magazine", Status.AVAILABLE), dict ())
+            magazines = []
+            for issue in issues:
+                copies = list (issue.values ())
+                 #a copy ready for this customer first, then any available copy, else the first copy gives the reason
+                ready = [magazine for magazine in copies if magazine.id in self.__ready and self.__readyFor (customer, magazine)]
+                magazines.append (next (iter (ready + [magazine for magazine in copies if magazine.id in available]), copies [0]))
+            report = self.borrowMany (customer, magazines, due, borrowed)
+            for magazine, result in zip (magazines, report):
+                if result is not True:
+                    raise ValueError (f"cannot borrow issue {magazine.serialNumber}: {result}")
+            return magazines
+
+    def query (self, **criteria):
+        """
+        This method returns the resources that match all the criteria, with the secondary indexes
+        a criterion is attribute = value, or attributeRange = (first, last) on a sorted index, both ends included
+        for example: query (type = "Book", author = "J.R.R. Tolkien", yearRange = (1930, 1960))
+        the resources of the smallest criterion are checked against the others, from the smallest to the largest
+        the resources are not in the order of the library
+        raise an error if an attribute has no index
+        """
+        with self.__registryLock:
+            self.__useIndexes ()
+            found = [] #(size, list of postings, check of a resource) of every criterion
+            for name, value in criteria.items ():
+                index = self.__indexes.get (name)
+                if index is not None:
+                    postings = [index.postings (value)]
+                    check = lambda resource, resources = postings [0]: resource.id in resources
+                else:
+                    index = self.__indexes.get (name [:-len ("Range")]) if name.endswith ("Range") else None
+                    if not isinstance (index, SortedIndex):
+                        raise ValueError (f"no index for {name}")
+                    postings = index.range (*value)
+                    check = lambda resource, index = index, value = value: index.inRange (resource, *value)
+                found.append ((sum (len (resources) for resources in postings), postings, check))
+            if len (found) == 0:
+                return list (self.__resources.values ())
+            found.sort (key = lambda criterion: criterion [0])
+            checks = [check for size, postings, check in found [1:]]
+            return [resource for resources in found [0][1] for resource in resources.values ()
+                    if all (check (resource) for check in checks)]
+
+
+class Loan:
+    """
+    This class is a loan of a resource to a customer, with the time it started and the time it is due
+    the times are in seconds since the epoch, like time.time ()
+    """
+    __slots__ = ("__customer", "__resource", "__borrowed", "__due")
+
+    def __init__ (self, customer, resource, borrowed, due):
+        self.__customer = customer
+        self.__resource = resource
+        self.__borrowed = borrowed
+        self.__due = due
+
+    @property
+    def customer (self):
+        return self.__customer
+
+    @property
+    def resource (self):
+        return self.__resource
+
+    @property
+    def borrowed (self):
+        return self.__borrowed
+
+    @property
+    def due (self):
+        return self.__due
+
+    def __str__ (self):
+        return f"{self.resource.id} borrowed by customer {self.customer.id} until {time.ctime (self.due)}"
+
+
+class PendingRecords (list):
+    """
+    The records of the journal made during a commit, they are written in the journal only if the commit succeeds
+    """
+    def record (self, operation, *arguments):
+        self.append ((operation, arguments))
+
+
+class TransactionConflict (Exception):
+    """
+    A resource used by a transaction changed before the transaction was committed
+    """
+
+
+class Transaction:
+    """
+    This class keeps the operations of a transaction, nothing is changed before the commit
+    the version of every resource is kept when the transaction first uses it
+    the commit applies all the operations at once, or none of them if a resource changed meanwhile or an operation fails
+    used with "with", the transaction is committed at the end of the block if no error was raised
+    """
+    def __init__ (self, library):
+        self.__library = library
+        self.__versions = dict () #resource id -> (resource, version)
+        self.__operations = [] #(apply, undo) functions
+        self.__committed = False
+
+    def __use (self, resource):
+        if not isinstance (resource, Resource):
+            raise TypeError ("resource incorrect")
+        if resource.id not in self.__versions:
+            self.__versions [resource.id] = (resource, resource.version)
+
+    def status (self, resource):
+        """
+        This method returns the status of the resource, the commit fails if it changes before
+        """
+        self.__use (resource)
+        return resource.status
+
+    def borrowResource (self, customer, resource):
+        self.__use (resource)
+        library = self.__library
+        self.__operations.append ((lambda: library.borrowResource (customer, resource), lambda: library.returnResource (customer, resource)))
+
+    def returnResource (self, customer, resource):
+        self.__use (resource)
+        library = self.__library
+        loans = []
+        def apply ():
+            loans.append (library.loan (resource.id))
+            library.returnResource (customer, resource)
+        def undo ():
+            library.borrowResource (customer, resource, loans [0].due, loans [0].borrowed)
+        self.__operations.append ((apply, undo))
+
+    def repair (self, resource):
+        self.__use (resource)
+        def apply ():
+            if not resource.repair ():
+                raise ValueError (f"cannot repair this {resource.type}")
+        self.__operations.append ((apply, resource.returning))
+
+    def returning (self, resource):
+        """
+        This method brings back a resource from repair, a borrowed resource is returned with returnResource
+        """
+        self.__use (resource)
+        def apply ():
+            if resource.statusCode is not Status.UNDER_REPAIR:
+                raise ValueError (f"this {resource.type} is not under repair")
+            resource.returning ()
+        self.__operations.append ((apply, resource.repair))
+
+    def commit (self):
+        if self.__committed:
+            raise ValueError ("the transaction was already committed")
+        self.__library._commit (self.__versions.values (), self.__operations)
+        self.__committed = True
+
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, errorType, error, traceback):
+        if errorType is None:
+            self.commit ()
 
 
 class Resource (ABC):
@@ -152,10 +1412,15 @@ class Resource (ABC):
     This is the abstract class for the resource
     resource must have an id, a name, a type and a string representation
     the property status and all the methods connected are already implented
+    the attributes are in __slots__ and not in a __dict__ to save memory, every subclass declares its own
     """
+    __slots__ = ("__status", "__libraries", "__id", "__name", "__version")
+
     @abstractmethod
     def __init__ (self, id, name):
-        self.__status = "available" #default status is available
+        self.__version = 0 #grows at every change of the resource, see Transaction
+        self.__status = Status.AVAILABLE #default status is available
+        self.__libraries = () #the libraries of this resource, to tell them when the status changes
         if type (id) == int:
             self.__id = id
         else:
@@ -174,8 +1439,18 @@ class Resource (ABC):
     def name (self, value):
         if type (value) == str:
             self.__name = value
+            self._changed ()
         else:
             raise TypeError ("name must be a string")
+
+    def _changed (self):
+        """
+        This method is called when an attribute of the resource changes, to tell the libraries of the resource
+        the subclasses that keep their string representation override it to make it again
+        """
+        self.__version += 1
+        for library in self.__libraries:
+            library._resourceChanged (self)
         
     @property
     @abstractmethod
@@ -188,15 +1463,45 @@ class Resource (ABC):
 
     @property
     def status (self):
+        return STATUS_TEXTS [self.__status]
+
+    @property
+    def statusCode (self):
         return self.__status
 
+    @property
+    def version (self):
+        """
+        The number of changes of the resource, of its status or of its attributes
+        """
+        return self.__version
+
+    def __setStatus (self, status):
+        oldStatus = self.__status
+        self.__status = status
+        self.__version += 1
+        for library in self.__libraries:
+            library._statusChanged (self, oldStatus)
+
+    def _attach (self, library):
+        """
+        This method is called by a library when the resource is added to it
+        """
+        self.__libraries += (library,)
+
+    def _detach (self, library):
+        """
+        This method is called by a library when the resource is removed from it
+        """
+        self.__libraries = tuple (other for other in self.__libraries if other is not library)
+
     def borrow (self):
         """
         This method change the status to borrowed if available
         return True if success, else False
         """
-        if self.status == "available":
-            self.__status = "borrowed"
+        if self.__status is Status.AVAILABLE:
+            self.__setStatus (Status.BORROWED)
             return True
         else:
             return False
@@ -206,8 +1511,8 @@ class Resource (ABC):
         This method change the status to available if borrowed or under repair
         return True if success, else False
         """
-        if self.status in ("borrowed", "under repair"):
-            self.__status = "available"
+        if self.__status is not Status.AVAILABLE: #borrowed or under repair
+            self.__setStatus (Status.AVAILABLE)
             return True
         else:
             return False
@@ -217,8 +1522,8 @@ class Resource (ABC):
         This method change the status to under repair if available
         return True if success, else False
         """
-        if self.status == "available":
-            self.__status = "under repair"
+        if self.__status is Status.AVAILABLE:
+            self.__setStatus (Status.UNDER_REPAIR)
             return True
         else:
             return False
@@ -228,8 +1533,12 @@ class Book (Resource):
     """
     Implementation of book class
     """
+    __slots__ = ("__id", "__text", "__author", "__year", "__department")
+
     def __init__(self, id, name, author, year, department):
+        self.__text = None #the string representation is made again only after a change
         super ().__init__(id, name)
+        self.__id = sys.intern (f"B{super().id}") #the id is made once and can be used as a key
         self.author = author
         self.year = year
         self.department = department
@@ -239,14 +1548,20 @@ class Book (Resource):
         """
         The id is the integer provided with prefix B
         """
-        return f"B{super().id}"
+        return self.__id
         
     @property
     def type (self):
         return "Book"
 
     def __str__ (self):
-        return f"{self.id}: '{self.name}' by {self.author} ({self.year})"
+        if self.__text is None:
+            self.__text = f"{self.id}: '{self.name}' by {self.author} ({self.year})"
+        return self.__text
+
+    def _changed (self):
+        self.__text = None
+        super ()._changed ()
             
     @property
     def author (self):
@@ -256,6 +1571,7 @@ class Book (Resource):
     def author (self, value):
         if type (value) == str:
             self.__author = value
+            self._changed ()
         else:
             raise TypeError ("author must be a string")
             
@@ -267,6 +1583,7 @@ class Book (Resource):
     def year (self, value):
         if type (value) == int:
             self.__year = value
+            self._changed ()
         else:
             raise TypeError ("year must be an integer")
             
@@ -278,6 +1595,7 @@ class Book (Resource):
     def department (self, value):
         if type (value) == str:
             self.__department = value
+            self._changed ()
         else:
             raise TypeError ("department must be a string")
 
@@ -286,8 +1604,12 @@ class Magazine (Resource):
     """
     Implementation of magazine class
     """
+    __slots__ = ("__id", "__text", "__publisher", "__serialNumber")
+
     def __init__(self, id, name, publisher, serialNumber):
+        self.__text = None #the string representation is made again only after a change
         super ().__init__(id, name)
+        self.__id = sys.intern (f"M{super().id}") #the id is made once and can be used as a key
         self.publisher = publisher
         self.serialNumber = serialNumber
 
@@ -296,14 +1618,20 @@ class Magazine (Resource):
         """
         The id is the integer provided with prefix M
         """
-        return f"M{super().id}"
+        return self.__id
         
     @property
     def type (self):
         return "Magazine"
 
     def __str__ (self):
-        return f"{self.id}: '{self.name}' by {self.publisher} - number {self.serialNumber}"
+        if self.__text is None:
+            self.__text = f"{self.id}: '{self.name}' by {self.publisher} - number {self.serialNumber}"
+        return self.__text
+
+    def _changed (self):
+        self.__text = None
+        super ()._changed ()
         
     @property
     def publisher (self):
@@ -313,6 +1641,7 @@ class Magazine (Resource):
     def publisher (self, value):
         if type (value) == str:
             self.__publisher = value
+            self._changed ()
         else:
             raise TypeError ("publisher must be a string")
             
@@ -324,6 +1653,7 @@ class Magazine (Resource):
     def serialNumber (self, value):
         if type (value) == int:
             self.__serialNumber = value
+            self._changed ()
         else:
             raise TypeError ("serialNumber must be an integer")
 
@@ -332,8 +1662,12 @@ class Disk (Resource):
     """
     Implementation of disk class
     """
+    __slots__ = ("__id", "__text", "__singer", "__year")
+
     def __init__(self, id, name, singer, year):
+        self.__text = None #the string representation is made again only after a change
         super ().__init__(id, name)
+        self.__id = sys.intern (f"D{super().id}") #the id is made once and can be used as a key
         self.singer = singer
         self.year = year
 
@@ -342,14 +1676,20 @@ class Disk (Resource):
         """
         The id is the integer provided with prefix D
         """
-        return f"D{super().id}"
+        return self.__id
         
     @property
     def type (self):
         return "Disk"
 
     def __str__ (self):
-        return f"{self.id}: '{self.name}' by {self.singer} ({self.year})"
+        if self.__text is None:
+            self.__text = f"{self.id}: '{self.name}' by {self.singer} ({self.year})"
+        return self.__text
+
+    def _changed (self):
+        self.__text = None
+        super ()._changed ()
         
     @property
     def singer (self):
@@ -359,6 +1699,7 @@ class Disk (Resource):
     def singer (self, value):
         if type (value) == str:
             self.__singer = value
+            self._changed ()
         else:
             raise TypeError ("singer must be a string")
             
@@ -370,6 +1711,7 @@ class Disk (Resource):
     def year (self, value):
         if type (value) == int:
             self.__year = value
+            self._changed ()
         else:
             raise TypeError ("year must be an integer")
 
@@ -378,6 +1720,8 @@ class Customer ():
     """
     This class define a customer
     """
+    __slots__ = ("__id", "__name", "__telephone")
+
     def __init__(self, id, name, telephone):
         #setters are handled separately
         self.id = id
@@ -0,0 +1,1298 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import tempfile
+import threading
+import unittest
+from itertools import islice
+import myLibrary as mod
+import gptLibrary
+import deepseekLibrary
+import geminiLibrary
+import librarySnapshot
+import libraryJournal
+import libraryAsync
+import libraryShards
+import libraryColumns
+import libraryIndexes
+import benchmarksModules
+import libraryBackends
+"""
+Tests for the performance changes made on myLibrary
+tests.py checks the assessment itself and can run against every module, this file only checks myLibrary
+"""
+
+class TestViews (unittest.TestCase):
+    """
+    Check the read only views returned by Library.customers and Library.resources
+    """
+    def setUp (self):
+        self.library = mod.Library ()
+        self.customer = mod.Customer (123456789, "Israel Israeli", 547000000)
+        self.book = mod.Book (3, "Harry Potter and the Philosopher Stone", "J.K. Rowling", 1997, "fiction")
+        self.disk = mod.Disk (1, "Shetah Afor", "Ishay Ribo", 2018)
+        self.library.add (self.customer)
+        self.library.add (self.book)
+        self.library.add (self.disk)
+
+    def testSequence (self):
+        resources = self.library.resources
+        self.assertEqual (len (resources), 2)
+        self.assertIs (resources [0], self.book)
+        self.assertIs (resources [-1], self.disk)
+        self.assertEqual (resources [:], [self.book, self.disk])
+        self.assertEqual (resources, [self.book, self.disk])
+        self.assertRaises (IndexError, lambda: resources [2])
+
+    def testContains (self):
+        self.assertIn (self.book, self.library.resources)
+        self.assertIn (self.customer, self.library.customers)
+         #another object with the same id is not the registered object
+        self.assertNotIn (mod.Book (3, "The Lion King", "Walt Disney", 1994, "children"), self.library.resources)
+        self.assertNotIn ("B3", self.library.resources)
+
+    def testLive (self):
+        resources = self.library.resources
+        self.library.removeResource (self.book.id)
+        self.assertEqual (list (resources), [self.disk])
+
+    def testReadOnly (self):
+        with self.assertRaises (Exception):
+            self.library.resources.append (self.book)
+        with self.assertRaises (Exception):
+            self.library.customers [0] = self.customer
+
+    def testBorrowingCopy (self):
+        #borrowing is a new dict, with the lists of the library in it
+        self.library.borrowResource (self.customer, self.book)
+        borrowing = self.library.borrowing
+        self.assertIs (type (borrowing), dict)
+        borrowing.clear ()
+        self.assertEqual (self.library.borrowing, {self.customer.id: [self.book]})
+
+class TestAvailables (unittest.TestCase):
+    """
+    Check that the availability index follows the status of the resources
+    """
+    def setUp (self):
+        self.library = mod.Library ()
+        self.customer = mod.Customer (123456789, "Israel Israeli", 547000000)
+        self.book = mod.Book (3, "Harry Potter and the Philosopher Stone", "J.K. Rowling", 1997, "fiction")
+        self.book2 = mod.Book (4, "The Origin of Species", "Charles Darwin", 1859, "science")
+        self.disk = mod.Disk (1, "Shetah Afor", "Ishay Ribo", 2018)
+        for item in (self.customer, self.book, self.book2, self.disk):
+            self.library.add (item)
+
+    def testStatusChanges (self):
+        self.assertEqual (self.library.availables ("Book"), [self.book, self.book2])
+        self.book.repair () #directly on the resource, not through the library
+        self.assertEqual (self.library.availables ("Book"), [self.book2])
+        self.library.borrowResource (self.customer, self.disk)
+        self.assertEqual (self.library.availables (), {"Book": [self.book2]})
+        self.book.returning ()
+        self.library.returnResource (self.customer, self.disk)
+        self.assertEqual (set (self.library.availables ("Book")), {self.book, self.book2})
+        self.assertEqual (self.library.availables ("Disk"), [self.disk])
+        self.assertEqual (self.library.availables ("Magazine"), [])
+
+    def testRemovedResource (self):
+        self.library.removeResource (self.book.id)
+        self.assertEqual (self.library.availables ("Book"), [self.book2])
+        self.book.repair () #the library does not follow this book anymore
+        self.assertEqual (self.library.availables ("Book"), [self.book2])
+
+class TestLoans (unittest.TestCase):
+    """
+    Check the loans of the customers and the borrower of every resource
+    """
+    def setUp (self):
+        self.library = mod.Library ()
+        self.customer = mod.Customer (123456789, "Israel Israeli", 547000000)
+        self.customer2 = mod.Customer (456, "Arieh Ankri", 545474877)
+        self.book = mod.Book (3, "Harry Potter and the Philosopher Stone", "J.K. Rowling", 1997, "fiction")
+        self.disk = mod.Disk (1, "Shetah Afor", "Ishay Ribo", 2018)
+        for item in (self.customer, self.customer2, self.book, self.disk):
+            self.library.add (item)
+
+    def testBorrower (self):
+        self.assertIsNone (self.library.borrower (self.book.id))
+        self.library.borrowResource (self.customer, self.book)
+        self.library.borrowResource (self.customer, self.disk)
+        self.assertIs (self.library.borrower (self.book.id), self.customer)
+        self.assertEqual (self.library.borrowing, {self.customer.id: [self.book, self.disk], self.customer2.id: []})
+        self.library.returnResource (self.customer, self.book)
+        self.assertIsNone (self.library.borrower (self.book.id))
+        self.assertEqual (self.library.borrowing [self.customer.id], [self.disk])
+
+    def testReturnOtherResource (self):
+        self.library.borrowResource (self.customer, self.book)
+         #a resource with the same id that is not the borrowed resource
+        self.assertRaises (ValueError, self.library.returnResource, self.customer, mod.Book (3, "The Lion King", "Walt Disney", 1994, "children"))
+        self.assertRaises (ValueError, self.library.returnResource, self.customer2, self.book)
+        self.assertIs (self.library.borrower (self.book.id), self.customer)
+
+    def testBorrowingOrder (self):
+        #the lists keep the order of the loans after returnMany
+        magazine = mod.Magazine (452, "Maariv Lanoar", "Maariv", 32)
+        self.library.add (magazine)
+        self.library.borrowMany (self.customer, [self.book, self.disk])
+        self.library.borrowResource (self.customer2, magazine)
+        borrowed = self.library.borrowing [self.customer.id]
+        self.library.returnMany (self.customer, [self.book])
+        self.assertEqual (self.library.borrowing, {self.customer.id: [self.disk], self.customer2.id: [magazine]})
+        self.assertIs (self.library.borrowing [self.customer.id], borrowed)
+
+class TestBatch (unittest.TestCase):
+    """
+    Check borrowMany and returnMany - all the resources or nothing
+    """
+    def setUp (self):
+        self.library = mod.Library ()
+        self.customer = mod.Customer (123456789, "Israel Israeli", 547000000)
+        self.book = mod.Book (3, "Harry Potter and the Philosopher Stone", "J.K. Rowling", 1997, "fiction")
+        self.disk = mod.Disk (1, "Shetah Afor", "Ishay Ribo", 2018)
+        self.magazine = mod.Magazine (452, "Maariv Lanoar", "Maariv", 32)
+        for item in (self.customer, self.book, self.disk, self.magazine):
+            self.library.add (item)
+
+    def testBorrowReturnMany (self):
+        cart = [self.book, self.disk, self.magazine]
+        self.assertEqual (self.library.borrowMany (self.customer, cart), [True, True, True])
+        self.assertEqual (self.library.borrowing [self.customer.id], cart)
+        self.assertEqual (self.library.availables (), dict ())
+        self.assertEqual (self.library.returnMany (self.customer, cart), [True, True, True])
+        self.assertEqual (self.library.borrowing [self.customer.id], [])
+        self.assertEqual (self.magazine.status, "available")
+
+    def testBorrowManyFailure (self):
+        self.disk.repair ()
+        report = self.library.borrowMany (self.customer, [self.book, self.disk, self.book, 123])
+        self.assertIs (report [0], True)
+        self.assertIsInstance (report [1], str)
+        self.assertIsInstance (report [2], str) #twice the same book
+        self.assertIsInstance (report [3], str)
+         #nothing was borrowed
+        self.assertEqual (self.book.status, "available")
+        self.assertEqual (self.library.borrowing [self.customer.id], [])
+
+    def testReturnManyFailure (self):
+        self.library.borrowMany (self.customer, [self.book, self.disk])
+        report = self.library.returnMany (self.customer, [self.book, self.magazine])
+        self.assertEqual (report [0], True)
+        self.assertIsInstance (report [1], str)
+        self.assertEqual (self.book.status, "borrowed")
+        self.assertEqual (self.library.borrowing [self.customer.id], [self.book, self.disk])
+
+    def testCustomer (self):
+        self.assertRaises (TypeError, self.library.borrowMany, "Israel Israeli", [self.book])
+        self.assertRaises (ValueError, self.library.returnMany, mod.Customer (456, "Arieh Ankri", 545474877), [self.book])
+
+class TestAddMany (unittest.TestCase):
+    """
+    Check that addMany adds all the new items and reports the duplicates
+    """
+    def testAddMany (self):
+        library = mod.Library ()
+        customer = mod.Customer (123456789, "Israel Israeli", 547000000)
+        book = mod.Book (3, "Harry Potter and the Philosopher Stone", "J.K. Rowling", 1997, "fiction")
+        library.add (book)
+        sameBook = mod.Book (3, "The Lion King", "Walt Disney", 1994, "children")
+        disk = mod.Disk (1, "Shetah Afor", "Ishay Ribo", 2018)
+        sameDisk = mod.Disk (1, "Izun", "Hanan Ben Ari", 2016)
+        rejected = library.addMany (iter ([customer, sameBook, disk, sameDisk, customer]))
+        self.assertEqual (rejected, [sameBook, sameDisk, customer])
+        self.assertEqual (library.resources, [book, disk])
+        self.assertEqual (library.customers, [customer])
+        self.assertEqual (library.borrowing, {customer.id: []})
+        self.assertEqual (library.availables ("Disk"), [disk])
+        self.assertTrue (library.borrowResource (customer, disk))
+
+    def testIndex (self):
+        #the resources added together go in the index by status and after the last resource of their type
+        library = mod.Library ()
+        first = mod.Book (1, "Izun", "Hanan Ben Ari", 2016, "music")
+        library.add (first)
+        books = [mod.Book (id, f"Book {id}", "Author", 2000, "fiction") for id in range (2, 6)]
+        disk = mod.Disk (1, "Shetah Afor", "Ishay Ribo", 2018)
+        books [1].repair ()
+        books [2].borrow ()
+        library.addMany ([books [0], disk] + books [1:])
+        self.assertEqual (list (library.iterResources ("Book")), [first] + books)
+        self.assertEqual (list (library.iterResources ("Book", afterId = "B3")), books [2:])
+        self.assertEqual (library.availables ("Book"), [first, books [0], books [3]])
+        self.assertEqual (library.underRepair ("Book"), [books [1]])
+        self.assertEqual (library.availables ("Disk"), [disk])
+        library.removeResource ("B2")
+        self.assertEqual (list (library.iterResources ("Book")), [first] + books [1:])
+
+    def testWrongType (self):
+        library = mod.Library ()
+        disk = mod.Disk (1, "Shetah Afor", "Ishay Ribo", 2018)
+        self.assertRaises (TypeError, library.addMany, [disk, "Arieh Ankri"])
+        self.assertEqual (len (library.resources), 0)
+
+class TestSlots (unittest.TestCase):
+    """
+    Check that the objects have no __dict__ and keep the validation of the setters
+    """
+    def testSlots (self):
+        objects = [
+            mod.Book (3, "Harry Potter and the Philosopher Stone", "J.K. Rowling", 1997, "fiction"),
+            mod.Disk (1, "Shetah Afor", "Ishay Ribo", 2018),
+            mod.Magazine (452, "Maariv Lanoar", "Maariv", 32),
+            mod.Customer (123456789, "Israel Israeli", 547000000),
+        ]
+        for item in objects:
+            self.assertFalse (hasattr (item, "__dict__"))
+            with self.assertRaises (AttributeError):
+                item.color = "red"
+            with self.assertRaises (TypeError):
+                item.name = 45
+
+class TestStatus (unittest.TestCase):
+    """
+    Check that the status code and the status text stay together
+    """
+    def testStatus (self):
+        book = mod.Book (3, "Harry Potter and the Philosopher Stone", "J.K. Rowling", 1997, "fiction")
+        self.assertIs (book.statusCode, mod.Status.AVAILABLE)
+        book.repair ()
+        self.assertIs (book.statusCode, mod.Status.UNDER_REPAIR)
+        self.assertEqual (book.status, mod.Status.UNDER_REPAIR.text)
+        self.assertFalse (book.borrow ())
+        self.assertTrue (book.returning ())
+        self.assertTrue (book.borrow ())
+        self.assertEqual (book.status, "borrowed")
+        with self.assertRaises (AttributeError):
+            book.statusCode = mod.Status.AVAILABLE
+
+class TestCachedStrings (unittest.TestCase):
+    """
+    Check that the cached id and string representation follow the changes of the setters
+    """
+    def testId (self):
+        book = mod.Book (3, "Harry Potter and the Philosopher Stone", "J.K. Rowling", 1997, "fiction")
+        self.assertIs (book.id, book.id)
+        self.assertEqual (book.id, "B3")
+
+    def testString (self):
+        book = mod.Book (3, "Harry Potter and the Philosopher Stone", "J.K. Rowling", 1997, "fiction")
+        self.assertIs (str (book), str (book))
+        book.name = "Harry Potter and the Chamber of Secrets"
+        book.year = 1998
+        self.assertEqual (str (book), "B3: 'Harry Potter and the Chamber of Secrets' by J.K. Rowling (1998)")
+        disk = mod.Disk (1, "Shetah Afor", "Ishay Ribo", 2018)
+        str (disk)
+        disk.singer = "Hanan Ben Ari"
+        self.assertEqual (str (disk), "D1: 'Shetah Afor' by Hanan Ben Ari (2018)")
+        magazine = mod.Magazine (452, "Maariv Lanoar", "Maariv", 32)
+        str (magazine)
+        magazine.serialNumber = 33
+        self.assertEqual (str (magazine), "M452: 'Maariv Lanoar' by Maariv - number 33")
+
+class TestSearchText (unittest.TestCase):
+    """
+    Check the full text search and that it follows the changes of the library
+    """
+    def setUp (self):
+        self.library = mod.Library ()
+        self.book = mod.Book (1, "Harry Potter and the Philosopher Stone", "J.K. Rowling", 1997, "fiction")
+        self.book2 = mod.Book (2, "The Origin of Species", "Charles Darwin", 1859, "science")
+        self.book3 = mod.Book (123, "הHobbit", "J.R.R. Tolkien", 1937, "פנטזיה")
+        self.disk = mod.Disk (1, "Shetah Afor", "Ishay Ribo", 2018)
+        self.magazine = mod.Magazine (1, "Harry Finances", "Potter Press", 770)
+        for item in (self.book, self.book2, self.book3, self.disk, self.magazine):
+            self.library.add (item)
+
+    def testQueries (self):
+        self.assertEqual (self.library.searchText ("rowling"), [self.book])
+        self.assertEqual (self.library.searchText ("HARRY potter"), [self.book, self.magazine]) #potter in the name counts more
+        self.assertEqual (self.library.searchText ("harr* stone"), [self.book])
+        self.assertEqual (self.library.searchText ("darwin OR ribo"), [self.book2, self.disk])
+        self.assertEqual (self.library.searchText ("hobbit פנטזיה"), [self.book3])
+        self.assertEqual (self.library.searchText ("harry", limit = 1), [self.book])
+        self.assertEqual (self.library.searchText ("nothing"), [])
+        self.assertEqual (self.library.searchText (""), [])
+
+    def testChanges (self):
+        self.assertEqual (self.library.searchText ("ribo"), [self.disk])
+        self.disk.singer = "Hanan Ben Ari"
+        self.assertEqual (self.library.searchText ("ribo"), [])
+        self.assertEqual (self.library.searchText ("hanan"), [self.disk])
+        self.book2.name = "On the Origin of Species"
+        self.assertEqual (self.library.searchText ("on origin"), [self.book2])
+        self.library.removeResource (self.book2.id)
+        self.assertEqual (self.library.searchText ("origin"), [])
+        newDisk = mod.Disk (2, "Izun", "Hanan Ben Ari", 2016)
+        self.library.add (newDisk)
+        self.assertEqual (self.library.searchText ("hanan"), [self.disk, newDisk])
+
+    def testLimit (self):
+        library = mod.Library ()
+        library.addMany ([mod.Book (i, f"Book {i} word{i}", f"Author {i % 7}", 2000, "fiction" if i % 3 else "history") for i in range (300)])
+        library.searchText ("") #the index is made with all the words at once
+        library.addMany ([mod.Disk (i, f"Disk {i} word{i}", f"Author {i % 5}", 2000) for i in range (1500)]) #more new words than are kept aside
+        for i in range (0, 300, 4):
+            library.search (f"B{i}").name = f"Book {i} author" #the ids of author 0 are not in order any more
+        for i in range (0, 1500, 3):
+            library.removeResource (f"D{i}")
+        queries = ("author", "author 3", "history OR author 2", "word1*", "wor* author", "book OR disk", "author 0 OR fiction")
+        for query in queries:
+            results = library.searchText (query)
+            for limit in (1, 5, 40):
+                self.assertEqual (library.searchText (query, limit), results [:limit], f"{query} limit {limit}")
+        self.assertEqual ([resource.id for resource in library.searchText ("word100*")], ["D100", "D1000", "D1001", "D1003", "D1004", "D1006", "D1007", "D1009"]) #not B100, renamed
+        self.assertEqual (library.searchText ("word1200"), [])
+
+class TestSnapshot (unittest.TestCase):
+    """
+    Check that a library saved and loaded again has exactly the same state
+    """
+    def setUp (self):
+        self.library = mod.Library ()
+        self.customer = mod.Customer (123456789, "Israel Israeli", 547000000)
+        self.customer2 = mod.Customer (1, "אריאל", 541234567)
+        self.library.addMany ([
+            self.customer, self.customer2,
+            mod.Book (1, "Harry Potter and the Philosopher Stone", "J.K. Rowling", 1997, "fiction"),
+            mod.Book (2, "שר הטבעות", "J.R.R. Tolkien", 1954, "פנטזיה"),
+            mod.Disk (1, "Shetah Afor", "Ishay Ribo", 2018),
+            mod.Disk (2, "Izun", "Hanan Ben Ari", 2016),
+            mod.Magazine (1, "Maariv Lanoar", "Maariv", 32),
+            mod.Magazine (2, "Israel Finances", "A.B.C Finances", 770),
+        ])
+        self.library.borrowMany (self.customer, [self.library.search ("M2"), self.library.search ("B1")])
+        self.library.borrowResource (self.customer2, self.library.search ("D2"))
+        self.library.search ("D1").repair ()
+        self.library.placeHold (self.customer2, self.library.search ("M2"))
+        self.library.placeHold (self.customer, self.library.search ("D2"))
+        self.library.placeHold (self.customer2, self.library.search ("B2")) #available, so ready at once
+        self.path = os.path.join (tempfile.mkdtemp (), "library.snapshot")
+        self.addCleanup (os.remove, self.path)
+
+    def state (self, library):
+        resources = [(type (resource), resource.id, str (resource), resource.status) for resource in library.resources]
+        resources += [(resource.department,) for resource in library.resources if isinstance (resource, mod.Book)]
+        customers = [str (customer) for customer in library.customers]
+        borrowing = {id: [(resource.id, library.loan (resource.id).borrowed, library.loan (resource.id).due) for resource in loans] for id, loans in library.borrowing.items ()}
+        holds = {resource.id: ([customer.id for customer in library.holdQueue (resource.id)], library.heldFor (resource.id) is not None) for resource in library.resources}
+        return resources, customers, borrowing, holds
+
+    def testRoundTrip (self):
+        librarySnapshot.save (self.library, self.path)
+        library = librarySnapshot.load (self.path)
+        self.assertEqual (self.state (library), self.state (self.library))
+        self.assertIs (library.borrower ("M2"), library.customers [0])
+        self.assertEqual (library.availables ("Disk"), [])
+
+    def testNotSnapshot (self):
+        with open (self.path, "wb") as file:
+            file.write (b"hello world")
+        self.assertRaises (ValueError, librarySnapshot.load, self.path)
+
+    def testThreads (self):
+        library = mod.Library (threadSafe = True)
+        customer = mod.Customer (1, "Israel Israeli", 547000000)
+        books = [mod.Book (i, f"Book {i}", "Author", 2000, "fiction") for i in range (20)]
+        library.addMany ([customer] + books)
+        stop = threading.Event ()
+        def loans ():
+            while not stop.is_set ():
+                for book in books:
+                    library.borrowResource (customer, book)
+                    library.returnResource (customer, book)
+        thread = threading.Thread (target = loans)
+        interval = sys.getswitchinterval ()
+        sys.setswitchinterval (1e-6) #switch the threads often, to meet the changes in the middle of a snapshot
+        thread.start ()
+        try:
+            for i in range (300):
+                columns = librarySnapshot.makeColumns (library) #the statuses and the loans are of the same moment
+                self.assertEqual (list (columns ["resourceStatus"]).count (mod.Status.BORROWED), len (columns ["loanResources"]))
+                librarySnapshot.save (library, self.path)
+        finally:
+            stop.set ()
+            thread.join ()
+            sys.setswitchinterval (interval)
+
+class TestJournal (unittest.TestCase):
+    """
+    Check that a library is recovered from the snapshot and the journal
+    """
+    def setUp (self):
+        folder = tempfile.mkdtemp ()
+        self.snapshotPath = os.path.join (folder, "library.snapshot")
+        self.journalPath = os.path.join (folder, "library.journal")
+        self.library = mod.Library ()
+        self.journal = libraryJournal.Journal (self.journalPath, sync = "always")
+        self.library.journal = self.journal
+        self.customer = mod.Customer (123456789, "Israel Israeli", 547000000)
+        self.book = mod.Book (1, "Harry Potter and the Philosopher Stone", "J.K. Rowling", 1997, "fiction")
+        self.disk = mod.Disk (1, "Shetah Afor", "Ishay Ribo", 2018)
+        self.magazine = mod.Magazine (1, "Maariv Lanoar", "Maariv", 32)
+
+    def tearDown (self):
+        self.journal.close ()
+
+    def state (self, library):
+        resources = [(str (resource), resource.status) for resource in library.resources]
+        borrowing = {id: [(resource.id, library.loan (resource.id).borrowed, library.loan (resource.id).due) for resource in loans] for id, loans in library.borrowing.items ()}
+        holds = [resource.id for resource in library.holds (self.customer.id)]
+        return resources, [str (customer) for customer in library.customers], borrowing, holds
+
+    def changeLibrary (self):
+        self.library.add (self.customer)
+        self.library.addMany ([self.book, self.disk, self.magazine, mod.Book (2, "Izun", "Hanan Ben Ari", 2016, "music")])
+        self.library.borrowResource (self.customer, self.book)
+        self.library.borrowMany (self.customer, [self.disk])
+        self.library.returnResource (self.customer, self.book)
+        self.library.removeResource ("B2")
+        self.magazine.repair ()
+        self.library.placeHold (self.customer, self.magazine)
+        self.book.name = "Harry Potter and the Chamber of Secrets"
+
+    def testRecover (self):
+        self.changeLibrary ()
+        recovered = libraryJournal.recover (self.snapshotPath, self.journalPath)
+        self.assertEqual (self.state (recovered), self.state (self.library))
+
+    def testCheckpoint (self):
+        self.library.add (self.customer)
+        self.library.add (self.book)
+        self.journal.checkpoint (self.library, self.snapshotPath)
+        self.library.borrowResource (self.customer, self.book)
+        self.library.add (self.disk)
+        recovered = libraryJournal.recover (self.snapshotPath, self.journalPath)
+        self.assertEqual (self.state (recovered), self.state (self.library))
+         #a journal opened again continues the sequence
+        self.journal.close ()
+        self.journal = libraryJournal.Journal (self.journalPath)
+        self.assertEqual (self.journal.sequence, 4)
+
+    def testOutsideStatus (self):
+        self.changeLibrary ()
+        self.disk.returning () #borrowed by the library, returned outside it
+        self.book.borrow ()
+        self.magazine.returning ()
+        self.magazine.repair ()
+        self.journal.close ()
+        recovered = libraryJournal.recover (self.snapshotPath, self.journalPath)
+        self.assertEqual (self.state (recovered), self.state (self.library))
+        self.assertEqual (recovered.search (self.book.id).status, "borrowed")
+
+    def testPartialRecord (self):
+        self.changeLibrary ()
+        self.journal.close ()
+        with open (self.journalPath, "ab") as file:
+            file.write (b'[99,"removeCustom') #a crash while writing a record
+        recovered = libraryJournal.recover (self.snapshotPath, self.journalPath)
+        self.assertEqual (self.state (recovered), self.state (self.library))
+        self.journal = libraryJournal.Journal (self.journalPath)
+        self.journal.record ("removeResource", "B1")
+        self.journal.flush ()
+        self.assertEqual (len (libraryJournal.recover (self.snapshotPath, self.journalPath).resources), 2)
+
+    def testBatch (self):
+        self.journal.close ()
+        self.journal = libraryJournal.Journal (self.journalPath, sync = "batch", batchSize = 1000, interval = 60)
+        self.library.journal = self.journal
+        self.changeLibrary ()
+        self.assertEqual (len (libraryJournal.recover (self.snapshotPath, self.journalPath).resources), 0) #not written yet
+        self.journal.flush ()
+        recovered = libraryJournal.recover (self.snapshotPath, self.journalPath)
+        self.assertEqual (self.state (recovered), self.state (self.library))
+
+    def testInterval (self):
+        #the last records are written after interval seconds, even when no other record comes
+        self.journal.close ()
+        self.journal = libraryJournal.Journal (self.journalPath, sync = "batch", batchSize = 1000, interval = 0.05)
+        self.library.journal = self.journal
+        self.changeLibrary ()
+        for i in range (100):
+            time.sleep (0.02)
+            if len (libraryJournal.recover (self.snapshotPath, self.journalPath).resources) > 0:
+                break
+        self.assertEqual (self.state (libraryJournal.recover (self.snapshotPath, self.journalPath)), self.state (self.library))
+
+class TestThreads (unittest.TestCase):
+    """
+    Check a thread safe library used by many threads at once
+    """
+    def setUp (self):
+        self.library = mod.Library (threadSafe = True, stripes = 8)
+        self.customers = [mod.Customer (i, f"Customer {i}", 547000000 + i) for i in range (20)]
+        self.resources = [mod.Book (i, f"Book {i}", "Author", 2000, "fiction") for i in range (50)]
+        self.library.addMany (self.customers + self.resources)
+
+    def work (self, seed, errors):
+        chooser = random.Random (seed)
+        for i in range (2000):
+            customer = chooser.choice (self.customers)
+            resource = chooser.choice (self.resources)
+            try:
+                if chooser.random () < 0.5:
+                    self.library.borrowResource (customer, resource)
+                elif chooser.random () < 0.5:
+                    self.library.returnResource (customer, resource)
+                else:
+                    self.library.borrowMany (customer, chooser.sample (self.resources, 3))
+                    self.library.returnMany (customer, list (self.library.borrowing [customer.id]))
+            except ValueError:
+                pass #a resource borrowed by someone else, or returned by the wrong customer
+            except Exception as error:
+                errors.append (error)
+
+    def testStress (self):
+        errors = []
+        threads = [threading.Thread (target = self.work, args = (seed, errors)) for seed in range (8)]
+        for thread in threads:
+            thread.start ()
+        for thread in threads:
+            thread.join ()
+        self.assertEqual (errors, [])
+         #every borrowed resource has exactly one loan, and the borrower of the loan
+        loans = dict ()
+        for customerId, borrowed in self.library.borrowing.items ():
+            for resource in borrowed:
+                self.assertNotIn (resource.id, loans)
+                loans [resource.id] = customerId
+        for resource in self.resources:
+            self.assertEqual (resource.status == "borrowed", resource.id in loans)
+            borrower = self.library.borrower (resource.id)
+            self.assertEqual (None if borrower is None else borrower.id, loans.get (resource.id))
+        self.assertEqual (len (self.library.availables ("Book")), len (self.resources) - len (loans))
+
+    def testAdds (self):
+         #a customer can borrow as soon as it is seen, and the journal has the add before the loan
+        path = os.path.join (tempfile.mkdtemp (), "library.journal")
+        library = mod.Library (threadSafe = True, stripes = 8)
+        library.journal = journal = libraryJournal.Journal (path, "never")
+        resource = mod.Book (1, "Book", "Author", 2000, "fiction")
+        library.add (resource)
+        added = threading.Event ()
+        errors = []
+        def borrow ():
+            id = 1000
+            while not added.is_set () or library.searchCustomer (id) is not None:
+                customer = library.searchCustomer (id)
+                if customer is None:
+                    continue
+                try:
+                    library.borrowResource (customer, resource)
+                    library.returnResource (customer, resource)
+                except Exception as error:
+                    errors.append (error)
+                id += 1
+        thread = threading.Thread (target = borrow)
+        interval = sys.getswitchinterval ()
+        sys.setswitchinterval (1e-6)
+        thread.start ()
+        try:
+            for start in range (1000, 21000, 5000):
+                library.addMany ([mod.Customer (i, f"Customer {i}", 547000000 + i) for i in range (start, start + 4999)])
+                library.add (mod.Customer (start + 4999, "Customer", 547000000))
+        finally:
+            added.set ()
+            thread.join ()
+            sys.setswitchinterval (interval)
+        self.assertEqual (errors, [])
+        journal.close ()
+        recovered = libraryJournal.recover (path + ".snapshot", path)
+        self.assertEqual (len (recovered.customers), 20000)
+        self.assertEqual (recovered.search (resource.id).status, "available")
+        os.remove (path)
+
+    def testNotThreadSafe (self):
+        self.assertTrue (self.library.threadSafe)
+        self.assertFalse (mod.Library ().threadSafe)
+
+class TestAsync (unittest.TestCase):
+    """
+    Check the asyncio front end, the calls made together run in one batch
+    """
+    def setUp (self):
+        self.customers = [mod.Customer (i, f"Customer {i}", 547000000 + i) for i in range (10)]
+        self.book = mod.Book (3, "Harry Potter and the Philosopher Stone", "J.K. Rowling", 1997, "fiction")
+        self.disk = mod.Disk (1, "Shetah Afor", "Ishay Ribo", 2018)
+
+    async def borrowTogether (self):
+        async with libraryAsync.AsyncLibrary () as library:
+            for item in self.customers + [self.book, self.disk]:
+                await library.add (item)
+            results = await asyncio.gather (*[library.borrowResource (customer, self.book) for customer in self.customers], return_exceptions = True)
+            availables = await library.availables ()
+            found = await library.search ("B3")
+            await library.returnResource (library.library.borrower ("B3"), self.book)
+        return results, availables, found, library.library
+
+    def testBorrowTogether (self):
+        results, availables, found, library = asyncio.run (self.borrowTogether ())
+         #only the first patron gets the book, the others get the error of the library
+        self.assertEqual (results [0], True)
+        self.assertTrue (all (isinstance (result, ValueError) for result in results [1:]))
+        self.assertEqual (availables, {"Disk": [self.disk]})
+        self.assertIs (found, self.book)
+        self.assertEqual (len (library.availables ()), 2)
+
+    def testJournal (self):
+        folder = tempfile.mkdtemp ()
+        journalPath = os.path.join (folder, "library.journal")
+        async def run ():
+            library = mod.Library ()
+            library.journal = libraryJournal.Journal (journalPath, sync = "batch", batchSize = 1000, interval = 60)
+            async with libraryAsync.AsyncLibrary (library) as front:
+                await asyncio.gather (*[front.add (customer) for customer in self.customers])
+                 #the records are on the disk when the calls return
+                recovered = libraryJournal.recover (os.path.join (folder, "none"), journalPath)
+                self.assertEqual (len (recovered.customers), len (self.customers))
+            library.journal.close ()
+        asyncio.run (run ())
+        os.remove (journalPath)
+        os.rmdir (folder)
+
+    def testFailures (self):
+        class Broken (mod.Library):
+            def exclusive (self):
+                raise OSError ("the library is down")
+        async def run ():
+            front = libraryAsync.AsyncLibrary (Broken ())
+            results = await asyncio.wait_for (asyncio.gather (*[front.add (customer) for customer in self.customers], return_exceptions = True), 5)
+            await front.close ()
+            with self.assertRaises (RuntimeError):
+                await front.search ("B3")
+            return results
+        results = asyncio.run (run ())
+        self.assertTrue (all (isinstance (result, OSError) for result in results)) #every call gets the error, none waits forever
+
+class TestShards (unittest.TestCase):
+    """
+    Check the library split in shards, with loans inside one shard and between two shards
+    """
+    @classmethod
+    def setUpClass (cls):
+        cls.library = libraryShards.ShardedLibrary (3)
+
+    @classmethod
+    def tearDownClass (cls):
+        cls.library.close ()
+
+    def setUp (self):
+        self.customers = [mod.Customer (i, f"Customer {i}", 547000000 + i) for i in range (6)]
+        self.books = [mod.Book (i, f"Book {i}", "Author", 2000, "fiction") for i in range (6)]
+        self.assertEqual (self.library.addMany (self.customers + self.books), [])
+
+    def tearDown (self):
+        for customerId, borrowed in self.library.borrowing.items ():
+            for resourceId in borrowed:
+                self.library.returnResource (self.customers [customerId], self.library.search (resourceId))
+        for item in self.customers:
+            self.library.removeCustomer (item.id)
+        for item in self.books:
+            self.library.removeResource (item.id)
+
+    def testLoans (self):
+        customer = self.customers [0]
+        local = [book for book in self.books if self.library.shardOf (book.id) == self.library.shardOf (customer.id)]
+        remote = [book for book in self.books if self.library.shardOf (book.id) != self.library.shardOf (customer.id)]
+        self.assertTrue (len (remote) > 0)
+        for book in self.books:
+            self.assertTrue (self.library.borrowResource (customer, book))
+        self.assertEqual (sorted (self.library.borrowing [customer.id]), sorted (book.id for book in self.books))
+        self.assertEqual (self.library.availables (), dict ())
+        self.assertEqual (self.library.borrower (remote [0].id).id, customer.id)
+        self.assertEqual (self.library.search (remote [0].id).status, "borrowed")
+        with self.assertRaises (ValueError):
+            self.library.borrowResource (self.customers [1], remote [0])
+        with self.assertRaises (ValueError):
+            self.library.returnResource (self.customers [1], remote [0])
+        with self.assertRaises (Exception):
+            self.library.removeCustomer (customer.id)
+        for book in local + remote:
+            self.assertTrue (self.library.returnResource (customer, book))
+        self.assertEqual (len (self.library.availables ("Book")), len (self.books))
+
+    def testAbort (self):
+         #the customer is not registered, so the shard of the resource must give it back
+        stranger = mod.Customer (100, "Stranger", 547000100)
+        book = next (book for book in self.books if self.library.shardOf (book.id) != self.library.shardOf (stranger.id))
+        with self.assertRaises (ValueError):
+            self.library.borrowResource (stranger, book)
+        self.assertEqual (self.library.search (book.id).status, "available")
+        self.assertIsNone (self.library.borrower (book.id))
+
+    def testCirculate (self):
+        customer, other = self.customers [:2]
+        book = self.books [0]
+        results = self.library.circulate ([("borrow", customer, book), ("borrow", other, book), ("return", customer, book), ("borrow", other, book)])
+        self.assertEqual (results [0], True)
+        self.assertIsInstance (results [1], ValueError)
+        self.assertEqual (results [2:], [True, True])
+        self.assertEqual (self.library.borrower (book.id).id, other.id)
+
+class TestTransactions (unittest.TestCase):
+    """
+    Check the transactions: all the operations or nothing, and a conflict when a resource changed meanwhile
+    """
+    def setUp (self):
+        self.library = mod.Library (threadSafe = True)
+        self.customer = mod.Customer (123456789, "Israel Israeli", 547000000)
+        self.other = mod.Customer (987654321, "Moshe Cohen", 527000000)
+        self.book = mod.Book (3, "Harry Potter and the Philosopher Stone", "J.K. Rowling", 1997, "fiction")
+        self.disk = mod.Disk (1, "Shetah Afor", "Ishay Ribo", 2018)
+        self.library.addMany ([self.customer, self.other, self.book, self.disk])
+        self.library.borrowResource (self.customer, self.book)
+
+    def testCommit (self):
+        with self.library.transaction () as transaction:
+            transaction.returnResource (self.customer, self.book)
+            transaction.repair (self.book)
+            transaction.borrowResource (self.customer, self.disk)
+            self.assertEqual (self.book.status, "borrowed") #nothing changes before the commit
+        self.assertEqual (self.book.status, "under repair")
+        self.assertEqual (self.library.borrowing [self.customer.id], [self.disk])
+
+    def testRollback (self):
+        self.library.borrowResource (self.other, self.disk)
+        transaction = self.library.transaction ()
+        transaction.returnResource (self.customer, self.book)
+        transaction.borrowResource (self.customer, self.disk)
+        with self.assertRaises (ValueError):
+            transaction.commit ()
+        self.assertEqual (self.library.borrowing [self.customer.id], [self.book])
+        self.assertEqual (self.library.borrower (self.disk.id), self.other)
+
+    def testRollbackHolds (self):
+        third = mod.Customer (1, "Dana Levi", 541234567)
+        self.library.add (third)
+        calls = []
+        self.library.holdReady = lambda customer, resource: calls.append ((customer, resource))
+        self.library.placeHold (self.other, self.book)
+        self.library.placeHold (self.other, self.disk) #ready at once
+        self.library.placeHold (third, self.disk)
+        del calls [:]
+        self.library.journal = records = mod.PendingRecords ()
+        transaction = self.library.transaction ()
+        transaction.returnResource (self.customer, self.book) #the book is ready for the hold of other
+        transaction.borrowResource (self.other, self.disk) #takes the hold of other
+        transaction.borrowResource (third, self.book)
+        with self.assertRaisesRegex (ValueError, "held for another customer"): #the error of the operation, not of the rollback
+            transaction.commit ()
+        self.assertEqual (self.library.borrowing, {self.customer.id: [self.book], self.other.id: [], third.id: []})
+        self.assertEqual ((self.library.holdQueue (self.book.id), self.library.heldFor (self.book.id)), ([self.other], None))
+        self.assertEqual ((self.library.holdQueue (self.disk.id), self.library.heldFor (self.disk.id)), ([self.other, third], self.other))
+        self.assertEqual ((self.library.holds (self.other.id), self.library.availables ("Disk")), ([self.book, self.disk], []))
+        self.assertEqual ((calls, records), ([], [])) #nothing was ready in the end, and nothing is recorded
+        with self.library.transaction () as transaction:
+            transaction.returnResource (self.customer, self.book)
+        self.assertEqual (calls, [(self.other, self.book)])
+        self.assertEqual (records, [("returnResource", (self.customer.id, self.book.id))])
+
+    def testConflict (self):
+        transaction = self.library.transaction ()
+        if transaction.status (self.disk) == "available":
+            transaction.borrowResource (self.customer, self.disk)
+        self.library.borrowResource (self.other, self.disk)
+        self.library.returnResource (self.other, self.disk) #the same status, but not the same version
+        with self.assertRaises (mod.TransactionConflict):
+            transaction.commit ()
+        self.assertEqual (self.disk.status, "available")
+
+    def testAtomic (self):
+        calls = []
+        def swap (transaction):
+            calls.append (transaction)
+            transaction.returnResource (self.customer, self.book)
+            transaction.borrowResource (self.customer, self.disk)
+            if len (calls) == 1:
+                self.disk.name = "Shetah Afor (live)" #a change made by someone else
+        self.library.atomic (swap)
+        self.assertEqual (len (calls), 2)
+        self.assertEqual (self.library.borrowing [self.customer.id], [self.disk])
+
+    def testReaders (self):
+         #the customer always holds one of the two resources, readers must never see a state in the middle
+        stop = threading.Event ()
+        errors = []
+        def swap (transaction):
+            held = self.library.borrowing [self.customer.id][0]
+            other = self.disk if held is self.book else self.book
+            transaction.status (held)
+            transaction.returnResource (self.customer, held)
+            transaction.borrowResource (self.customer, other)
+        def write ():
+            while not stop.is_set ():
+                self.library.atomic (swap, 1000)
+        def read ():
+            for i in range (2000):
+                borrowing, availables = self.library.read (lambda: (self.library.borrowing, self.library.availables ()))
+                if len (borrowing [self.customer.id]) != 1 or sum (map (len, availables.values ())) != 1:
+                    errors.append ((borrowing, availables))
+        writer = threading.Thread (target = write)
+        readers = [threading.Thread (target = read) for i in range (2)]
+        writer.start ()
+        for reader in readers:
+            reader.start ()
+        for reader in readers:
+            reader.join ()
+        stop.set ()
+        writer.join ()
+        self.assertEqual (errors, [])
+
+class TestDues (unittest.TestCase):
+    """
+    Check the loans with their due time, and the queries of overdue and next due loans
+    """
+    def setUp (self):
+        self.library = mod.Library (loanPeriod = 100)
+        self.customer = mod.Customer (123456789, "Israel Israeli", 547000000)
+        self.books = [mod.Book (i, f"Book {i}", "Author", 2000, "fiction") for i in range (200)]
+        self.library.addMany ([self.customer] + self.books)
+
+    def testLoan (self):
+        self.library.borrowResource (self.customer, self.books [0], borrowed = 1000)
+        loan = self.library.loan ("B0")
+        self.assertEqual ((loan.customer, loan.resource, loan.borrowed, loan.due), (self.customer, self.books [0], 1000, 1100))
+        self.library.borrowMany (self.customer, self.books [1:3], due = 5000)
+        self.assertEqual ([loan.due for loan in self.library.nextDue (5)], [1100, 5000, 5000])
+        self.library.returnResource (self.customer, self.books [0])
+        self.assertIsNone (self.library.loan ("B0"))
+        self.assertEqual (self.library.overdue (5000), [])
+        self.assertEqual ([loan.resource for loan in self.library.overdue (5001)], self.books [1:3])
+
+    def testOrder (self):
+         #many loans with due times in disorder, half of them returned
+        for i, book in enumerate (self.books):
+            self.library.borrowResource (self.customer, book, due = (i * 37) % 200)
+        for book in self.books [::2]:
+            self.library.returnResource (self.customer, book)
+        loans = sorted ((self.library.loan (book.id) for book in self.books [1::2]), key = lambda loan: loan.due)
+        self.assertEqual (self.library.nextDue (10), loans [:10])
+        self.assertEqual (self.library.overdue (50), [loan for loan in loans if loan.due < 50])
+        self.assertEqual (self.library.nextDue (1000), loans)
+
+class TestHolds (unittest.TestCase):
+    """
+    Check the queues of holds: the first customer gets the resource when it is available
+    """
+    def setUp (self):
+        self.library = mod.Library ()
+        self.customers = [mod.Customer (i, f"Customer {i}", 547000000 + i) for i in range (4)]
+        self.book = mod.Book (3, "Harry Potter and the Philosopher Stone", "J.K. Rowling", 1997, "fiction")
+        self.disk = mod.Disk (1, "Shetah Afor", "Ishay Ribo", 2018)
+        self.library.addMany (self.customers + [self.book, self.disk])
+        self.library.borrowResource (self.customers [0], self.book)
+        self.ready = []
+        self.library.holdReady = lambda customer, resource: self.ready.append ((customer, resource))
+
+    def testQueue (self):
+        for customer in self.customers [1:]:
+            self.library.placeHold (customer, self.book)
+        self.assertEqual (self.library.holdQueue ("B3"), self.customers [1:])
+        self.assertEqual (self.library.holds (2), [self.book])
+        with self.assertRaises (ValueError):
+            self.library.placeHold (self.customers [1], self.book)
+        self.library.returnResource (self.customers [0], self.book)
+         #the book is kept for the first hold
+        self.assertEqual (self.ready, [(self.customers [1], self.book)])
+        self.assertIs (self.library.heldFor ("B3"), self.customers [1])
+        self.assertEqual (self.library.availables (), {"Disk": [self.disk]})
+        with self.assertRaises (ValueError):
+            self.library.borrowResource (self.customers [2], self.book)
+        self.assertEqual (self.library.borrowMany (self.customers [2], [self.book]), ["this Book is held for another customer"])
+        self.library.borrowResource (self.customers [1], self.book)
+        self.assertEqual (self.library.holdQueue ("B3"), self.customers [2:])
+        self.assertEqual (self.library.holds (1), [])
+
+    def testCancel (self):
+        for customer in self.customers [1:]:
+            self.library.placeHold (customer, self.book)
+        self.library.cancelHold (self.customers [2], self.book)
+        self.library.returnResource (self.customers [0], self.book)
+        self.library.cancelHold (self.customers [1], self.book) #the book goes to the next hold
+        self.assertEqual (self.ready [-1], (self.customers [3], self.book))
+        self.library.removeCustomer (3) #the holds of a removed customer are cancelled
+        self.assertIsNone (self.library.heldFor ("B3"))
+        self.assertEqual (self.library.availables ("Book"), [self.book])
+        with self.assertRaises (ValueError):
+            self.library.cancelHold (self.customers [1], self.book)
+
+    def testRepair (self):
+        self.disk.repair ()
+        self.library.placeHold (self.customers [1], self.disk)
+        self.disk.returning ()
+        self.assertIs (self.library.heldFor ("D1"), self.customers [1])
+        self.library.placeHold (self.customers [2], self.book)
+        self.library.removeResource ("D1")
+        self.assertEqual (self.library.holds (1), [])
+
+class TestRepairs (unittest.TestCase):
+    """
+    Check the repairs of many resources at once, and their statistics
+    """
+    def setUp (self):
+        self.library = mod.Library ()
+        self.customer = mod.Customer (123456789, "Israel Israeli", 547000000)
+        self.books = [mod.Book (i, f"Book {i}", "Author", 2000, "fiction") for i in range (5)]
+        self.disk = mod.Disk (1, "Shetah Afor", "Ishay Ribo", 2018)
+        self.library.addMany ([self.customer, self.disk] + self.books)
+
+    def testBatch (self):
+        self.assertEqual (self.library.sendToRepair (self.books [:3]), [True, True, True])
+        self.assertEqual (self.library.underRepair ("Book"), self.books [:3])
+        self.assertEqual (self.library.underRepair (), {"Book": self.books [:3]})
+        self.library.borrowResource (self.customer, self.disk)
+        self.assertEqual (self.library.sendToRepair ([self.books [3], self.disk, self.books [0]]), [True, "cannot repair this Disk", "cannot repair this Book"])
+        self.assertEqual (self.books [3].status, "available") #nothing changed
+        self.assertEqual (self.library.completeRepair ([self.books [0], self.books [4]]), [True, "this Book is not under repair"])
+        self.assertEqual (self.library.completeRepair (self.books [:2]), [True, True])
+        self.assertEqual (self.library.underRepair ("Book"), [self.books [2]])
+
+    def testStatistics (self):
+        self.assertEqual (self.library.repairStatistics () ["done"], 0)
+        self.library.sendToRepair (self.books)
+        self.books [4].returning () #a repair finished outside the batches is counted too
+        self.library.completeRepair (self.books [:2])
+        statistics = self.library.repairStatistics ()
+        self.assertEqual ((statistics ["underRepair"], statistics ["done"]), (2, 3))
+        self.assertTrue (0 <= statistics ["meanTurnaround"] <= statistics ["longestTurnaround"])
+        self.assertTrue (statistics ["oldest"] >= 0)
+
+    def testAddedUnderRepair (self):
+        book = mod.Book (9, "Book 9", "Author", 2000, "fiction")
+        book.repair ()
+        self.library.add (book)
+        self.assertEqual (self.library.repairStatistics () ["underRepair"], len (self.library.underRepair ("Book")))
+        self.assertEqual (self.library.completeRepair ([book]), [True])
+        statistics = self.library.repairStatistics ()
+        self.assertEqual ((statistics ["underRepair"], statistics ["done"]), (0, 1))
+        self.assertTrue (statistics ["meanTurnaround"] >= 0)
+
+class TestQuery (unittest.TestCase):
+    """
+    Check the queries by the secondary indexes and that they follow the changes of the library
+    """
+    def setUp (self):
+        self.library = mod.Library ()
+        self.books = [mod.Book (i, f"Book {i}", f"Author {i % 3}", 1990 + i, "fiction" if i % 2 else "history") for i in range (10)]
+        self.disk = mod.Disk (1, "Shetah Afor", "Author 1", 1995)
+        self.magazine = mod.Magazine (1, "Yediot", "Yediot Press", 770)
+        self.library.addMany (self.books + [self.disk, self.magazine])
+
+    def ids (self, **criteria):
+        return sorted (resource.id for resource in self.library.query (**criteria))
+
+    def testQueries (self):
+        self.assertEqual (self.ids (type = "Book", author = "Author 1", yearRange = (1990, 1997)), ["B1", "B4", "B7"])
+        self.assertEqual (self.ids (yearRange = (1995, 1995)), ["B5", "D1"])
+        self.assertEqual (self.ids (department = "fiction", yearRange = (1995, 1999)), ["B5", "B7", "B9"])
+        self.assertEqual (self.ids (serialNumberRange = (700, 800), publisher = "Yediot Press"), ["M1"])
+        self.assertEqual (self.ids (author = "nobody", type = "Book"), [])
+        self.assertEqual (len (self.library.query ()), 12)
+        self.assertRaises (ValueError, self.library.query, name = "Yediot")
+        self.assertRaises (ValueError, self.library.query, authorRange = ("A", "B"))
+        self.assertEqual (self.ids (yearRange = (1997, None)), ["B7", "B8", "B9"]) #open ranges
+        self.assertEqual (self.ids (author = "Author 1", yearRange = (1994, None)), ["B4", "B7"])
+        self.assertEqual (self.ids (author = "Author 1", yearRange = (None, 1995)), ["B1", "B4"])
+
+    def testBuild (self):
+        resources = self.books + [self.disk, self.magazine] + [mod.Magazine (i, "Yediot", "Yediot Press", 770 - i) for i in range (2, 6)]
+        random.Random (1).shuffle (resources)
+        for index in libraryIndexes.defaultIndexes ():
+            one = type (index) () if isinstance (index, libraryIndexes.IssueIndex) else type (index) (index.field)
+            for resource in resources:
+                one.add (resource)
+            index.addMany (resources) #the same index as adding the resources one by one
+            self.assertEqual (len (index), len (one))
+            if isinstance (index, libraryIndexes.SortedIndex):
+                self.assertEqual (index.range (None, None), one.range (None, None))
+        issues = libraryIndexes.IssueIndex ()
+        issues.addMany (resources)
+        self.assertEqual ([list (issue) for issue in issues.range (("Yediot Press", "Yediot"))], [["M5"], ["M4"], ["M3"], ["M2"], ["M1"]])
+
+    def testChanges (self):
+        self.assertEqual (self.ids (author = "Author 1"), ["B1", "B4", "B7"])
+        self.books [1].author = "Author 2"
+        self.books [4].year = 2050
+        self.library.removeResource ("B7")
+        self.library.add (mod.Book (20, "Book 20", "Author 1", 2000, "fiction"))
+        self.assertEqual (self.ids (author = "Author 1"), ["B20", "B4"])
+        self.assertEqual (self.ids (yearRange = (2000, 3000)), ["B20", "B4"])
+        self.assertEqual (self.ids (author = "Author 2", year = 1991), ["B1"])
+
+    def testAddIndex (self):
+        self.library.addIndex (libraryIndexes.HashIndex ("name"))
+        self.assertEqual (self.ids (name = "Book 3"), ["B3"])
+        self.books [3].name = "Book three"
+        self.assertEqual (self.ids (name = "Book three", type = "Book"), ["B3"])
+
+class TestIssues (unittest.TestCase):
+    """
+    Check the issues of a magazine title by range of serialNumber, and the loans of issue runs
+    """
+    def setUp (self):
+        self.library = mod.Library ()
+        self.customers = [mod.Customer (i, f"Customer {i}", 547000000 + i) for i in range (2)]
+        self.magazines = [mod.Magazine (i, "Israel Finances", "A.B.C Finances", 700 + i) for i in range (80)]
+        self.copy = mod.Magazine (100, "Israel Finances", "A.B.C Finances", 705)
+        self.other = mod.Magazine (101, "Maariv Lanoar", "A.B.C Finances", 705)
+        self.library.addMany (self.customers + self.magazines + [self.copy, self.other])
+
+    def ids (self, magazines):
+        return [magazine.id for magazine in magazines]
+
+    def testRanges (self):
+        self.assertEqual (self.ids (self.library.issues ("A.B.C Finances", "Israel Finances", 703, 706)), ["M3", "M4", "M5", "M100", "M6"])
+        self.assertEqual (len (self.library.issues ("A.B.C Finances", "Israel Finances", last = 709)), 11)
+        self.assertEqual (self.library.issues ("Maariv", "Israel Finances"), [])
+        self.assertIs (self.library.latestIssue ("A.B.C Finances", "Israel Finances"), self.magazines [79])
+        self.assertIsNone (self.library.latestIssue ("Maariv", "Israel Finances"))
+        self.library.borrowResource (self.customers [1], self.magazines [5])
+        self.magazines [4].repair ()
+        self.assertEqual (self.ids (self.library.availableIssues ("A.B.C Finances", "Israel Finances", 703, 706)), ["M3", "M100", "M6"])
+
+    def testChanges (self):
+        self.magazines [79].serialNumber = 1
+        self.assertIs (self.library.latestIssue ("A.B.C Finances", "Israel Finances"), self.magazines [78])
+        self.magazines [78].name = "Maariv Lanoar"
+        self.assertEqual (self.ids (self.library.issues ("A.B.C Finances", "Maariv Lanoar")), ["M101", "M78"])
+        self.library.removeResource ("M101")
+        self.assertEqual (self.ids (self.library.issues ("A.B.C Finances", "Maariv Lanoar")), ["M78"])
+
+    def testBorrowRun (self):
+        self.library.borrowResource (self.customers [1], self.magazines [5])
+        magazines = self.library.borrowIssues (self.customers [0], "A.B.C Finances", "Israel Finances", 703, 706)
+        self.assertEqual (self.ids (magazines), ["M3", "M4", "M100", "M6"]) #one copy of every issue
+        self.assertEqual (self.library.borrowing [self.customers [0].id], magazines)
+        with self.assertRaises (ValueError):
+            self.library.borrowIssues (self.customers [1], "A.B.C Finances", "Israel Finances", 706, 710)
+        self.assertEqual (self.magazines [7].status, "available") #nothing borrowed
+        self.library.placeHold (self.customers [1], self.copy)
+        self.library.returnResource (self.customers [0], self.copy)
+        self.library.returnResource (self.customers [1], self.magazines [5])
+        self.assertIs (self.library.borrowIssues (self.customers [1], "A.B.C Finances", "Israel Finances", 705, 705) [0], self.copy) #the copy held
+
+    def testBorrowMissing (self):
+        self.library.removeResource ("M10")
+        self.library.removeResource ("M12")
+        self.library.removeResource ("M13")
+        with self.assertRaisesRegex (ValueError, "the issues 710, 712-713 of"):
+            self.library.borrowIssues (self.customers [0], "A.B.C Finances", "Israel Finances", 708, 714)
+        with self.assertRaisesRegex (ValueError, "the issues 680-699 of"):
+            self.library.borrowIssues (self.customers [0], "A.B.C Finances", "Israel Finances", 680, 705)
+        self.assertRaises (ValueError, self.library.borrowIssues, self.customers [0], "A.B.C Finances", "Israel Finances", 800, 900)
+        self.assertRaises (ValueError, self.library.borrowIssues, self.customers [0], "Maariv", "Israel Finances", 700, 701)
+        self.assertEqual (self.library.borrowing [self.customers [0].id], []) #nothing borrowed
+        self.assertEqual (len (self.library.borrowIssues (self.customers [0], "A.B.C Finances", "Israel Finances", 775, None)), 5)
+
+class TestIterators (unittest.TestCase):
+    """
+    Check the iterators over the resources and the pages after an id
+    """
+    def setUp (self):
+        self.library = mod.Library ()
+        self.customer = mod.Customer (123456789, "Israel Israeli", 547000000)
+        self.library.add (self.customer)
+        self.library.addMany ([mod.Book (i, f"Book {i}", "Author", 2000, "fiction") for i in range (250)])
+        self.library.addMany ([mod.Disk (i, f"Disk {i}", "Singer", 2000) for i in range (5)])
+
+    def ids (self, resources):
+        return [resource.id for resource in resources]
+
+    def testPages (self):
+        self.assertEqual (self.ids (self.library.iterResources ()), self.ids (self.library.resources))
+        self.assertEqual (self.ids (self.library.iterResources (limit = 3)), ["B0", "B1", "B2"])
+        self.assertEqual (self.ids (self.library.iterResources (afterId = "B248", limit = 3)), ["B249", "D0", "D1"])
+        self.assertEqual (self.ids (self.library.iterResources ("Disk", afterId = "D2")), ["D3", "D4"])
+        self.assertEqual (self.ids (self.library.iterResources ("Magazine")), [])
+        self.assertRaises (ValueError, self.library.iterResources, afterId = "B999")
+        self.assertRaises (ValueError, self.library.iterResources, "Disk", "B1")
+
+    def testAvailables (self):
+        self.library.borrowResource (self.customer, self.library.search ("B1"))
+        self.library.search ("D0").repair ()
+        self.assertEqual (list (self.library.iterAvailables ("Book")), self.library.availables ("Book"))
+        page = list (self.library.iterAvailables (limit = 2))
+        self.assertEqual (self.ids (page), ["B0", "B2"])
+        self.library.returnResource (self.customer, self.library.search ("B1")) #the order of the pages does not change
+        self.assertEqual (self.ids (self.library.iterAvailables (afterId = page [-1].id, limit = 2)), ["B3", "B4"])
+        self.assertEqual (self.ids (self.library.iterAvailables (afterId = "B249")), ["D1", "D2", "D3", "D4"])
+
+    def testRemove (self):
+        for id in ("B0", "B5", "B249", "D4"):
+            self.library.removeResource (id)
+        self.assertEqual (self.ids (self.library.iterResources ()), self.ids (self.library.resources))
+        self.assertEqual (self.ids (self.library.iterResources (afterId = "B4", limit = 2)), ["B6", "B7"])
+        self.library.add (mod.Disk (9, "Disk 9", "Singer", 2000))
+        self.assertEqual (self.ids (self.library.iterResources ("Disk", afterId = "D3")), ["D9"])
+
+    def testRemoveWhileIterating (self):
+        iterator = self.library.iterResources ()
+        seen = self.ids (islice (iterator, mod.PAGE_SIZE))
+        for id in ("B99", "B98", "B100"): #the last resource of the page, the one before and the first of the next page
+            self.library.removeResource (id)
+        seen += self.ids (iterator)
+        self.assertEqual (seen, [f"B{i}" for i in range (250) if i != 100] + [f"D{i}" for i in range (5)])
+        iterator = self.library.iterAvailables ("Book", limit = 150)
+        seen = self.ids (islice (iterator, mod.PAGE_SIZE))
+        for id in seen: #up to the first of its type
+            self.library.removeResource (id)
+        self.assertEqual (self.ids (iterator), self.ids (self.library.iterResources ("Book", limit = 50))) #the books left, from the first
+
+class TestModules (unittest.TestCase):
+    """
+    Check the benchmark of the modules on a small library, and the search of regressions
+    """
+    def testRun (self):
+        results = benchmarksModules.run (("myLibrary", "geminiLibrary"), (100,))
+        workloads = results ["results"] ["myLibrary"] ["100"]
+        self.assertEqual (list (workloads), list (benchmarksModules.WORKLOADS))
+        for result in workloads.values ():
+            self.assertEqual (set (result), {"operations", "opsPerSecond", "p99", "peakBytes"})
+            self.assertTrue (result ["opsPerSecond"] > 0 and result ["p99"] > 0 and result ["peakBytes"] >= 0)
+        self.assertEqual (workloads ["add"] ["operations"], 100)
+        self.assertIn ("error", results ["results"] ["geminiLibrary"] ["100"] ["search"]) #its resources have no id
+
+    def testRegressions (self):
+        def results (ops, p99, peak):
+            return {"results": {"myLibrary": {"1000": {"search": {"operations": 10, "opsPerSecond": ops, "p99": p99, "peakBytes": peak}}}}}
+        baseline = results (1000, 1e-6, 100)
+        self.assertEqual (benchmarksModules.regressions (results (900, 1.1e-6, 110), baseline), [])
+        self.assertEqual (len (benchmarksModules.regressions (results (500, 2e-6, 200), baseline)), 3)
+        self.assertEqual (len (benchmarksModules.regressions ({"results": {"myLibrary": {"1000": {"search": {"error": "failed"}}}}}, baseline)), 1)
+        self.assertEqual (benchmarksModules.regressions (baseline, {"results": {}}), [])
+
+class TestBackends (unittest.TestCase):
+    """
+    Check the registry of the backends, and the conformance of every backend to the protocol
+    """
+    def tearDown (self):
+        libraryBackends.BACKENDS.pop ("counted", None)
+
+    def testConformance (self):
+        self.assertEqual (libraryBackends.names () [:4], ["myLibrary", "gptLibrary", "deepseekLibrary", "geminiLibrary"])
+        self.assertEqual (libraryBackends.names (conforming = True) [:3], ["myLibrary", "gptLibrary", "deepseekLibrary"])
+        for name in libraryBackends.names (conforming = True):
+            with self.subTest (backend = name):
+                self.assertEqual (libraryBackends.conformance (name), [])
+        self.assertFalse (libraryBackends.backend ("geminiLibrary").conforms)
+        self.assertNotEqual (libraryBackends.conformance ("geminiLibrary"), []) #else it should be registered as conforming
+
+    def testRegistry (self):
+        self.assertIsInstance (libraryBackends.backend ("myLibrary").Library (), mod.Library)
+        self.assertIsInstance (libraryBackends.backend ("gptLibrary").Library (), libraryBackends.LibraryBackend)
+        self.assertRaises (ValueError, libraryBackends.backend, "nothing")
+        environment = os.environ.pop ("LIBRARY_BACKEND", None)
+        try:
+            self.assertEqual (libraryBackends.backend ().name, "myLibrary")
+            os.environ ["LIBRARY_BACKEND"] = "deepseekLibrary"
+            self.assertEqual (libraryBackends.backend ().module.__name__, "deepseekLibrary")
+        finally:
+            os.environ.pop ("LIBRARY_BACKEND")
+            if environment is not None:
+                os.environ ["LIBRARY_BACKEND"] = environment
+        #a backend that counts the loans, with the classes of myLibrary
+        loans = []
+        class Counted (mod.Library):
+            def borrowResource (self, customer, resource, due = None, borrowed = None):
+                loans.append (resource.id)
+                return super ().borrowResource (customer, resource, due, borrowed)
+        libraryBackends.register ("counted", "myLibrary", lambda module: Counted ())
+        self.assertEqual (libraryBackends.conformance ("counted"), [])
+        self.assertEqual (loans, ["B3", "B3"])
+
+class TestModuleIndexes (unittest.TestCase):
+    """
+    Check the availables of gptLibrary, deepseekLibrary and geminiLibrary, kept in buckets by (type, status)
+    """
+    def availables (self, module, library, resourceType):
+        if module is geminiLibrary:
+            return library.availables (getattr (module, resourceType)) #geminiLibrary takes the class
+        return library.availables (resourceType)
+
+    def testBuckets (self):
+        for module in (gptLibrary, deepseekLibrary, geminiLibrary):
+            with self.subTest (module = module.__name__):
+                library = module.Library ()
+                books = [module.Book (i, f"Book {i}", "Author", 2000, "fiction") for i in range (3)]
+                disk = module.Disk (1, "Shetah Afor", "Ishay Ribo", 2018)
+                for resource in books + [disk]:
+                    library.add (resource)
+                self.assertEqual (self.availables (module, library, "Book"), books)
+                books [0].borrow ()
+                books [1].repair ()
+                self.assertEqual (self.availables (module, library, "Book"), [books [2]])
+                self.assertEqual (self.availables (module, library, "Disk"), [disk])
+                books [1].returning ()
+                self.assertEqual (self.availables (module, library, "Book"), [books [2], books [1]])
+
+    def testAddedTwice (self):
+        #geminiLibrary does not check the duplicates, the resource is still told once about its changes
+        library = geminiLibrary.Library ()
+        customer = geminiLibrary.Customer (1, "Israel Israeli", 547000000)
+        book = geminiLibrary.Book (3, "Harry Potter and the Philosopher Stone", "J.K. Rowling", 1997, "fiction")
+        library.add (customer)
+        library.add (book)
+        library.add (book)
+        library.borrowResource (customer, book)
+        self.assertEqual (book.status, "borrowed")
+        self.assertEqual (library.availables (geminiLibrary.Book), [])
+        self.assertEqual (library.borrowing, {customer: [book]})
+
+@unittest.skipIf (libraryColumns.numpy is None, "numpy is not installed")
+class TestColumns (unittest.TestCase):
+    """
+    Check the columnar catalogue against the library it was made from
+    """
+    def setUp (self):
+        self.library = mod.Library ()
+        self.library.addMany ([mod.Book (i, f"Book {i}", f"Author {i % 3}", 1990 + i, "fiction" if i % 2 else "history") for i in range (10)])
+        self.library.addMany ([mod.Disk (i, f"Disk {i}", "Ishay Ribo", 2010 + i % 4) for i in range (8)])
+        self.library.addMany ([mod.Magazine (i, f"Magazine {i}", "Yediot", i) for i in range (6)])
+        self.library.search ("B2").repair ()
+        self.catalogue = libraryColumns.ColumnCatalogue.fromLibrary (self.library)
+
+    def testSelect (self):
+        expected = [resource for resource in self.library.availables ("Book") if 1992 <= resource.year <= 1996]
+        self.assertEqual ([str (resource) for resource in self.catalogue.find (type = "Book", status = mod.Status.AVAILABLE, years = (1992, 1996))], [str (resource) for resource in expected])
+        self.assertEqual (self.catalogue.count (text = "Author 1", department = "fiction"), 2)
+        self.assertEqual (self.catalogue.count (serialNumbers = (2, 4)), 3)
+        self.assertEqual (self.catalogue.count (text = "nobody"), 0)
+        self.assertEqual (self.catalogue.count (department = "nowhere"), 0) #not the disks and the magazines, that have no department
+        self.assertEqual (self.catalogue.histogram ("Disk"), {2010: 2, 2011: 2, 2012: 2, 2013: 2})
+
+    def testResources (self):
+        self.assertIsNone (self.catalogue.position ("B99"))
+        self.assertIsNone (self.catalogue.position ("X1"))
+        book = self.catalogue.resource (self.catalogue.position ("B2"))
+        self.assertEqual ((str (book), book.status), (str (self.library.search ("B2")), "under repair"))
+        self.assertIs (self.catalogue.resource (self.catalogue.position ("B2")), book) #made once
+        self.assertTrue (self.catalogue.setStatus ("B2", mod.Status.AVAILABLE))
+        self.assertEqual (self.catalogue.resource (self.catalogue.position ("B2")).status, "available")
+        self.assertFalse (self.catalogue.setStatus ("M9", mod.Status.AVAILABLE))
+
+    def testLoad (self):
+        with tempfile.TemporaryDirectory () as directory:
+            path = os.path.join (directory, "library.snapshot")
+            librarySnapshot.save (self.library, path)
+            for useMmap in (False, True):
+                catalogue = libraryColumns.ColumnCatalogue.load (path, useMmap)
+                self.assertEqual (len (catalogue), 24)
+                self.assertEqual (catalogue.count (status = mod.Status.UNDER_REPAIR), 1)
+                self.assertEqual (str (catalogue.resource (catalogue.position ("M3"))), str (self.library.search ("M3")))
+                del catalogue
+
+    def testClose (self):
+        with tempfile.TemporaryDirectory () as directory:
+            path = os.path.join (directory, "library.snapshot")
+            librarySnapshot.save (self.library, path)
+            with libraryColumns.ColumnCatalogue.load (path, True) as catalogue:
+                self.assertEqual (catalogue.count (type = "Disk"), 8)
+            catalogue.close () #closing twice does nothing
+            if os.path.exists ("/proc/self/maps"):
+                with open ("/proc/self/maps") as maps:
+                    self.assertNotIn (path, maps.read ())
+
+if __name__ == "__main__":
+    unittest.main (verbosity=2)